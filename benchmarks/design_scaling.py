@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the in-memory design model: builds designs with 1k to 10k gates with the access pattern of the
+generator (add a gate, look it up by id to move it, connect it, look up the connections of its ports) and
+serializes them. The time per gate should stay about the same for all sizes, i.e. the run time scales linearly.
+
+    python3 benchmarks/design_scaling.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from design import Design  # noqa: E402
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+sizes = [1000, 2000, 5000, 10000]
+repetitions = 3
+
+
+def build_design(num_gates):
+    design = Design()
+    design.add_part({"type": "wokwi-gate-buffer", "id": "input_a", "top": 0, "left": 0, "attrs": {}})
+    for k in range(num_gates):
+        design.add_part({"type": "wokwi-gate-and-2", "id": f"gate_and_{k}", "top": k * 60, "left": 240,
+                         "attrs": {}})
+        # move the gate to its column, like the placement of the generator does
+        design.get_part_by_id(f"gate_and_{k}")["left"] += 120
+        source = "input_a:OUT" if k == 0 else f"gate_and_{k - 1}:OUT"
+        design.add_connection([source, f"gate_and_{k}:A", "orange", ["h10", "*", "h-10"]])
+        design.add_connection([f"gate_and_{k}:A", f"gate_and_{k}:B", "black", ["h-20", "*", "h-20"]])
+        assert len(design.get_connections(f"gate_and_{k}:A")) == 2
+    design.to_json()
+    return design
+
+
+def main():
+    print(f"{'gates':>7} {'time [s]':>10} {'time/gate [us]':>15}")
+    for num_gates in sizes:
+        best = None
+        for _ in range(repetitions):
+            start_time = time.perf_counter()
+            build_design(num_gates)
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{num_gates:7} {best:10.4f} {best / num_gates * 1e6:15.2f}")
+
+
+if __name__ == "__main__":
+    main()
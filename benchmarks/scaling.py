@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark of the generator pipeline: generates designs for synthetic truth tables (2 to 16 inputs, 1 to 16
+outputs) and for the demos, and records the time of every phase of the generator (see `Design.phase_times`) plus
+the JSON serialization. The results are written to a JSON file and can be compared with a stored baseline, the
+script exits with code 1 if a case got slower than the baseline by more than the tolerance.
+
+Kinds of synthetic truth tables (output `k` of a table with `n` inputs):
+- random: random output values (seeded, i.e. the same for every run; never constant)
+- parity: parity of the first `n - k % n` inputs
+- popcount: bit `k % w` of the number of ones among the inputs (`w` bits for up to `n` ones); the inputs set in
+  `k // w` are inverted, so that all outputs differ
+- decoder: one-hot decoder of the most significant inputs (like an address decoder selecting one of the outputs)
+
+    python3 benchmarks/scaling.py -o results.json
+    python3 benchmarks/scaling.py --quick --baseline benchmarks/scaling_baseline.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from generate import Options, arduino_incompatibility, find_logic_files, generate, load_logic_file  # noqa: E402
+from minimize import minimizers  # noqa: E402
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+kinds = ["random", "parity", "popcount", "decoder"]
+default_inputs = [2, 4, 6, 8, 10, 12, 14, 16]
+default_outputs = [1, 4, 16]
+quick_inputs = [2, 4, 6, 8, 10]
+quick_outputs = [1, 4]
+demos_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "demos")
+
+# Tiny Tapeout has 8 inputs and 8 outputs (see `arduino_incompatibility()` for the Arduino test framework)
+max_tinytapeout_pins = 8
+
+# every case is run several times by default, the fastest time of every phase counts
+default_repetitions = 3
+# phases faster than this (in seconds) are not compared with the baseline, their timings are mostly noise
+min_compared_time = 0.01
+
+
+def output_rows(kind, num_inputs, num_outputs, output_idx, rng):
+    """Rows (input combinations) where output `output_idx` of a synthetic truth table is '1'."""
+    num_rows = 2 ** num_inputs
+    if kind == "random":
+        # at least one '1' and one '0', constant outputs cannot be connected
+        return [row for row in range(num_rows)
+                if row == output_idx % num_rows or (row != (output_idx + 1) % num_rows and rng.random() < 0.5)]
+    if kind == "parity":
+        mask = (1 << (num_inputs - output_idx % num_inputs)) - 1
+        return [row for row in range(num_rows) if bin(row & mask).count("1") % 2]
+    if kind == "popcount":
+        width = num_inputs.bit_length()
+        bit, inverted = output_idx % width, output_idx // width
+        return [row for row in range(num_rows) if (bin(row ^ inverted).count("1") >> bit) & 1]
+    if kind == "decoder":
+        address_bits = min(num_inputs, max(1, (num_outputs - 1).bit_length()))
+        return [row for row in range(num_rows) if row >> (num_inputs - address_bits) == output_idx]
+    raise ValueError(f"Unknown kind of truth table '{kind}'.")
+
+
+def synthetic_table(kind, num_inputs, num_outputs):
+    """Logic design description (like the contents of a *.logic.json file) of a synthetic truth table."""
+    rng = random.Random(f"{kind}-{num_inputs}-{num_outputs}")
+    input_names = [f"i{k}" for k in range(num_inputs)]
+    outputs = {f"o{k}": {"ones": output_rows(kind, num_inputs, num_outputs, k, rng)} for k in range(num_outputs)}
+    return {"description": f"{kind} table with {num_inputs} inputs and {num_outputs} outputs",
+            "inputs": input_names, "outputs": outputs}
+
+
+def run_case(name, in_data, options, repetitions=default_repetitions):
+    num_inputs = len(in_data["inputs"])
+    num_outputs = len(in_data["outputs"])
+    # the add-ons are only generated when they can connect the whole design
+    options.test = arduino_incompatibility(num_inputs, num_outputs) is None
+    options.tinytapeout3 = max(num_inputs, num_outputs) <= max_tinytapeout_pins
+
+    phases = {}
+    total = None
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        design = generate(in_data, options)
+        serialize_time = time.perf_counter()
+        design.to_json()
+        end_time = time.perf_counter()
+        for phase, elapsed in dict(design.phase_times, serialize=end_time - serialize_time).items():
+            phases[phase] = min(phases.get(phase, elapsed), elapsed)
+        total = end_time - start_time if total is None else min(total, end_time - start_time)
+    return {
+        "name": name,
+        "num_inputs": num_inputs,
+        "num_outputs": num_outputs,
+        "num_parts": design.num_parts,
+        "num_connections": design.num_connections,
+        "phases": phases,
+        "total": total,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Compare the results with the baseline; returns the list of regressions (human-readable)."""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        reference = baseline_cases.get(case["name"])
+        if reference is None:
+            continue
+        timings = dict(case["phases"], total=case["total"])
+        reference_timings = dict(reference["phases"], total=reference["total"])
+        for phase, elapsed in timings.items():
+            reference_time = reference_timings.get(phase)
+            if reference_time is None or max(elapsed, reference_time) < min_compared_time:
+                continue
+            if elapsed > reference_time * (1 + tolerance):
+                regressions.append(f"{case['name']}: {phase} took {elapsed:.4f} s, "
+                                   f"baseline {reference_time:.4f} s ({elapsed / reference_time:.1f}x)")
+    return regressions
+
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the generator pipeline")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results with this JSON file (written with -o before)")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="allowed slowdown relative to the baseline (1.0: twice as slow)")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"only run the small tables ({quick_inputs} inputs, {quick_outputs} outputs) and "
+                             f"the demos")
+    parser.add_argument("--inputs", type=parse_int_list, help=f"numbers of inputs (default: {default_inputs})")
+    parser.add_argument("--outputs", type=parse_int_list, help=f"numbers of outputs (default: {default_outputs})")
+    parser.add_argument("--kinds", type=lambda value: value.split(","), default=kinds,
+                        help=f"kinds of synthetic tables (default: {','.join(kinds)})")
+    parser.add_argument("--repetitions", type=int, default=default_repetitions,
+                        help="number of runs per case, the fastest time of every phase counts")
+    parser.add_argument("--no-demos", dest="demos", action="store_false", help="do not run the demos")
+    parser.add_argument("--minimizer", choices=minimizers.keys(), default="espresso",
+                        help="minimization backend (the exact ones do not scale to 16 inputs)")
+    parser.add_argument("--minimize-timeout", type=float, help="time limit for the minimization of an output")
+    parser.add_argument("--no-structural-hashing", dest="structural_hashing", action="store_false",
+                        help="benchmark the legacy gate allocation")
+    args = parser.parse_args()
+
+    inputs = args.inputs or (quick_inputs if args.quick else default_inputs)
+    outputs = args.outputs or (quick_outputs if args.quick else default_outputs)
+    cases = [(f"{kind}_{num_inputs}x{num_outputs}", synthetic_table(kind, num_inputs, num_outputs))
+             for kind in args.kinds for num_inputs in inputs for num_outputs in outputs]
+    if args.demos:
+        cases += [(os.path.basename(in_file).replace(".logic.json", ""), load_logic_file(in_file))
+                  for in_file in find_logic_files(demos_dir)]
+
+    results = {
+        "settings": {"minimizer": args.minimizer, "minimize_timeout": args.minimize_timeout,
+                     "structural_hashing": args.structural_hashing},
+        "cases": [],
+    }
+    print(f"{'case':<32} {'parts':>7} {'connections':>11} {'minimize [s]':>12} {'total [s]':>10}")
+    for name, in_data in cases:
+        options = Options(minimizer=args.minimizer, minimize_timeout=args.minimize_timeout,
+                          structural_hashing=args.structural_hashing)
+        case = run_case(name, in_data, options, args.repetitions)
+        results["cases"].append(case)
+        print(f"{name:<32} {case['num_parts']:7} {case['num_connections']:11} {case['phases']['minimize']:12.4f} "
+              f"{case['total']:10.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != results["settings"]:
+            print(f"Warning: baseline settings {baseline['settings']} differ from {results['settings']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            exit(1)
+        print(f"No regressions compared with the baseline (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+In-memory model of a wokwi design (`diagram.json`): parts, connections and the meta data of the generator.
+
+The parts are indexed by their id and the connections by the ports ("part_id:PIN") they connect, so looking up,
+adding and deleting parts and connections takes constant time, independent of the size of the design.
+The wokwi JSON structure is only built when the design is serialized (see `Design.to_dict()`); `Design.write()`
+streams it to a file without building the whole document as a string first.
+"""
+
+import io
+import json
+import logging
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+# separators of the compact JSON output (no whitespace)
+_compact_separators = (",", ":")
+
+
+class Design:
+    """A generated wokwi design: its parts, its connections and the meta data collected while generating it."""
+
+    def __init__(self):
+        self._parts = {}  # id -> part (in the order they were added)
+        self._connections = {}  # key -> connection (in the order they were added)
+        self._next_connection_key = 0
+        self._port_connections = {}  # port -> keys of the connections of that port
+        self._num_parts_by_type = {}
+        self.serial_monitor = None
+        # meta data per output (terms, CNF function, gates used, ...)
+        self.logic_meta = {}
+        # generated Arduino verification code (only when generated with option 'test')
+        self.arduino_sketch = None
+        # time spent in the phases of the generator in seconds (phase name -> time), in the order they ran
+        self.phase_times = {}
+        # memory allocated by the phases in bytes (phase name -> (still allocated at its end, peak)), only when the
+        # generator traced the memory allocations
+        self.phase_memory = {}
+        # statistics report (see `stats.design_stats()`), only when generated with option 'stats'
+        self.stats = None
+        # manifest for incremental regeneration (see `incremental.make_manifest()`), only when generated with
+        # option 'manifest'
+        self.manifest = None
+
+    @property
+    def parts(self):
+        return list(self._parts.values())
+
+    @property
+    def connections(self):
+        return list(self._connections.values())
+
+    @property
+    def num_parts(self):
+        return len(self._parts)
+
+    @property
+    def num_connections(self):
+        return len(self._connections)
+
+    def add_part(self, part):
+        if part["id"] in self._parts:
+            raise ValueError(f"Part with id '{part['id']}' already exists in the design.")
+        self._parts[part["id"]] = part
+        self._num_parts_by_type[part["type"]] = self._num_parts_by_type.get(part["type"], 0) + 1
+
+    def add_connection(self, con):
+        log.debug("    Connection: %s", con)
+        key = self._next_connection_key
+        self._next_connection_key += 1
+        self._connections[key] = con
+        for port in con[:2]:
+            self._port_connections.setdefault(port, {})[key] = None
+
+    def get_part_by_id(self, identifier):
+        return self._parts.get(identifier)
+
+    def delete_part_by_id(self, identifier):
+        part = self._parts.pop(identifier, None)
+        if part is not None:
+            self._num_parts_by_type[part["type"]] -= 1
+
+    def get_connections(self, port):
+        """Get the connections of a port ("part_id:PIN"), in the order they were added."""
+        return [self._connections[key] for key in self._port_connections.get(port, ())]
+
+    def delete_connection(self, con):
+        """Delete a connection (the list given to `add_connection()`) from the design."""
+        keys = self._port_connections.get(con[0], {})
+        key = next((key for key in keys if self._connections[key] is con), None)
+        if key is None:
+            raise ValueError(f"Connection {con} is not part of the design.")
+        del self._connections[key]
+        for port in con[:2]:
+            self._port_connections[port].pop(key, None)
+            if not self._port_connections[port]:
+                del self._port_connections[port]
+
+    def to_dict(self):
+        wokwi_design = self._header()
+        wokwi_design["parts"] = self.parts
+        wokwi_design["connections"] = self.connections
+        if self.serial_monitor is not None:
+            wokwi_design["serialMonitor"] = self.serial_monitor
+        return wokwi_design
+
+    @staticmethod
+    def _header():
+        return {
+            "version": 1,
+            "author": "maehw",
+            "editor": "wokwi",
+        }
+
+    def dump(self, parts_only=False, connections_only=False):
+        """Get the (limited) wokwi design as JSON serializable object; the limits are mutually exclusive."""
+        if parts_only and connections_only:
+            raise ValueError("Combination of parts only and connections only is not supported.")
+        if parts_only:
+            return self.parts
+        if connections_only:
+            return self.connections
+        return self.to_dict()
+
+    def to_json(self, parts_only=False, connections_only=False, compact=False):
+        f = io.StringIO()
+        self.write(f, parts_only, connections_only, compact)
+        return f.getvalue()
+
+    def write(self, f, parts_only=False, connections_only=False, compact=False):
+        """
+        Write the (limited) wokwi design as JSON to the text file `f`. The JSON is encoded and written chunk by
+        chunk, i.e. the whole document is never held in memory as a string. With `compact`, whitespace is omitted
+        and every part and every connection is written on a line of its own (which is a lot smaller and faster to
+        write than the indented output).
+        """
+        if not compact:
+            json.dump(self.dump(parts_only, connections_only), f, indent=4)
+        elif parts_only and connections_only:
+            raise ValueError("Combination of parts only and connections only is not supported.")
+        elif parts_only:
+            _write_lines(f, self._parts.values())
+        elif connections_only:
+            _write_lines(f, self._connections.values())
+        else:
+            f.write(json.dumps(self._header(), separators=_compact_separators)[:-1] + ',"parts":')
+            _write_lines(f, self._parts.values())
+            f.write(',"connections":')
+            _write_lines(f, self._connections.values())
+            if self.serial_monitor is not None:
+                f.write(',"serialMonitor":' + json.dumps(self.serial_monitor, separators=_compact_separators))
+            f.write("}")
+
+    def num_parts_of_type(self, part_type):
+        return self._num_parts_by_type.get(part_type, 0)
+
+
+class Nets:
+    """
+    The nets of a list of connections: all pins ("part_id:PIN") connected by wires form a net, driven by the output
+    pins (`OUT`) on it. The nets are merged in a union-find structure with path compression, so finding them takes
+    almost linear time in the number of connections.
+    """
+
+    def __init__(self, connections):
+        self._parent = {}
+        self._driver_parts = None
+        # all connected pins, in the order of the connections
+        self.pins = {}
+        for con in connections:
+            self.pins[con[0]] = None
+            self.pins[con[1]] = None
+            root_a, root_b = self.find(con[0]), self.find(con[1])
+            if root_a != root_b:
+                self._parent[root_a] = root_b
+        # net -> output pins driving it, in the order of the connections
+        self.drivers = {}
+        for pin in self.pins:
+            if pin.endswith(":OUT"):
+                self.drivers.setdefault(self.find(pin), []).append(pin)
+
+    def find(self, pin):
+        """The net of a pin, represented by one of its pins (an unconnected pin is a net of its own)."""
+        parent = self._parent
+        root = pin
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(pin, pin) != root:
+            parent[pin], pin = root, parent[pin]
+        return root
+
+    def driver(self, pin):
+        """The output pin driving the net of a pin (the first one if there are several), None if it is not driven."""
+        drivers = self.drivers.get(self.find(pin))
+        return drivers[0] if drivers else None
+
+    def driver_parts(self):
+        """
+        Map the ids of the parts to the ids of the parts driving their input pins (the parts with an output pin `OUT`
+        on the same net, not the part itself), in the order of the connections.
+        """
+        if self._driver_parts is None:
+            input_pins = {}
+            for pin in self.pins:
+                part_id, _, pin_name = pin.partition(":")
+                if pin_name != "OUT":
+                    input_pins.setdefault(part_id, []).append(pin)
+            self._driver_parts = {}
+            for part_id, pins in input_pins.items():
+                sources = (self.driver(pin) for pin in pins)
+                source_parts = (source.partition(":")[0] for source in sources if source is not None)
+                self._driver_parts[part_id] = list(dict.fromkeys(source for source in source_parts
+                                                                 if source != part_id))
+        return self._driver_parts
+
+    def fan_in_order(self, roots, parts=None):
+        """
+        The parts in the cones of logic of the `roots` (part ids), fan-in first: every part comes after the parts
+        driving it, except for a driver that closes a combinational loop (it is on the path to the part). `parts`
+        limits the walk to a set of parts (the roots are always included). The walk uses an explicit stack, as the
+        cones can be deep.
+        """
+        drivers = self.driver_parts()
+        order = []
+        done = set()
+        for root in roots:
+            if root in done:
+                continue
+            stack = [root]
+            on_stack = {root}
+            while stack:
+                part_id = stack[-1]
+                missing = next((source for source in drivers.get(part_id, ())
+                                if source not in done and source not in on_stack
+                                and (parts is None or source in parts)), None)
+                if missing is not None:
+                    stack.append(missing)
+                    on_stack.add(missing)
+                    continue
+                order.append(part_id)
+                done.add(part_id)
+                stack.pop()
+                on_stack.discard(part_id)
+        return order
+
+
+def _write_lines(f, items):
+    # write a compact JSON list with every item on a line of its own
+    first = True
+    for item in items:
+        f.write(("[\n" if first else ",\n") + json.dumps(item, separators=_compact_separators))
+        first = False
+    f.write("[]" if first else "\n]")
@@ -1,903 +1,1526 @@
 #!/usr/bin/env python3
+"""
+Generator for wokwi schematics that implement lookup tables.
+
+The generator can either be used from the command line (see `--help`) or be imported as a library:
+
+    import generate
+
+    in_data = generate.load_logic_file("./demos/2bit_half_adder.logic.json")
+    design = generate.generate(in_data, generate.Options(tinytapeout3=True))
+    print(design.to_json())
+
+Every call of `generate()` works on its own state, so it can be called repeatedly from one process.
+"""
+
+import copy
+import glob
 import json
 import math
-import coloredlogs
 import logging
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
 from os import linesep
-from quine_mccluskey import qm
+from design import Design, Nets
+from incremental import gate_sources, incompatibility, load_previous, make_manifest, manifest_file_name
+from mincache import MinimizationCache, cache_key, default_cache_dir, default_max_entries
+from minimize import Cube, minimize_multi_output, minimize_outputs, minimizers
+from netcheck import check_design
+from netlist import Netlist
+from placement import place_design
+from reduction import plan_tree, tree_modes, tree_size
+from synthesis import (MuxTreeBuilder, XorTreeBuilder, backends, build_rom, build_root_trees, build_term_trees,
+                       choose_forms, estimate_costs, forms, input_order, literal_signals, xor_dominant,
+                       zeros_worth_minimizing)
+from techmap import map_gates, max_gate_inputs
+from simulate import verify_design
+from stats import design_stats
+from truthtable import bits_to_rows, parse_output, resolve_files
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 
 # Copyright (c) maehw, 2022-2023
 # wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
 # Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
 
-if __name__ == '__main__':
-    parser = ArgumentParser(description='%(prog)s is a lookup table generator tool for wokwi',
-                            formatter_class=ArgumentDefaultsHelpFormatter)
-
-    parser.add_argument('-v', '--verbose',
-                        action='count',
-                        help='log level (-v: INFO, -vv: DEBUG)',
-                        default=0)
-
-    parser.add_argument('-f', '--file',
-                        dest='in_file',
-                        help='path to JSON logic input file; if none is given, stdout is used',
-                        default="logic.json")
-
-    parser.add_argument('-o', '--outfile',
-                        dest='out_file',
-                        help='path to generated wokwi schematic file',
-                        default=None)
-
-    parser.add_argument('-p', '--parts_only',
-                        action='store_true',
-                        help='dump wokwi parts list only',
-                        default=False)
-
-    parser.add_argument('-c', '--connections_only',
-                        action='store_true',
-                        help='dump wokwi connections list only',
-                        default=False)
-
-    parser.add_argument('-t', '--test',
-                        action='store_true',
-                        help='add an Arduino MEGA as test framework and generate Arduino verification code',
-                        default=False)
-
-    parser.add_argument('-tt', '--tinytapeout',
-                        help='add default parts used in tinytapeout 1/2 wokwi template schematic',
-                        action='store_true',
-                        default=False)
-
-    parser.add_argument('-tt3', '--tinytapeout3',
-                        help='add default parts used in tinytapeout 3 wokwi template schematic',
-                        action='store_true',
-                        default=False)
-
-    args = parser.parse_args()
-
-    # Create and configure logger object
-    log = logging.getLogger(__name__)
-    # coloredlogs.install(level='DEBUG', fmt='%(asctime)s [%(levelname)8s] %(message)s')
-
-    if args.verbose > 0:
-        log_level = 'INFO'
-        if args.verbose > 1:
-            log_level = 'DEBUG'
-    else:
-        log_level = 'WARNING'
-
-    coloredlogs.install(level=log_level, fmt='[%(levelname)8s] %(message)s')
-
-    out_filename = 'diagram.json'
-
-    # templates for wokwi part instances
-    global wokwi_design
-    wokwi_design = {
-        "version": 1,
-        "author": "maehw",
-        "editor": "wokwi",
-        "parts": [],
-        "connections": []
-    }
-
-    wokwi_gate_not = {
-        "type": "wokwi-gate-not",
-        "id": None,
-        "top": 0,
-        "left": 0,
-        "attrs": {}
-    }
-
-    wokwi_gate_buffer = {
-        "type": "wokwi-gate-buffer",
-        "id": None,
-        "top": 0,
-        "left": 0,
-        "attrs": {}
-    }
-
-    wokwi_gate_and2 = {
-        "type": "wokwi-gate-and-2",
-        "id": None,
-        "top": 0,
-        "left": 0,
-        "attrs": {}
-    }
-
-    wokwi_gate_or2 = {
-        "type": "wokwi-gate-or-2",
-        "id": None,
-        "top": 0,
-        "left": 0,
-        "attrs": {}
-    }
-
-    wokwi_arduino_mega = {
-        "type": "wokwi-arduino-mega",
-        "id": "mega",
-        "top": -400,
-        "left": -500,
-        "rotate": 90,
-        "attrs": {}
-    }
-
-    wokwi_dip_switch8 = {
-        "type": "wokwi-dip-switch-8",
-        "id": "sw1",
-        "top": -188,
-        "left": -400,
-        "rotate": 90,
-        "attrs": {}
-    }
-
-    wokwi_clock_generator = {
-        "type": "wokwi-clock-generator",
-        "id": "clock1",
-        "top": -300,
-        "left": -400,
-        "attrs": {}
-    }
-
-    wokwi_chip_input_8pins = {
-        "type": "chip-input-8-pins",
-        "id": "chip1",
-        "top": -200,
-        "left": -230,
-        "attrs": {"verilogRole": "input"}
-    }
-
-    wokwi_chip_output_8pins = {
-        "type": "chip-output-8-pins",
-        "id": "chip2",
-        "top": -200,
-        "left": 900,
-        "attrs": {"verilogRole": "output"}
-    }
-
-    wokwi_board_tt_block_input_8 = {
-        "type": "board-tt-block-input-8",
-        "id": "ttin",
-        "top": -200,
-        "left": -230,
-        "attrs": {"verilogRole": "input"}
-    }
-
-    wokwi_board_tt_block_output = {
-        "type": "board-tt-block-output",
-        "id": "ttout",
-        "top": -200,
-        "left": 900,
-        "attrs": {"verilogRole": "output"}
-    }
-
-    wokwi_7segment = {
-        "type": "wokwi-7segment",
-        "id": "sevseg1",
-        "top": -200,
-        "left": 1100,
-        "attrs": {"common": "cathode"}
-    }
-
-    wokwi_slide_switch = {
-        "type": "wokwi-slide-switch",
-        "id": "sw2",
-        "top": -320,
-        "left": -300,
-        "attrs": {"value": "1"}
-    }
-
-    wokwi_pushbutton = {
-        "type": "wokwi-pushbutton",
-        "id": "btn1",
-        "top": -410,
-        "left": -400,
-        "attrs": {"color": "grey", "label": "Step", "bounce": "0"}
-    }
-
-    wokwi_vcc = {
-        "type": "wokwi-vcc",
-        "id": None,
-        "top": 0,
-        "left": 0,
-        "attrs": {}
-    }
-
-    wokwi_gnd = {
-        "type": "wokwi-gnd",
-        "id": None,
-        "top": 0,
-        "left": 0,
-        "attrs": {}
-    }
-
-    # ------------------------------------------------------------------------------
-    # user specific output style and laoyut definition
-
-    wokwi_gate_spacing_v = 60
-    wokwi_gate_spacing_h = 120
-
-    sym_negation = '~'  # alternative suggestion: 'NOT '
-    sym_and = ''  # alternative suggestions: ' AND ' / '*'
-    sym_or = ' + '  # alternative suggestion: ' OR '
-    sym_term_start = ''  # alternative suggestion: '('
-    sym_term_end = ''  # alternative suggestion: ')'
-
-    # default connection instructions:
-    # global default and special default for termination connections
-    default_con_instr = ["h10", "*", "h-10"]
-    default_con_termination_instr = ["h-20", "*", "h-20"]
-
-    # colors for connections from X-type to Y-type (read from left to right, same as the signal flow)
-    con_color_neginput_and = "blue"
-    con_color_input_and = "brown"
-    con_color_and_and_interconnect = "orange"
-    con_color_and_or_interconnect = "purple"
-    con_color_or_or_interconnect = "green"
-    con_color_or_output = "cyan"
-    con_color_termination = "black"
-    con_color_arduino_interconnect = "black"
-    con_color_vcc_interconnect = "red"
-    con_color_gnd_interconnect = "black"
-    con_color_7seg_interconnect = "green"
-    con_color_board_interconnect = "green"
-
-    arduino_sketch_template_file = "sketch.ino.template"
-
-    global global_and_gate_idx
-    global_and_gate_idx = -1
-    global global_and_gate_used_inports
-    global_and_gate_used_inports = 0
-
-    global global_or_gate_idx
-    global_or_gate_idx = -1
-    global global_or_gate_used_inports
-    global_or_gate_used_inports = 0
-
-    # ------------------------------------------------------------------------------
-    # helper functions
-
-    def calc_num_and_gates(num_all_inputs):
-        num_gates = 0
-        num_stages = 0
-        if num_all_inputs < 2:
-            num_gates = 1
-            num_stages = 1
-            # strategy: always use at least one AND gate (not only a straight wire)!
+log = logging.getLogger(__name__)
+
+# ------------------------------------------------------------------------------
+# templates for wokwi part instances
+
+wokwi_gate_not = {
+    "type": "wokwi-gate-not",
+    "id": None,
+    "top": 0,
+    "left": 0,
+    "attrs": {}
+}
+
+wokwi_gate_buffer = {
+    "type": "wokwi-gate-buffer",
+    "id": None,
+    "top": 0,
+    "left": 0,
+    "attrs": {}
+}
+
+wokwi_gate_and2 = {
+    "type": "wokwi-gate-and-2",
+    "id": None,
+    "top": 0,
+    "left": 0,
+    "attrs": {}
+}
+
+wokwi_gate_or2 = {
+    "type": "wokwi-gate-or-2",
+    "id": None,
+    "top": 0,
+    "left": 0,
+    "attrs": {}
+}
+
+# the wider gates are only used when mapping the netlist onto them (see `techmap`)
+wokwi_gate_and3 = dict(wokwi_gate_and2, type="wokwi-gate-and-3")
+wokwi_gate_and4 = dict(wokwi_gate_and2, type="wokwi-gate-and-4")
+wokwi_gate_or3 = dict(wokwi_gate_or2, type="wokwi-gate-or-3")
+wokwi_gate_or4 = dict(wokwi_gate_or2, type="wokwi-gate-or-4")
+
+# 2:1 multiplexer, only used by the backend 'mux' (see `synthesis`)
+wokwi_mux2 = dict(wokwi_gate_and2, type="wokwi-mux-2")
+
+# XOR gate, only used by the backend 'xor' (see `synthesis`)
+wokwi_gate_xor2 = dict(wokwi_gate_and2, type="wokwi-gate-xor-2")
+
+# (kind, number of inputs) -> part template
+wokwi_gates = {
+    ('and', 2): wokwi_gate_and2,
+    ('and', 3): wokwi_gate_and3,
+    ('and', 4): wokwi_gate_and4,
+    ('or', 2): wokwi_gate_or2,
+    ('or', 3): wokwi_gate_or3,
+    ('or', 4): wokwi_gate_or4,
+    ('mux', 3): wokwi_mux2,
+    ('xor', 2): wokwi_gate_xor2,
+}
+
+# input pins of the gates by kind
+wokwi_gate_pins = {
+    'and': ['A', 'B', 'C', 'D'],
+    'or': ['A', 'B', 'C', 'D'],
+    'mux': ['A', 'B', 'SEL'],
+    'xor': ['A', 'B'],
+}
+
+wokwi_arduino_mega = {
+    "type": "wokwi-arduino-mega",
+    "id": "mega",
+    "top": -400,
+    "left": -500,
+    "rotate": 90,
+    "attrs": {}
+}
+
+wokwi_dip_switch8 = {
+    "type": "wokwi-dip-switch-8",
+    "id": "sw1",
+    "top": -188,
+    "left": -400,
+    "rotate": 90,
+    "attrs": {}
+}
+
+wokwi_clock_generator = {
+    "type": "wokwi-clock-generator",
+    "id": "clock1",
+    "top": -300,
+    "left": -400,
+    "attrs": {}
+}
+
+wokwi_chip_input_8pins = {
+    "type": "chip-input-8-pins",
+    "id": "chip1",
+    "top": -200,
+    "left": -230,
+    "attrs": {"verilogRole": "input"}
+}
+
+wokwi_chip_output_8pins = {
+    "type": "chip-output-8-pins",
+    "id": "chip2",
+    "top": -200,
+    "left": 900,
+    "attrs": {"verilogRole": "output"}
+}
+
+wokwi_board_tt_block_input_8 = {
+    "type": "board-tt-block-input-8",
+    "id": "ttin",
+    "top": -200,
+    "left": -230,
+    "attrs": {"verilogRole": "input"}
+}
+
+wokwi_board_tt_block_output = {
+    "type": "board-tt-block-output",
+    "id": "ttout",
+    "top": -200,
+    "left": 900,
+    "attrs": {"verilogRole": "output"}
+}
+
+wokwi_7segment = {
+    "type": "wokwi-7segment",
+    "id": "sevseg1",
+    "top": -200,
+    "left": 1100,
+    "attrs": {"common": "cathode"}
+}
+
+wokwi_slide_switch = {
+    "type": "wokwi-slide-switch",
+    "id": "sw2",
+    "top": -320,
+    "left": -300,
+    "attrs": {"value": "1"}
+}
+
+wokwi_pushbutton = {
+    "type": "wokwi-pushbutton",
+    "id": "btn1",
+    "top": -410,
+    "left": -400,
+    "attrs": {"color": "grey", "label": "Step", "bounce": "0"}
+}
+
+wokwi_vcc = {
+    "type": "wokwi-vcc",
+    "id": None,
+    "top": 0,
+    "left": 0,
+    "attrs": {}
+}
+
+wokwi_gnd = {
+    "type": "wokwi-gnd",
+    "id": None,
+    "top": 0,
+    "left": 0,
+    "attrs": {}
+}
+
+# ------------------------------------------------------------------------------
+# user specific output style and laoyut definition
+
+wokwi_gate_spacing_v = 60
+wokwi_gate_spacing_h = 120
+
+sym_negation = '~'  # alternative suggestion: 'NOT '
+sym_and = ''  # alternative suggestions: ' AND ' / '*'
+sym_or = ' + '  # alternative suggestion: ' OR '
+sym_term_start = ''  # alternative suggestion: '('
+sym_term_end = ''  # alternative suggestion: ')'
+
+# default connection instructions:
+# global default and special default for termination connections
+default_con_instr = ["h10", "*", "h-10"]
+default_con_termination_instr = ["h-20", "*", "h-20"]
+
+# colors for connections from X-type to Y-type (read from left to right, same as the signal flow)
+con_color_neginput_and = "blue"
+con_color_input_and = "brown"
+con_color_and_and_interconnect = "orange"
+con_color_and_or_interconnect = "purple"
+con_color_or_or_interconnect = "green"
+con_color_or_output = "cyan"
+con_color_mux_interconnect = "gold"
+con_color_xor_interconnect = "violet"
+con_color_termination = "black"
+con_color_arduino_interconnect = "black"
+con_color_vcc_interconnect = "red"
+con_color_gnd_interconnect = "black"
+con_color_7seg_interconnect = "green"
+con_color_board_interconnect = "green"
+
+arduino_sketch_template_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sketch.ino.template")
+
+# pins of the Arduino MEGA usable by the test framework: pins 0 and 1 are used by the serial monitor, the analog
+# pins A0..A15 are used as digital pins; the outputs of the design are read from the pins starting at index 10
+# (pin 12) unless they are needed by the inputs
+arduino_mega_pins = [str(pin) for pin in range(2, 53 + 1)] + [f"A{pin}" for pin in range(16)]
+arduino_mega_first_output_pin_idx = 10
+
+# maximum size of the packed verification tables in the flash memory of the Arduino (of a single object, for avr-gcc)
+arduino_max_table_bytes = 32767
+
+
+# ------------------------------------------------------------------------------
+# public API
+
+@dataclass
+class Options:
+    """Options that control the generation of a wokwi design (see the command line flags of the same name)."""
+    test: bool = False
+    tinytapeout: bool = False
+    tinytapeout3: bool = False
+    # number of worker processes used to minimize the outputs in parallel (1: no parallelization, None: number of CPUs)
+    minimize_jobs: int = 1
+    # directory of the persistent minimization cache (None: do not cache)
+    cache_dir: str = None
+    cache_max_entries: int = default_max_entries
+    # minimization backend, see `minimize.minimizers`
+    minimizer: str = "qm"
+    # time limit for the minimization of a single output in seconds; a cheaper cover is used when it expires
+    # (None: no limit)
+    minimize_timeout: float = None
+    # share product terms between the outputs (see `minimize.minimize_multi_output`)
+    multi_output: bool = False
+    # reuse existing two-input gates for the same pair of signals (see `netlist.Netlist`) instead of allocating
+    # the gates of every term and output separately
+    structural_hashing: bool = True
+    # shape of the AND and OR gate trees, see `reduction.tree_modes`: minimum depth ('balanced') or combining the
+    # signals in the order they arrive, so that late signals are close to the root ('arrival')
+    tree: str = "balanced"
+    # widest AND/OR gates used (2 to 4); the trees of two-input gates are mapped onto wider gates (see `techmap`),
+    # only with structural hashing
+    max_gate_inputs: int = 2
+    # synthesis backend of the outputs, see `synthesis.backends`: sum of products ('sop'), multiplexer trees ('mux'),
+    # decision trees with XOR gates ('xor'), ROM style decoder ('rom') or the cheapest of them per output ('auto',
+    # outputs that need fewer gates with XOR gates than any sum of products are not minimized); other backends than
+    # 'sop' need structural hashing, without it 'auto' builds sums of products
+    backend: str = "auto"
+    # two-level form of the outputs of the backend 'sop', see `synthesis.forms`: sum of products of the ones ('sop'),
+    # product of sums of the zeros ('pos') or the one with fewer gates per output ('auto', minimizes both and builds
+    # the design for every form tried, i.e. several times slower); a product of sums needs structural hashing
+    form: str = "sop"
+    # simulate the generated design for all input combinations and compare it with the truth table
+    verify: bool = False
+    # collect a statistics report with the time and memory of every phase, gate and term counts
+    # (see `stats.design_stats`), available as `design.stats`; tracing the memory slows down the generation
+    stats: bool = False
+    # fail (raise a `RuntimeError`) instead of only logging warnings when the integrity check of the connections
+    # finds problems (see `netcheck.check_design`)
+    strict: bool = False
+    # build the manifest needed to regenerate the design incrementally later (see `incremental`), available as
+    # `design.manifest`
+    manifest: bool = False
+
+
+def load_logic_file(in_file):
+    """
+    Read the logic design description (truth table and meta data) from a JSON file;
+    see `truthtable` for the supported forms of the output values.
+    """
+    with open(in_file, 'r') as f:
+        in_data = json.load(f)
+    # binary files with output values are referenced relative to the JSON file
+    resolve_files(in_data, os.path.dirname(os.path.abspath(in_file)))
+    log.info(f"Data is read from input file '{in_file}'")
+    return in_data
+
+
+def generate(in_data, options=None, previous=None):
+    """
+    Generate a wokwi design from the logic design description `in_data` (contents of a *.logic.json file).
+    With `previous`, the pair (diagram, manifest) of a previously generated design (see
+    `incremental.load_previous()`), only the outputs whose truth table column changed are regenerated.
+    """
+    if options is None:
+        options = Options()
+    return _Generator(in_data, options, previous).run()
+
+
+def find_logic_files(path):
+    """Get the sorted list of logic input files for a directory (all its *.logic.json files) or a glob pattern."""
+    if os.path.isdir(path):
+        path = os.path.join(path, "*.logic.json")
+    return sorted(glob.glob(path))
+
+
+def generate_batch(in_files, out_dir, options=None, jobs=None, parts_only=False, connections_only=False,
+                   compact=False):
+    """
+    Generate one wokwi design file (and Arduino sketch when testing) per input file in `out_dir`;
+    the work is spread over `jobs` worker processes (default: number of CPUs).
+    The design files are written like `Design.write()` does with the given `parts_only`, `connections_only` and
+    `compact` arguments.
+    Returns one summary dictionary per input file, in the order of `in_files`.
+    """
+    if options is None:
+        options = Options()
+    os.makedirs(out_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_generate_batch_file, in_file, out_dir, options, parts_only, connections_only,
+                                   compact)
+                   for in_file in in_files]
+        return [future.result() for future in futures]
+
+
+def format_batch_summary(results, wall_time=None):
+    """Format the batch results as human-readable table."""
+    name_width = max([len("file")] + [len(result["in_file"]) for result in results])
+    lines = [f"{'file':<{name_width}}  inputs outputs   AND    OR  parts connections  time [s]"]
+    for result in results:
+        if result["error"]:
+            lines.append(f"{result['in_file']:<{name_width}}  FAILED: {result['error']}")
         else:
-            stage_inputs = num_all_inputs
-            done = False
-            while not done:
-                num_stages = num_stages + 1
-                num_gates_stage = math.ceil(stage_inputs / 2)
-                # print(f"Number of gates in stage #{num_stages}: {num_gates_stage}")
-
-                num_gates = num_gates + num_gates_stage
-                stage_inputs = num_gates_stage
-
-                if num_gates_stage == 1:
-                    done = True
-        return num_gates, num_stages
-
-
-    def get_part_by_id(identifier):
-        part = next((item for item in wokwi_design["parts"] if item['id'] == identifier), None)
-        return part
-
-
-    def delete_part_by_id(identifier):
-        wokwi_design["parts"] = [d for d in wokwi_design["parts"] if d.get('id') != identifier]
-
-
-    def terminate_current_and_gate():
-        global global_and_gate_idx
-        global global_and_gate_used_inports
-
-        if global_and_gate_idx >= 0:
-            num_open_ports = 2 - global_and_gate_used_inports
-            if num_open_ports > 0:
-                log.debug(f"    Terminating AND gate #{global_and_gate_idx}'s {num_open_ports} open input(s)")
-                con = [f"gate_and_{global_and_gate_idx}:A", f"gate_and_{global_and_gate_idx}:B",
-                       con_color_termination, default_con_termination_instr]
-                wokwi_design["connections"].append(con)
-                log.debug("      Connection: " + str(con))
-                global_and_gate_used_inports = 2
-
-
-    def terminate_current_or_gate():
-        global global_or_gate_idx
-        global global_or_gate_used_inports
-
-        if global_or_gate_idx >= 0:
-            num_open_ports = 2 - global_or_gate_used_inports
+            lines.append(f"{result['in_file']:<{name_width}}  {result['num_inputs']:6} {result['num_outputs']:7} "
+                         f"{result['num_and_gates']:5} {result['num_or_gates']:5} {result['num_parts']:6} "
+                         f"{result['num_connections']:11} {result['time']:9.3f}")
+    total_time = sum(result["time"] for result in results)
+    num_failed = sum(1 for result in results if result["error"])
+    summary = f"{len(results)} file(s), {num_failed} failed, accumulated time {total_time:.3f} s"
+    if wall_time is not None:
+        summary += f", wall time {wall_time:.3f} s"
+    lines.append(summary)
+    return linesep.join(lines)
+
+
+def _batch_out_name(in_file):
+    name = os.path.basename(in_file)
+    for suffix in [".logic.json", ".json"]:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _generate_batch_file(in_file, out_dir, options, parts_only, connections_only, compact):
+    # runs inside a worker process of generate_batch()
+    result = {"in_file": in_file, "out_file": None, "error": None, "time": 0.0}
+    start_time = time.perf_counter()
+    try:
+        in_data = load_logic_file(in_file)
+        design = generate(in_data, options)
+        name = _batch_out_name(in_file)
+
+        result["out_file"] = os.path.join(out_dir, name + ".diagram.json")
+        with open(result["out_file"], 'w') as f:
+            design.write(f, parts_only, connections_only, compact)
+        if design.arduino_sketch:
+            with open(os.path.join(out_dir, name + ".sketch.ino"), 'w') as f:
+                f.write(design.arduino_sketch)
+        if design.stats:
+            with open(os.path.join(out_dir, name + ".stats.json"), 'w') as f:
+                json.dump(design.stats, f, indent=4)
+        if design.manifest is not None:
+            with open(manifest_file_name(result["out_file"]), 'w') as f:
+                json.dump(design.manifest, f, indent=4)
+
+        result["num_inputs"] = len(in_data["inputs"])
+        result["num_outputs"] = len(in_data["outputs"])
+        result["num_and_gates"] = sum(design.num_parts_of_type(template["type"])
+                                      for (kind, _), template in wokwi_gates.items() if kind == 'and')
+        result["num_or_gates"] = sum(design.num_parts_of_type(template["type"])
+                                     for (kind, _), template in wokwi_gates.items() if kind == 'or')
+        result["num_parts"] = design.num_parts
+        result["num_connections"] = design.num_connections
+    except Exception as e:
+        log.error(f"Generating '{in_file}' failed: {e}")
+        result["error"] = str(e) or type(e).__name__
+    result["time"] = time.perf_counter() - start_time
+    return result
+
+
+# ------------------------------------------------------------------------------
+# helper functions
+
+def calc_num_and_gates(num_all_inputs):
+    """
+    Number of two-input AND gates and stages of a term with `num_all_inputs` literals: the literals are paired by
+    the first stage, which is then merged down to a single gate by a balanced tree (see `reduction.tree_size`).
+    """
+    if num_all_inputs < 2:
+        # strategy: always use at least one AND gate (not only a straight wire)!
+        return 1, 1
+    num_first_stage_gates = math.ceil(num_all_inputs / 2)
+    num_tree_gates, num_tree_stages = tree_size(num_first_stage_gates)
+    return num_first_stage_gates + num_tree_gates, 1 + num_tree_stages
+
+
+def get_arduino_mega_pins(num_inputs, num_outputs):
+    """Pins of the Arduino MEGA driving the inputs and reading the outputs of the design (see `arduino_mega_pins`)."""
+    first_output_idx = min(max(num_inputs, arduino_mega_first_output_pin_idx), len(arduino_mega_pins) - num_outputs)
+    return (arduino_mega_pins[:num_inputs],
+            arduino_mega_pins[first_output_idx:first_output_idx + num_outputs])
+
+
+def packed_table_size(num_inputs, num_outputs):
+    """Number of bytes of a bit-packed verification table (one bit per output and input combination)."""
+    return ((2 ** num_inputs) * num_outputs + 7) // 8
+
+
+def arduino_incompatibility(num_inputs, num_outputs):
+    """Reason why the Arduino test framework cannot verify the design (None if it can)."""
+    if num_inputs + num_outputs > len(arduino_mega_pins):
+        return (f"the design has {num_inputs} inputs and {num_outputs} outputs, "
+                f"the Arduino MEGA has only {len(arduino_mega_pins)} usable pins")
+    if packed_table_size(num_inputs, num_outputs) > arduino_max_table_bytes:
+        return (f"the expected output values take {packed_table_size(num_inputs, num_outputs)} bytes, "
+                f"more than {arduino_max_table_bytes} bytes")
+    return None
+
+
+def get_packed_bits(bitmaps, num_inputs):
+    """
+    Pack bitmaps (one per output, bit k for the input combination k) into bytes for the Arduino verification code:
+    bit (k * number of outputs + j) is bit k of the bitmap of output j, bit 0 is the least significant bit of the
+    first byte.
+    """
+    num_rows = 2 ** num_inputs
+    # one string of bits per output (character k for the input combination k), interleaved row by row
+    columns = [bin(bits)[2:].zfill(num_rows)[::-1] for bits in bitmaps]
+    packed = "".join(map("".join, zip(*columns)))
+    return int(packed[::-1] or "0", 2).to_bytes(packed_table_size(num_inputs, len(bitmaps)), "little")
+
+
+def format_c_bytes(data, bytes_per_line=16):
+    # C array initializer lines of the given bytes
+    return "".join(linesep + "    " + ", ".join(f"0x{byte:02x}" for byte in data[idx:idx + bytes_per_line]) + ","
+                   for idx in range(0, len(data), bytes_per_line))
+
+
+def get_expected_bin_out_vals(output_names, bitmaps, num_inputs):
+    # create the bit-packed expectation values for Arduino verification code
+    # (don't cares are expected as '0', they are masked out by `get_bin_out_care_masks()`)
+    ones = [bitmaps[output][0] & bitmaps[output][1] for output in output_names]
+    return format_c_bytes(get_packed_bits(ones, num_inputs))
+
+
+def get_bin_out_care_masks(output_names, bitmaps, num_inputs):
+    # create the bit-packed masks for the Arduino verification code: the bits of outputs with a don't care value are
+    # cleared, i.e. those outputs are not checked for that input combination; None if there are no don't cares
+    all_rows = (1 << 2 ** num_inputs) - 1
+    care = [bitmaps[output][1] for output in output_names]
+    if all(bits == all_rows for bits in care):
+        return None
+    return format_c_bytes(get_packed_bits(care, num_inputs))
+
+
+class _GateAllocator:
+    """Keeps track of the two-input gates of one kind (AND/OR) and of the used input ports of the current gate."""
+
+    def __init__(self, design, kind):
+        self.design = design
+        self.kind = kind  # 'and' or 'or'
+        self.idx = -1
+        self.used_inports = 0
+
+    def terminate(self):
+        if self.idx >= 0:
+            num_open_ports = 2 - self.used_inports
             if num_open_ports > 0:
-                log.debug(f"    Terminating OR gate #{global_or_gate_idx}'s {num_open_ports} open input(s)")
-                con = [f"gate_or_{global_or_gate_idx}:A", f"gate_or_{global_or_gate_idx}:B",
+                log.debug("    Terminating %s gate #%d's %d open input(s)", self.kind.upper(), self.idx, num_open_ports)
+                con = [f"gate_{self.kind}_{self.idx}:A", f"gate_{self.kind}_{self.idx}:B",
                        con_color_termination, default_con_termination_instr]
-                wokwi_design["connections"].append(con)
-                log.debug("      Connection: " + str(con))
-                global_or_gate_used_inports = 2
-
-
-    def select_next_or_gate():
-        global global_or_gate_idx
-        global global_or_gate_used_inports
-
-        global_or_gate_idx += 1
-        log.debug(f"    Selected next (non-existing) OR gate #{global_or_gate_idx}")
-
-        global_or_gate_used_inports = 0
-
-
-    def select_next_and_gate():
-        global global_and_gate_idx
-        global global_and_gate_used_inports
+                self.design.add_connection(con)
+                self.used_inports = 2
 
-        global_and_gate_idx += 1
-        log.debug(f"    Selected next AND gate #{global_and_gate_idx}")
+    def select_next(self):
+        self.idx += 1
+        log.debug("    Selected next %s gate #%d", self.kind.upper(), self.idx)
 
-        global_and_gate_used_inports = 0
-
-
-    def allocate_next_free_and_gate_inport():
-        global global_and_gate_idx
-        global global_and_gate_used_inports
-
-        # we need to connect, let's see if we can still use the current gate (check for free input ports)
-        if global_and_gate_used_inports >= 2:
-            select_next_and_gate()
-
-        retval = (global_and_gate_idx, global_and_gate_used_inports, ['A', 'B'][global_and_gate_used_inports])
-        global_and_gate_used_inports += 1
-
-        return retval
-
-
-    def allocate_next_free_or_gate_inport():
-        global global_or_gate_idx
-        global global_or_gate_used_inports
+        self.used_inports = 0
 
+    def allocate_next_free_inport(self):
         # we need to connect, let's see if we can still use the current gate (check for free input ports)
-        if global_or_gate_used_inports >= 2:
-            select_next_or_gate()
+        if self.used_inports >= 2:
+            self.select_next()
 
-        retval = (global_or_gate_idx, global_or_gate_used_inports, ['A', 'B'][global_or_gate_used_inports])
-        global_or_gate_used_inports += 1
+        retval = (self.idx, self.used_inports, ['A', 'B'][self.used_inports])
+        self.used_inports += 1
 
         return retval
 
 
-    def get_expected_bin_out_vals(output_names, output_data, num_inputs):
-        # create binary based expectation values for Arduino verification code
-        # see also: https://www.arduino.cc/reference/en/language/variables/constants/integerconstants/
-        expected_bin_val = ""
-        for k in range(2 ** num_inputs):
-            expected_bin_val += linesep + "    0b"
-            for output in output_names:
-                expected_bin_val += str(output_data[output][k])
-            expected_bin_val += ","
-
-        return expected_bin_val
-
-
-    log.info(f"Log level: {log_level}")
-
-    if args.parts_only and args.connections_only:
-        parser.error("Combination of -p and -c is currently not supported.")
-
-    if args.tinytapeout:
-        log.warning("Please note that --tinytapeout/-tt are legacy options, use --tinytapeout3/-tt3 instead.")
-    if args.tinytapeout and args.tinytapeout3:
-        parser.error("Combination of --tt and --tt3 is not supported.")
+class _Generator:
+    """State of a single design generation run; use `generate()` instead of instantiating this directly."""
+
+    def __init__(self, in_data, options, previous=None):
+        if options.tinytapeout and options.tinytapeout3:
+            raise ValueError("Combination of tinytapeout and tinytapeout3 is not supported.")
+
+        self.in_data = in_data
+        # work on a copy, the generator may need to adjust conflicting options
+        self.options = replace(options)
+        self.design = Design()
+        # previous design and manifest to regenerate incrementally from (see `load_previous_design()`)
+        self.previous = previous
+        self.incremental = False
+        self.and_gates = _GateAllocator(self.design, 'and')
+        self.or_gates = _GateAllocator(self.design, 'or')
+        # structurally hashed netlist (see `build_and_trees()`): root gates of the terms (AND gates of the products,
+        # OR gates of the sums) and the gates driving the outputs
+        self.netlist = Netlist()
+        self.term_gates = {}
+        self.output_gates = {}
+        # outputs whose gate trees are built (all of them, unless regenerating incrementally), the gates kept from
+        # the previous design come first in the netlist
+        self.outputs_to_build = []
+        self.num_kept_gates = 0
+        # ids of the parts kept from the previous design (they keep their positions, see `place_parts()`)
+        self.kept_parts = set()
+        # the new gates of the design (see `build_or_trees()` and `map_wide_gates()`)
+        self.gates = []
+        # number of gate columns of the placement (see `place_parts()`)
+        self.layout = {}
+        self.num_mux_stages = 0
+        self.num_xor_stages = 0
+        # order of the inputs in the decision trees of the backends 'mux' and 'xor' (see `synthesis.input_order`)
+        self.input_order = None
+        # outputs built as decision trees without minimizing them, with their backends (see `minimize()`)
+        self.tree_outputs = {}
+
+        # the 'logic' dictionary used within the generator defines the
+        # - names of the output variables
+        # - the list of integers that describe the input combination (row index of the truth table)
+        #   when the output function is '1'
+        # note: the order of key-value entries inside the dictionary is not relevant
+        self.logic = {}
+        # rows of the truth table where the output value does not matter (per output, can be empty)
+        self.dont_cares = {}
+        # bitmaps of the ones and of the rows that are not don't cares (per output)
+        self.bitmaps = {}
+        # minimization time per output (in seconds)
+        self.output_times = {}
+        # content addresses of the output columns (see `mincache.cache_key`) and the terms of the outputs that are
+        # not minimized again
+        self.output_keys = {}
+        self.known_terms = {}
+        self.known_forms = {}
+        # estimated gates of the two-level forms (see `choose_form()`)
+        self.form_costs = {}
+        self.logic_meta = self.design.logic_meta
+
+        self.input_names = in_data["inputs"]
+        self.num_inputs = len(self.input_names)
+        self.output_names = list(in_data["outputs"].keys())
+        self.num_outputs = len(self.output_names)
+
+        self.num_all_and_gates = 0
+        # arrival times (number of gates on the longest path from the inputs) of the root AND gates and the first
+        # stage OR gates built without structural hashing
+        self.and_gate_depths = {}
+        self.or_gate_depths = {}
+        # maximum number of AND and OR gate stages required (important for the layout)
+        self.num_and_stages_max_overall = 0
+        self.max_or_gate_stages = 0
+
+    def run(self):
+        # trace the memory allocations for the statistics report (unless someone else is already tracing them)
+        start_tracing = self.options.stats and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        try:
+            self._run_phases()
+        finally:
+            if start_tracing:
+                tracemalloc.stop()
+
+        # log.debug( json.dumps(self.logic_meta, indent=4) )
+
+        return self.design
+
+    def _run_phases(self):
+        if self.options.max_gate_inputs > 2 and not self.options.structural_hashing:
+            log.warning("Gates with more than two inputs need structural hashing, using two-input gates.")
+            self.options.max_gate_inputs = 2
+        if self.options.backend != "sop" and not self.options.structural_hashing:
+            if self.options.backend != "auto":
+                log.warning(f"Backend '{self.options.backend}' needs structural hashing, using sums of products.")
+            self.options.backend = "sop"
+        if self.options.form != "sop" and not self.options.structural_hashing:
+            if self.options.form == "pos":
+                log.warning("Products of sums need structural hashing, using sums of products.")
+            self.options.form = "sop"
+
+        self._run_phase("parse", self.parse_logic)
+        if self.previous is not None:
+            self._run_phase("load_previous", self.load_previous_design)
+        self._run_phase("minimize", self.minimize)
+        if self.options.structural_hashing:
+            if not self.incremental:
+                self._run_phase("inputs", self.add_input_parts)
+            self._run_phase("backends", self.select_backends)
+            if any(self.logic_meta[output]["backend"] != "sop" for output in self.outputs_to_build):
+                self._run_phase("backend_outputs", self.build_backend_outputs)
+            self._run_phase("and_trees", self.build_and_trees)
+            self._run_phase("or_trees", self.build_or_trees)
+            if self.options.max_gate_inputs > 2:
+                self._run_phase("techmap", self.map_wide_gates)
+            self._run_phase("outputs", self.add_gate_and_output_parts)
+            self._run_phase("wiring", self.connect_gates)
+        else:
+            self._run_phase("inputs", self.add_input_and_and_gate_parts)
+            self._run_phase("and_first_stage", self.connect_first_and_stage)
+            self._run_phase("and_merge", self.merge_and_gates)
+            self._run_phase("or_first_stage", self.connect_first_or_stage)
+            self._run_phase("or_merge", self.merge_or_gates)
+            self._run_phase("outputs", self.add_or_gate_and_output_parts)
+        self._run_phase("placement", self.place_parts)
+
+        log.info(f"Finished the wokwi design!")
+
+        if self.options.tinytapeout and self.options.test:
+            log.warning("Cannot combine flags '--test'/'-t' and '--tinytapeout'/'--tt'. Removing '-tt'.")
+            self.options.tinytapeout = False
+
+        if self.options.test:
+            # the parts and connections of the test framework are kept by an incremental regeneration
+            self._run_phase("test_framework",
+                            self.generate_arduino_sketch if self.incremental else self.add_test_framework)
+
+        if (self.options.tinytapeout or self.options.tinytapeout3) and not self.incremental:
+            self._run_phase("tinytapeout", self.add_tinytapeout_parts)
+
+        self._run_phase("check", self.check)
+
+        if self.options.verify:
+            self._run_phase("verify", self.verify)
+
+        if self.options.stats:
+            self.design.stats = design_stats(self.design, self.output_names, self.output_times)
+
+        if self.options.manifest:
+            self.design.manifest = make_manifest(self.input_names, self.get_output_keys(),
+                                                 {output: self.logic_meta[output]["terms"] for output in self.logic},
+                                                 self.options, self.layout,
+                                                 {output: self.logic_meta[output]["form"] for output in self.logic})
+
+    def _run_phase(self, name, method):
+        if self.options.stats and tracemalloc.is_tracing():
+            # only count the memory allocated by this phase (this also resets the peak)
+            tracemalloc.clear_traces()
+        start_time = time.perf_counter()
+        method()
+        self.design.phase_times[name] = time.perf_counter() - start_time
+        if self.options.stats and tracemalloc.is_tracing():
+            self.design.phase_memory[name] = tracemalloc.get_traced_memory()
+
+    def check(self):
+        problems = check_design(self.design.parts, self.design.connections)
+        for problem in problems:
+            log.warning(problem)
+        if problems and self.options.strict:
+            raise RuntimeError(f"Integrity check of the generated design found {len(problems)} problem(s).")
+        log.info(f"Checked the connections of the design: {len(problems)} problem(s)")
+
+    def verify(self):
+        failures = verify_design(self.design, self.input_names, self.bitmaps)
+        if failures:
+            for output, rows in failures.items():
+                log.error(f"Output {output} differs from the truth table in {len(rows)} row(s): {rows[:16]}"
+                          f"{' ...' if len(rows) > 16 else ''}")
+            raise RuntimeError(f"Verification of the generated design failed for output(s) {list(failures)}.")
+        log.info("Verified the design: all outputs match the truth table")
 
     # ------------------------------------------------------------------------------
     # generate insights about the design input data, i.e. log them to the console
-    # ------------------------------------------------------------------------------
-    # user specific design definition
-
-    # - asume no duplicate names in use
-    # - asume order of output values (zeros and ones) matches binary input order
-    #   (e.g. for three inputs: 000, 001, 010, 011, 100, ..., 110, 111)
-    # - make input names optional (and use default ones, e.g. 'a', 'b', 'c', ...)
-
-    in_data = {}
-    try:
-        with open(args.in_file, 'r') as f:
-            in_data = json.loads(f.read())
-            log.info(f"Data is read from input file '{args.in_file}'")
-    except FileNotFoundError:
-        log.error(f"Input file '{args.in_file}' cannot be found. Use flag '-h' to get usage.")
-        exit(1)
-
-    # the 'logic' dictionary used within this script defines the
-    # - names of the output variables
-    # - the list of integers that describe the input combination (row index of the truth table)
-    #   when the output function is '1'
-    # note: the order of key-value entries inside the dictionary is not relevant
-    logic = {}
-
-    input_names = in_data["inputs"]
-    num_inputs = len(input_names)
-    output_names = list(in_data["outputs"].keys())
-    num_outputs = len(output_names)
-
-    log.info(f"Inputs:    {num_inputs:2} {input_names}")
-    log.info(f"Outputs:   {num_outputs:2} {output_names}")
-
-    for output in output_names:
-        # make sure that we have 2^num_inputs output values!
-        assert len(in_data["outputs"][output]) == 2 ** num_inputs
-        ones = [i for i in range(2 ** num_inputs) if in_data["outputs"][output][i] == 1]
-        log.info(f"  Output {output}: {in_data['outputs'][output]}; ones: {ones}")
-        logic[output] = ones
-
-    max_ones_idx = 2 ** num_inputs - 1
-    log.debug(f"Max ones idx: 2^{num_inputs} - 1 = {max_ones_idx}")
-
-    log.debug("Wokwi design (at start):")
-    log.debug(wokwi_design)
+    def parse_logic(self):
+        # - asume no duplicate names in use
+        # - asume order of output values (zeros and ones) matches binary input order
+        #   (e.g. for three inputs: 000, 001, 010, 011, 100, ..., 110, 111)
+        # - make input names optional (and use default ones, e.g. 'a', 'b', 'c', ...)
+        log.info(f"Inputs:    {self.num_inputs:2} {self.input_names}")
+        log.info(f"Outputs:   {self.num_outputs:2} {self.output_names}")
+
+        for output in self.output_names:
+            # the output values are parsed into bitmaps first (also makes sure that we have 2^num_inputs of them),
+            # only the rows of the ones and don't cares are listed
+            try:
+                ones_bits, dont_cares_bits = parse_output(self.in_data["outputs"][output], self.num_inputs)
+            except ValueError as e:
+                raise ValueError(f"Output {output}: {e}") from None
+            ones = bits_to_rows(ones_bits)
+            dont_cares = bits_to_rows(dont_cares_bits)
+            if log.isEnabledFor(logging.INFO):
+                log.info(f"  Output {output}: ones: {ones}")
+                if dont_cares:
+                    log.info(f"  Output {output}: don't cares: {dont_cares}")
+            self.logic[output] = ones
+            self.dont_cares[output] = dont_cares
+            self.bitmaps[output] = (ones_bits, ((1 << 2 ** self.num_inputs) - 1) & ~dont_cares_bits)
+
+        max_ones_idx = 2 ** self.num_inputs - 1
+        log.debug(f"Max ones idx: 2^{self.num_inputs} - 1 = {max_ones_idx}")
+        self.outputs_to_build = list(self.logic)
+
+        # an output without ones or without zeros (e.g. only ones and don't cares) is constant, i.e. its function
+        # minimizes to no term or to a term without literals and there is no gate to drive its output buffer
+        constant = [output for output, (ones_bits, care) in self.bitmaps.items()
+                    if not ones_bits & care or not care & ~ones_bits]
+        if constant:
+            raise RuntimeError(f"Constant output(s) {constant} cannot be connected, every output needs at least "
+                               f"one '0' and one '1' in its truth table column.")
+
+    def get_output_keys(self):
+        if not self.output_keys:
+            self.output_keys = {output: cache_key(self.num_inputs, ones, self.dont_cares[output],
+                                                  self.options.minimizer)
+                                for output, ones in self.logic.items()}
+        return self.output_keys
 
     # ------------------------------------------------------------------------------
-    # reset counters to prepare all the work, create instances, etc. ...
-
-    num_all_buffers = num_inputs + num_outputs
-    num_all_not_gates = num_inputs
-    num_all_and_gates = 0
-    num_all_or_gates = 0
-
-    # maximum number of AND and OR gate stages required (important for the layout)
-    num_and_stages_max_overall = 0
-    num_or_stages_max_overall = 0
-
-    # keep meta data for resource estimation, etc
-    logic_meta = {}
-
-    q = qm.QuineMcCluskey()
+    # Regenerate incrementally: keep the parts and connections of the previous design, except for the gates
+    # only used by the outputs whose truth table column changed (see `incremental`)
+    def load_previous_design(self):
+        diagram, manifest = self.previous
+        reason = incompatibility(diagram, manifest, self.input_names, self.output_names, self.options)
+        if reason is not None:
+            log.warning(f"Cannot regenerate the design incrementally ({reason}), generating it from scratch.")
+            return
+
+        output_keys = self.get_output_keys()
+        changed = [output for output in self.output_names
+                   if manifest["outputs"][output]["key"] != output_keys[output]]
+        self.known_terms = {output: [Cube(value, care) for value, care in manifest["outputs"][output]["terms"]]
+                            for output in self.output_names if output not in changed}
+        self.known_forms = {output: manifest["outputs"][output].get("form", "sop") for output in self.known_terms}
+        self.outputs_to_build = changed
+        self.layout = manifest["layout"]
+
+        # keep the gates in the cones of logic of the unchanged outputs
+        nets = Nets(diagram["connections"])
+        sources = gate_sources(diagram["parts"], nets)
+        output_gates = []
+        for output in self.known_terms:
+            signal = nets.driver(f"output_{output}:IN")
+            driver = signal.partition(":")[0] if signal else None
+            if driver not in sources:
+                log.warning("Cannot regenerate the design incrementally (an unchanged output is not driven by a "
+                            "gate), generating it from scratch.")
+                return
+            output_gates.append(driver)
+        kept = set(nets.fan_in_order(output_gates, set(sources)))
+        if any(None in sources[gate_id][1] for gate_id in kept):
+            log.warning("Cannot regenerate the design incrementally (a gate input is not driven), "
+                        "generating it from scratch.")
+            return
+        removed = set(sources) - kept
+
+        for part in diagram["parts"]:
+            if part["id"] not in removed:
+                self.design.add_part(part)
+                self.kept_parts.add(part["id"])
+        changed_output_pins = {f"output_{output}:IN" for output in changed}
+        for con in diagram["connections"]:
+            part_ids = {pin.partition(":")[0] for pin in con[:2]}
+            if part_ids & removed or (changed_output_pins.intersection(con[:2]) and
+                                      any(part_id.startswith("gate_") for part_id in part_ids)):
+                continue
+            self.design.add_connection(con)
+        self.design.serial_monitor = diagram.get("serialMonitor")
+
+        # the kept gates are added to the netlist fan-in first, so that new trees can reuse them
+        for gate_id in nets.fan_in_order(sorted(kept, key=lambda gate_id: (sources[gate_id][0],
+                                                                            int(gate_id.rsplit("_", 1)[1]))), kept):
+            kind, signals = sources[gate_id]
+            self.netlist.add_existing(kind, int(gate_id.rsplit("_", 1)[1]), signals[0], signals[1])
+        self.num_kept_gates = len(self.netlist.gates)
+        self.incremental = True
+        log.info(f"Regenerating {len(changed)} of {self.num_outputs} output(s) incrementally: {changed}; "
+                 f"keeping {len(kept)} gate(s), removing {len(removed)}")
 
     # ------------------------------------------------------------------------------
     # first iteration over all outputs is to show all the CNF terms,
     # to get a parts resources estimation;
     # please note that they ae not added to and layed out in the wokwi design yet
-    for output in logic:
-        # reset estimation counters for the current output
-        logic_meta[output] = {
-            "qm_terms_raw": [],
-            "num_terms": 0,  # num_ORed_AND_terms
-            "cnf_function": "",  # build up string to get a human-readable function in conjunctive normal form (CNF)
-            "num_and_gates": 0,
-            "num_and_gate_stages": [],  # for every term
-            "num_and_gate_stages_max": 0,
-            "and_gates_first_stage": [],
-            "inputs_for_first_or_gate_stage": [],
-            "or_gates_first_stage": [],
-            "final_or_gate": None
-        }
-
-        log.debug(f"Running Quine-McCluskey algorithm for output {output}...")
-
-        # convert set into list (to allow indexing)
-        logic_meta[output]["qm_terms_raw"] = list(q.simplify(logic[output]))
-
-        log.debug(f"Raw qm terms for {output}: {logic_meta[output]['qm_terms_raw']}")
-
-        # iterate over the terms (those that are OR'ed)
-        logic_meta[output]["num_terms"] = len(logic_meta[output]["qm_terms_raw"])
-
-        # iterate over the terms (aka miniterms) for the current output
-        cnf_function = ""
-        for term_idx in range(logic_meta[output]["num_terms"]):
-            cnf_function += sym_term_start
-
-            # iterate over every input variable and see if it is used in the term or not;
-            # if it is used check if the negated or original variable is used
-            num_inputs_in_term = 0
-            for input_idx in range(num_inputs):
-                # The next log line give very verbose debugging, comment it out for now
-                # log.debug(f"Is input #{input_idx} used in the current term
-                # {logic_meta[output]['terms_raw'][term_idx]}? {logic_meta[output]['terms_raw'][term_idx][input_idx]}")
-                if logic_meta[output]['qm_terms_raw'][term_idx][input_idx] in ['0', '1']:
-                    if num_inputs_in_term > 0:
-                        # if another input has been used in the term before, add symbol for AND op
-                        cnf_function += sym_and
-                    if '0' == logic_meta[output]['qm_terms_raw'][term_idx][input_idx]:
-                        # add a prefix to indicate negation
-                        cnf_function += sym_negation
-                    # if it used negated or un-negated, add the name
-                    cnf_function += input_names[input_idx]
-                    num_inputs_in_term += 1
-
-            cnf_function += sym_term_end
-
-            (term_num_and_gates, term_num_and_stages) = calc_num_and_gates(num_inputs_in_term)
-            logic_meta[output]["num_and_gate_stages"].append(term_num_and_stages)
-
-            # accumulate all AND gates for the output (over all terms for the output)
-            logic_meta[output]["num_and_gates"] += term_num_and_gates
-
-            # take maximum of AND stages for the output
-            logic_meta[output]["num_and_gate_stages_max"] = max(logic_meta[output]["num_and_gate_stages_max"],
-                                                                term_num_and_stages)
-
-            # leave out the 'or' after last term
-            if term_idx < logic_meta[output]["num_terms"] - 1:
-                cnf_function += sym_or
-
-        # function description in CNF is completed
-        logic_meta[output]["cnf_function"] = cnf_function
-
-        # Display CNF term
-        log.info(f"Calculated CNF for output {output}: {logic_meta[output]['cnf_function']}")
-
-        log.debug(f"    Number of OR'ed AND-terms: {logic_meta[output]['num_terms']}")
-
-        log.debug(f"    Calculation of output {output} requires {logic_meta[output]['num_and_gates']:3} "
-                  f"two-input AND gate(s)")
-        log.debug(f"                              in max {logic_meta[output]['num_and_gate_stages_max']:3} stage(s)")
-
-        # not only for this output but for the whole device
-        num_and_stages_max_overall = max(num_and_stages_max_overall, logic_meta[output]['num_and_gate_stages_max'])
-
-        # accumulate all AND and all OR gates, not only for the current output but for the whole device
-        num_all_and_gates += logic_meta[output]["num_and_gates"]
-
-    log.info("Estimated parts usage:")
-    log.info(f"    * {num_all_buffers:3} buffers (for the inputs and the outputs)")
-    log.info(f"    * {num_all_not_gates:3} NOT gate(s) (for the negated inputs)")
-    log.info(f"    * {num_all_and_gates:3} two-input AND gate(s), in max. {num_and_stages_max_overall} stages")
-    log.info(f"    * number of two-input OR gate(s) not estimated yet")
+    def minimize(self):
+        num_all_buffers = self.num_inputs + self.num_outputs
+        num_all_not_gates = self.num_inputs
+
+        # the minimizations of the outputs are independent of each other, so they can run in parallel
+        minimize_function = minimize_multi_output if self.options.multi_output else minimize_outputs
+        timed_out = []
+        if self.options.backend in ("mux", "xor") and self.options.structural_hashing:
+            # the decision trees are built from the truth table directly, there are no terms
+            self.known_terms.update({output: [] for output in self.logic if output not in self.known_terms})
+        elif self.options.backend == "auto" and self.options.structural_hashing:
+            # minimizing parity and arithmetic functions takes long and gives huge sums of products
+            self.detect_tree_outputs()
+        elif self.options.backend == "rom" and self.options.structural_hashing:
+            # the ROM has a decoder line (minterm) for every row that is '1'
+            full_care = (1 << self.num_inputs) - 1
+            self.known_terms.update({output: [Cube(row, full_care) for row in ones]
+                                     for output, ones in self.logic.items() if output not in self.known_terms})
+        # the terms of the outputs kept from a previous design are known already
+        logic = {output: ones for output, ones in self.logic.items() if output not in self.known_terms}
+        terms = self._minimize(minimize_function, logic, timed_out, self.output_times)
+        output_forms = {output: "sop" for output in self.logic}
+        output_forms.update(self.known_forms)
+        if self.options.form != "sop" and logic:
+            # also minimize the zeros (the rows that are neither ones nor don't cares) for products of sums
+            zeros = {output: bits_to_rows(self.bitmaps[output][1] & ~self.bitmaps[output][0]) for output in logic
+                     if self.options.form == "pos" or
+                     zeros_worth_minimizing(terms[output], *self.bitmaps[output], self.num_inputs)}
+            skipped = [output for output in logic if output not in zeros]
+            if skipped:
+                log.info(f"Not minimizing the zeros of outputs {skipped}, a product of sums would need more gates")
+            zeros_timed_out = []
+            zeros_times = {}
+            zero_terms = self._minimize(minimize_function, zeros, zeros_timed_out, zeros_times)
+            chosen = self.choose_forms(terms, zero_terms)
+            for output in zeros:
+                self.output_times[output] += zeros_times[output]
+                output_forms[output] = chosen[output]
+                if output_forms[output] == "pos":
+                    terms[output] = zero_terms[output]
+                    if output in timed_out:
+                        timed_out.remove(output)
+                    if output in zeros_timed_out:
+                        timed_out.append(output)
+        terms.update(self.known_terms)
+
+        # terms shared between outputs only need their AND gates once
+        shared_terms = set()
+        if timed_out:
+            log.warning(f"Outputs using a fallback cover due to the minimization timeout: {timed_out}")
+
+        for output in self.logic:
+            # reset estimation counters for the current output
+            self.logic_meta[output] = {
+                "terms": [],  # product terms as bit-packed cubes (see `minimize.Cube`)
+                "num_terms": 0,  # num_ORed_AND_terms
+                "cnf_function": "",  # build up string to get a human-readable function in conjunctive normal form (CNF)
+                "num_and_gates": 0,
+                "num_and_gate_stages": [],  # for every term
+                "num_and_gate_stages_max": 0,
+                "and_gates_first_stage": [],
+                "inputs_for_first_or_gate_stage": [],
+                "or_gates_first_stage": [],
+                "final_or_gate": None,
+                "minimize_fallback": output in timed_out,  # True if the minimization timed out
+                "backend": "sop",  # see `select_backends()`
+                "form": output_forms[output],  # two-level form: 'sop' or 'pos' (the terms cover the zeros)
+            }
+            meta = self.logic_meta[output]
+
+            meta["terms"] = terms[output]
+            if output in self.form_costs:
+                meta["form_costs"] = self.form_costs[output]
+
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"Raw terms for {output}: {[term.to_term(self.num_inputs) for term in meta['terms']]}")
+
+            # iterate over the terms (those that are OR'ed)
+            meta["num_terms"] = len(meta["terms"])
+
+            if meta["form"] == "pos":
+                # the clauses are the negated terms of the zeros, their gates are estimated when building them
+                meta["cnf_function"] = sym_and.join(
+                    "(" + sym_or.join((sym_negation if not negated else '') + self.input_names[input_idx]
+                                      for input_idx, negated in term.literals(self.num_inputs)) + ")"
+                    for term in meta["terms"])
+                log.info(f"Calculated product of sums for output {output}: {meta['cnf_function']}")
+                continue
+
+            # iterate over the terms (aka miniterms) for the current output
+            cnf_function = ""
+            for term_idx, term in enumerate(meta["terms"]):
+                cnf_function += sym_term_start
+
+                # iterate over the input variables used in the term (negated or original variable),
+                # add a prefix to indicate negation and the symbol for the AND op between them
+                cnf_function += sym_and.join((sym_negation if negated else '') + self.input_names[input_idx]
+                                             for input_idx, negated in term.literals(self.num_inputs))
+                num_inputs_in_term = term.num_literals
+
+                cnf_function += sym_term_end
+
+                (term_num_and_gates, term_num_and_stages) = calc_num_and_gates(num_inputs_in_term)
+                meta["num_and_gate_stages"].append(term_num_and_stages)
+
+                # accumulate all AND gates for the output (over all terms for the output)
+                meta["num_and_gates"] += term_num_and_gates
+
+                # accumulate all AND gates for the whole device
+                if not self.options.multi_output or term not in shared_terms:
+                    self.num_all_and_gates += term_num_and_gates
+                    shared_terms.add(term)
+
+                # take maximum of AND stages for the output
+                meta["num_and_gate_stages_max"] = max(meta["num_and_gate_stages_max"], term_num_and_stages)
+
+                # leave out the 'or' after last term
+                if term_idx < meta["num_terms"] - 1:
+                    cnf_function += sym_or
+
+            # function description in CNF is completed
+            meta["cnf_function"] = cnf_function
+
+            # Display CNF term
+            log.info(f"Calculated CNF for output {output}: {meta['cnf_function']}")
+
+            log.debug(f"    Number of OR'ed AND-terms: {meta['num_terms']}")
+
+            log.debug(f"    Calculation of output {output} requires {meta['num_and_gates']:3} "
+                      f"two-input AND gate(s)")
+            log.debug(f"                              in max {meta['num_and_gate_stages_max']:3} stage(s)")
+
+            # not only for this output but for the whole device
+            self.num_and_stages_max_overall = max(self.num_and_stages_max_overall, meta['num_and_gate_stages_max'])
+
+        log.info("Estimated parts usage:")
+        log.info(f"    * {num_all_buffers:3} buffers (for the inputs and the outputs)")
+        log.info(f"    * {num_all_not_gates:3} NOT gate(s) (for the negated inputs)")
+        log.info(f"    * {self.num_all_and_gates:3} two-input AND gate(s), in max. "
+                 f"{self.num_and_stages_max_overall} stages")
+        log.info(f"    * number of two-input OR gate(s) not estimated yet")
+
+    def detect_tree_outputs(self):
+        literals = literal_signals(self.input_names)
+        trees = {"mux": MuxTreeBuilder(Netlist(), literals, self.get_input_order()),
+                 "xor": XorTreeBuilder(Netlist(), literals, self.get_input_order())}
+        for output in self.logic:
+            if output in self.known_terms:
+                continue
+            # the gates added by the output to the decision trees of all outputs so far
+            num_gates = {}
+            for backend, tree in trees.items():
+                num_gates[backend] = len(tree.netlist.gates)
+                tree.build(*self.bitmaps[output])
+                num_gates[backend] = len(tree.netlist.gates) - num_gates[backend]
+            if xor_dominant(num_gates["xor"], *self.bitmaps[output], self.num_inputs):
+                # on ties, the backends are preferred in the order they are listed
+                backend = min(trees, key=num_gates.get)
+                log.info(f"Output {output} needs fewer gates with a decision tree ({backend}, "
+                         f"{num_gates[backend]} gates) than any two-level logic, not minimizing it")
+                self.known_terms[output] = []
+                self.tree_outputs[output] = backend
+
+    def get_input_order(self):
+        if self.input_order is None:
+            self.input_order = input_order(list(self.bitmaps.values()), self.num_inputs)
+            if self.input_order != list(range(self.num_inputs)):
+                log.info(f"Order of the inputs in the decision trees: "
+                         f"{[self.input_names[input_idx] for input_idx in self.input_order]}")
+        return self.input_order
+
+    def _minimize(self, minimize_function, logic, timed_out, output_times):
+        if self.options.cache_dir is None:
+            return minimize_function(logic, self.num_inputs, self.options.minimize_jobs,
+                                     minimizer=self.options.minimizer, timeout=self.options.minimize_timeout,
+                                     timed_out=timed_out, dont_cares=self.dont_cares, output_times=output_times)
+        with MinimizationCache(self.options.cache_dir, self.options.cache_max_entries) as cache:
+            return minimize_function(logic, self.num_inputs, self.options.minimize_jobs, cache,
+                                     self.options.minimizer, self.options.minimize_timeout, timed_out,
+                                     self.dont_cares, output_times)
+
+    def choose_forms(self, terms, zero_terms):
+        if self.options.form == "pos":
+            return {output: "pos" for output in zero_terms}
+
+        forms = {}
+        chosen = choose_forms({output: terms[output] for output in zero_terms}, zero_terms,
+                              literal_signals(self.input_names), self.options.tree)
+        for output, (form, costs) in chosen.items():
+            forms[output] = form
+            self.form_costs[output] = costs
+            log.info(f"Output {output}: estimated gates {costs}, using the "
+                     f"{'product of sums' if form == 'pos' else 'sum of products'}")
+        return forms
 
     # ------------------------------------------------------------------------------
-    # Create the parts and insert them into the design at start locations
-    # that will be modified later on;
-    # omit the OR gates
-
-    # No additional NOT gates and buffers expected
-    assert num_all_buffers == (num_inputs + num_outputs)
-    assert num_all_not_gates == num_inputs
-
-    # Input buffers and NOT gates
-    for k in range(num_inputs):
-        wokwi_gate_buffer_inst = wokwi_gate_buffer.copy()
-        wokwi_gate_buffer_inst["id"] = "input_" + input_names[k]
-        wokwi_gate_buffer_inst["top"] = 2 * k * wokwi_gate_spacing_v
-        wokwi_gate_buffer_inst["left"] = 0
-        wokwi_design["parts"].append(wokwi_gate_buffer_inst)
-
-        wokwi_gate_not_inst = wokwi_gate_not.copy()
-        wokwi_gate_not_inst["id"] = "input_not_" + input_names[k]
-        wokwi_gate_not_inst["top"] = (2 * k + 1) * wokwi_gate_spacing_v
-        wokwi_gate_not_inst["left"] = 0
-        wokwi_design["parts"].append(wokwi_gate_not_inst)
-
-        # directly connect the negated inputs to the buffers of the non-negated inputs
-        con = [f"input_not_{input_names[k]}:IN", f"input_{input_names[k]}:IN",
-               con_color_termination, default_con_termination_instr]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
-    log.debug("Added input buffer and NOT gate parts to the wokwi design")
-    log.debug("Also connected their inputs together as they are derived from the same inputs")
-
-    # AND gates
-    for k in range(num_all_and_gates):
-        wokwi_gate_and_inst = wokwi_gate_and2.copy()
-        wokwi_gate_and_inst["id"] = f"gate_and_{k}"
-        wokwi_gate_and_inst["top"] = k * wokwi_gate_spacing_v
-        wokwi_gate_and_inst["left"] = 2 * wokwi_gate_spacing_h
-        wokwi_design["parts"].append(wokwi_gate_and_inst)
-    log.debug("Added AND gate parts to the wokwi design")
+    # Create the input buffers and NOT gates (for the negated inputs)
+    def add_input_parts(self):
+        # Input buffers and NOT gates
+        for k in range(self.num_inputs):
+            wokwi_gate_buffer_inst = wokwi_gate_buffer.copy()
+            wokwi_gate_buffer_inst["id"] = "input_" + self.input_names[k]
+            wokwi_gate_buffer_inst["top"] = 2 * k * wokwi_gate_spacing_v
+            wokwi_gate_buffer_inst["left"] = 0
+            self.design.add_part(wokwi_gate_buffer_inst)
+
+            wokwi_gate_not_inst = wokwi_gate_not.copy()
+            wokwi_gate_not_inst["id"] = "input_not_" + self.input_names[k]
+            wokwi_gate_not_inst["top"] = (2 * k + 1) * wokwi_gate_spacing_v
+            wokwi_gate_not_inst["left"] = 0
+            self.design.add_part(wokwi_gate_not_inst)
+
+            # directly connect the negated inputs to the buffers of the non-negated inputs
+            con = [f"input_not_{self.input_names[k]}:IN", f"input_{self.input_names[k]}:IN",
+                   con_color_termination, default_con_termination_instr]
+            self.design.add_connection(con)
+        log.debug("Added input buffer and NOT gate parts to the wokwi design")
+        log.debug("Also connected their inputs together as they are derived from the same inputs")
 
     # ------------------------------------------------------------------------------
-    # second iteration over all outputs is to connect inputs with first stage of AND gates
-    log.info("")
-    log.info("Connecting inputs with first stage of AND gates for every output.")
-    for output in logic:
-        log.info(f"Connecting input inside the wokwi design to first AND gate stage "
-                 f"(later used for output {output})...")
-
-        # iterate over the terms of the CNF output function
-        for term_idx in range(logic_meta[output]["num_terms"]):
-            log.debug("---")  # we need some visual separator here
-            log.debug(
-                f"  Processing first AND stage of term #{term_idx + 1} of the CNF function for output {output}...")
-
-            # if the last AND gate has not been fully used, terminate it
-            terminate_current_and_gate()
-
-            select_next_and_gate()
+    # Create the parts and insert them into the design, they are placed once all of them are connected
+    # (see `place_parts()`); omit the OR gates
+    def add_input_and_and_gate_parts(self):
+        self.add_input_parts()
+
+        # AND gates
+        for k in range(self.num_all_and_gates):
+            wokwi_gate_and_inst = wokwi_gate_and2.copy()
+            wokwi_gate_and_inst["id"] = f"gate_and_{k}"
+            self.design.add_part(wokwi_gate_and_inst)
+        log.debug("Added AND gate parts to the wokwi design")
 
-            # iterate over every input variable and see if it is used or not;
-            # if it is used check if the negated or original variable is used
-            current_term_and_gates_for_first_stage = []
-            for input_idx in range(num_inputs):
-
-                if logic_meta[output]['qm_terms_raw'][term_idx][input_idx] in ['0', '1']:
-                    (and_gate_idx, and_gate_port_idx, and_gate_port_name) = allocate_next_free_and_gate_inport()
-                    log.debug(f"    Allocated port #{and_gate_port_idx} ('{and_gate_port_name}') of "
-                              f"AND gate #{and_gate_idx}")
+    # ------------------------------------------------------------------------------
+    # second iteration over all outputs is to connect inputs with first stage of AND gates
+    def connect_first_and_stage(self):
+        log.info("")
+        log.info("Connecting inputs with first stage of AND gates for every output.")
+        # first stage AND gates of the terms wired so far (only reused when terms are shared between outputs)
+        wired_terms = {}
+        for output in self.logic:
+            log.info(f"Connecting input inside the wokwi design to first AND gate stage "
+                     f"(later used for output {output})...")
+            meta = self.logic_meta[output]
+
+            # iterate over the terms of the CNF output function
+            for term_idx in range(meta["num_terms"]):
+                log.debug("---")  # we need some visual separator here
+                log.debug("  Processing first AND stage of term #%d of the CNF function for output %s...",
+                          term_idx + 1, output)
+
+                term = meta['terms'][term_idx]
+                if self.options.multi_output and term in wired_terms:
+                    log.debug("  Term is shared with a previous output, reusing AND gates %s", wired_terms[term])
+                    meta["and_gates_first_stage"].append(wired_terms[term])
+                    continue
+
+                # if the last AND gate has not been fully used, terminate it
+                self.and_gates.terminate()
+
+                self.and_gates.select_next()
+
+                # iterate over the input variables used in the term;
+                # check if the negated or original variable is used
+                current_term_and_gates_for_first_stage = []
+                for input_idx, negated in term.literals(self.num_inputs):
+                    (and_gate_idx, and_gate_port_idx, and_gate_port_name) = \
+                        self.and_gates.allocate_next_free_inport()
+                    log.debug("    Allocated port #%d ('%s') of AND gate #%d", and_gate_port_idx, and_gate_port_name,
+                              and_gate_idx)
 
                     # put AND gate in a list as reminder to work on them later
                     current_term_and_gates_for_first_stage.append(and_gate_idx)
 
-                    if '0' == logic_meta[output]['qm_terms_raw'][term_idx][input_idx]:
-                        log.debug(f"    Use negated input {input_names[input_idx]}")
+                    if negated:
+                        log.debug("    Use negated input %s", self.input_names[input_idx])
                         # connect current AND's input port to negated device input
-                        con = [f"input_not_{input_names[input_idx]}:OUT",
+                        con = [f"input_not_{self.input_names[input_idx]}:OUT",
                                f"gate_and_{and_gate_idx}:{and_gate_port_name}",
                                con_color_neginput_and, default_con_instr]
                     else:
-                        log.debug(f"    Use input {input_names[input_idx]}")
+                        log.debug("    Use input %s", self.input_names[input_idx])
                         # connect current AND's input port to non-negated device input
-                        con = [f"input_{input_names[input_idx]}:OUT",
+                        con = [f"input_{self.input_names[input_idx]}:OUT",
                                f"gate_and_{and_gate_idx}:{and_gate_port_name}",
                                con_color_input_and, default_con_instr]
-                    log.debug("      Connection: " + str(con))
-                    wokwi_design["connections"].append(con)
+                    self.design.add_connection(con)
 
-            # if the last AND gate has not been fully used (odd number of inputs), terminate it
-            terminate_current_and_gate()
+                # if the last AND gate has not been fully used (odd number of inputs), terminate it
+                self.and_gates.terminate()
 
-            and_gates_used_during_stage = list(set(current_term_and_gates_for_first_stage))
+                and_gates_used_during_stage = list(dict.fromkeys(current_term_and_gates_for_first_stage))
 
-            logic_meta[output]["and_gates_first_stage"].append(and_gates_used_during_stage)
+                meta["and_gates_first_stage"].append(and_gates_used_during_stage)
+                wired_terms[term] = and_gates_used_during_stage
 
-            log.debug(f"  Processing first AND stage of term #{term_idx + 1} of the CNF function for "
-                      f"output {output} is done and used AND gates {and_gates_used_during_stage}")
+                log.debug("  Processing first AND stage of term #%d of the CNF function for output %s is done and "
+                          "used AND gates %s", term_idx + 1, output, and_gates_used_during_stage)
 
-        log.info(f"All AND gates required in the first AND gate stage for "
-                 f"output {output}: {str(logic_meta[output]['and_gates_first_stage'])}")
-        # next loop iteration for the function of the next output
-        # ------------------------------------------------------------------------------
-    log.info("Connecting inputs with first stage of AND gates for every output completed.")
+            log.info("All AND gates required in the first AND gate stage for output %s: %s", output,
+                     meta['and_gates_first_stage'])
+            # next loop iteration for the function of the next output
+            # ------------------------------------------------------------------------------
+        log.info("Connecting inputs with first stage of AND gates for every output completed.")
 
     # ------------------------------------------------------------------------------
     # third iteration merges all first stage AND gates down to a single 'root'
     # and gate as output of the CNF term -- which then in turn will need to be OR'ed to get the output
-    log.info("")
-    log.info("Merges all first stage AND gates down to a single 'root' AND gate (for every term of every output)")
-    for output in logic:
-        and_gates_for_first_or_stage = []
-
-        for current_term_and_gates_for_first_stage in logic_meta[output]['and_gates_first_stage']:
-            # log.info(current_term_and_gates_for_first_stage)
-
-            if len(current_term_and_gates_for_first_stage) == 0:
-                log.error("Something went wrong with the first stage of AND gates for current term.")
-            elif len(current_term_and_gates_for_first_stage) == 1:
-                output_and_gates_for_stage = current_term_and_gates_for_first_stage[0]
-                log.info(f"Single AND gate #{output_and_gates_for_stage} does not need to be merged.")
-                and_gates_for_first_or_stage.append(output_and_gates_for_stage)
-            elif len(current_term_and_gates_for_first_stage) > 1:
-                log.info(f"Merging AND gates {current_term_and_gates_for_first_stage} down to single AND gate...")
-
-                terminate_current_and_gate()
-
-                # starting point
-                input_gates_for_stage = current_term_and_gates_for_first_stage
-
-                log.warning("Entering potential endless loop (trying to merge AND gates)")
-                depth = 1
-                while True:
-                    output_and_gates_for_stage = []
-
-                    for input_gate_for_stage in input_gates_for_stage:
-                        (and_gate_idx, and_gate_port_idx, and_gate_port_name) = allocate_next_free_and_gate_inport()
-
-                        if and_gate_port_idx == 0:
-                            get_part_by_id(f"gate_and_{and_gate_idx}")["left"] += depth * wokwi_gate_spacing_h
-
-                        # put AND gate in a list as reminder to work on them later
-                        output_and_gates_for_stage.append(and_gate_idx)
-
-                        # connect previous AND gate's output to current AND gate's input port
-                        con = [f"gate_and_{input_gate_for_stage}:OUT",
-                               f"gate_and_{and_gate_idx}:{and_gate_port_name}",
-                               con_color_and_and_interconnect, default_con_instr]
-                        log.debug("    Connection: " + str(con))
-                        wokwi_design["connections"].append(con)
-
-                    # remove duplicates
-                    output_and_gates_for_stage = list(set(output_and_gates_for_stage))
-
-                    if len(output_and_gates_for_stage) == 1:
-                        log.debug(f"  Merged to single AND gate: {output_and_gates_for_stage[0]}")
-                        and_gates_for_first_or_stage.append(output_and_gates_for_stage[0])
-                        break
-                    else:
-                        log.debug(f"  Still having more than one AND gate left: {output_and_gates_for_stage}, "
-                                  f"turning another round")
-                        terminate_current_and_gate()
-                        depth += 1  # turn another round and keep track of depth for the layout
-
-                        # output of this round is input for next round
-                        input_gates_for_stage = output_and_gates_for_stage
-
-        log.info(f"Remaining AND gates (final stage): {and_gates_for_first_or_stage} for "
-                 f"the output {output} to be connected to OR gates")
-        logic_meta[output]['inputs_for_first_or_gate_stage'] = and_gates_for_first_or_stage
-    log.info("Merges of all first stage AND gates down to a single 'root' AND gate completed.")
+    def merge_and_gates(self):
+        log.info("")
+        log.info("Merges all first stage AND gates down to a single 'root' AND gate (for every term of every output)")
+        # root AND gates of the terms merged so far, shared terms are fanned out to all of their outputs
+        root_and_gates = {}
+        for output in self.logic:
+            and_gates_for_first_or_stage = []
+
+            for current_term_and_gates_for_first_stage in self.logic_meta[output]['and_gates_first_stage']:
+                if len(current_term_and_gates_for_first_stage) == 0:
+                    log.error("Something went wrong with the first stage of AND gates for current term.")
+                elif len(current_term_and_gates_for_first_stage) == 1:
+                    output_and_gates_for_stage = current_term_and_gates_for_first_stage[0]
+                    log.info("Single AND gate #%s does not need to be merged.", output_and_gates_for_stage)
+                    and_gates_for_first_or_stage.append(output_and_gates_for_stage)
+                    self.and_gate_depths[output_and_gates_for_stage] = 1
+                elif tuple(current_term_and_gates_for_first_stage) in root_and_gates:
+                    root_and_gate = root_and_gates[tuple(current_term_and_gates_for_first_stage)]
+                    log.info("AND gates %s have already been merged down to AND gate #%s, fanning it out to output %s",
+                             current_term_and_gates_for_first_stage, root_and_gate, output)
+                    and_gates_for_first_or_stage.append(root_and_gate)
+                else:
+                    log.info("Merging AND gates %s down to single AND gate...", current_term_and_gates_for_first_stage)
+
+                    self.and_gates.terminate()
+                    root_and_gate, tree = self.merge_gates(self.and_gates, current_term_and_gates_for_first_stage,
+                                                           [1] * len(current_term_and_gates_for_first_stage),
+                                                           con_color_and_and_interconnect)
+                    log.debug("  Merged to single AND gate: %s", root_and_gate)
+                    and_gates_for_first_or_stage.append(root_and_gate)
+                    root_and_gates[tuple(current_term_and_gates_for_first_stage)] = root_and_gate
+                    self.and_gate_depths[root_and_gate] = tree.arrival
+
+            log.info("Remaining AND gates (final stage): %s for the output %s to be connected to OR gates",
+                     and_gates_for_first_or_stage, output)
+            self.logic_meta[output]['inputs_for_first_or_gate_stage'] = and_gates_for_first_or_stage
+        log.info("Merges of all first stage AND gates down to a single 'root' AND gate completed.")
 
     # ------------------------------------------------------------------------------
     # fourth iteration creates first stage of OR gates (in order to OR all terms for every output);
     # and connects the AND gate from the previous stage (=the final AND stage) to it
-    log.info("")
-    log.info("Combining mini terms: Create first stage of OR gates (in order to OR all terms for every output) ")
-    log.info("and connect the AND gate from the previous stage (=the final AND stage) to it.")
-    for output in logic:
-        terminate_current_or_gate()
+    def connect_first_or_stage(self):
+        log.info("")
+        log.info("Combining mini terms: Create first stage of OR gates (in order to OR all terms for every output) ")
+        log.info("and connect the AND gate from the previous stage (=the final AND stage) to it.")
+        for output in self.logic:
+            self.or_gates.terminate()
 
-        select_next_or_gate()
+            self.or_gates.select_next()
 
-        output_or_gates_for_stage = []
+            output_or_gates_for_stage = []
 
-        gates_for_first_stage = logic_meta[output]['inputs_for_first_or_gate_stage']
+            gates_for_first_stage = self.logic_meta[output]['inputs_for_first_or_gate_stage']
 
-        if len(gates_for_first_stage) == 0:
-            log.error("Something went wrong with the first stage of OR gates for current output.")
-        elif len(gates_for_first_stage) == 1:
-            log.warning(f"Single mini term for output {output}: AND gate output (AND gate #{gates_for_first_stage[0]})")
-            log.warning("Creating a dummy OR gate (which does not need to be then merged down).")
+            if len(gates_for_first_stage) == 0:
+                log.error("Something went wrong with the first stage of OR gates for current output.")
+            elif len(gates_for_first_stage) == 1:
+                log.warning(f"Single mini term for output {output}: AND gate output "
+                            f"(AND gate #{gates_for_first_stage[0]})")
+                log.warning("Creating a dummy OR gate (which does not need to be then merged down).")
 
-            (or_gate_idx, or_gate_port_idx, or_gate_port_name) = allocate_next_free_or_gate_inport()
+                (or_gate_idx, or_gate_port_idx, or_gate_port_name) = self.or_gates.allocate_next_free_inport()
 
-            # put OR gate in a list as reminder to work on them later
-            output_or_gates_for_stage.append(or_gate_idx)
+                # put OR gate in a list as reminder to work on them later
+                output_or_gates_for_stage.append(or_gate_idx)
+                self.or_gate_depths[or_gate_idx] = self.and_gate_depths[gates_for_first_stage[0]] + 1
 
-            # connect AND gate's output port to OR gate's input port
-            con = [f"gate_and_{gates_for_first_stage[0]}:OUT",
-                   f"gate_or_{or_gate_idx}:{or_gate_port_name}",
-                   con_color_and_or_interconnect, default_con_instr]
-            log.debug("    Connection: " + str(con))
-            wokwi_design["connections"].append(con)
+                # connect AND gate's output port to OR gate's input port
+                con = [f"gate_and_{gates_for_first_stage[0]}:OUT",
+                       f"gate_or_{or_gate_idx}:{or_gate_port_name}",
+                       con_color_and_or_interconnect, default_con_instr]
+                self.design.add_connection(con)
 
-            # directly terminate it, as it's only a dummy OR gate (second inport not needed)
-            terminate_current_or_gate()
+                # directly terminate it, as it's only a dummy OR gate (second inport not needed)
+                self.or_gates.terminate()
 
-        elif len(gates_for_first_stage) > 1:
-            log.info(f"Connecting outputs of AND gates {gates_for_first_stage} to OR gate...")
+            elif len(gates_for_first_stage) > 1:
+                log.info("Connecting outputs of AND gates %s to OR gate...", gates_for_first_stage)
 
-            output_or_gates_for_stage = []
+                output_or_gates_for_stage = []
 
-            for input_gate_for_stage in gates_for_first_stage:
-                (or_gate_idx, or_gate_port_idx, or_gate_port_name) = allocate_next_free_or_gate_inport()
+                if self.options.tree == "arrival":
+                    # the terms that are ready first share the first stage OR gates
+                    gates_for_first_stage = sorted(gates_for_first_stage, key=self.and_gate_depths.get)
 
-                # put OR gate in a list as reminder to work on them later
-                output_or_gates_for_stage.append(or_gate_idx)
+                for input_gate_for_stage in gates_for_first_stage:
+                    (or_gate_idx, or_gate_port_idx, or_gate_port_name) = self.or_gates.allocate_next_free_inport()
 
-                # connect AND gate's output port to OR gate's input port
-                con = [f"gate_and_{input_gate_for_stage}:OUT", f"gate_or_{or_gate_idx}:{or_gate_port_name}",
-                       con_color_and_or_interconnect, default_con_instr]
-                log.debug("    Connection: " + str(con))
-                wokwi_design["connections"].append(con)
+                    # put OR gate in a list as reminder to work on them later
+                    output_or_gates_for_stage.append(or_gate_idx)
+
+                    # connect AND gate's output port to OR gate's input port
+                    con = [f"gate_and_{input_gate_for_stage}:OUT", f"gate_or_{or_gate_idx}:{or_gate_port_name}",
+                           con_color_and_or_interconnect, default_con_instr]
+                    self.design.add_connection(con)
+                    self.or_gate_depths[or_gate_idx] = max(self.or_gate_depths.get(or_gate_idx, 0),
+                                                           self.and_gate_depths[input_gate_for_stage] + 1)
 
                 # remove duplicates
-                output_or_gates_for_stage = list(set(output_or_gates_for_stage))
+                output_or_gates_for_stage = list(dict.fromkeys(output_or_gates_for_stage))
 
-        terminate_current_or_gate()
+            self.or_gates.terminate()
 
-        log.info(f"First stage of OR gates (connected to AND gates): {output_or_gates_for_stage} for output {output}")
-        logic_meta[output]['or_gates_first_stage'] = output_or_gates_for_stage
-    log.info("Done combining mini terms (AND gates) by first stage of OR gates.")
+            log.info("First stage of OR gates (connected to AND gates): %s for output %s", output_or_gates_for_stage,
+                     output)
+            self.logic_meta[output]['or_gates_first_stage'] = output_or_gates_for_stage
+        log.info("Done combining mini terms (AND gates) by first stage of OR gates.")
 
     # ------------------------------------------------------------------------------
     # fifth iteration merges all first stage OR gates down to a single 'root'
     # OR gate and connect them to the output buffers
-    log.info("")
-    log.info("Merges all first stage OR gates down to a single 'root' OR gate and connect them to the output buffers")
-    max_or_gate_stages = 0
-    for output in logic:
-        log.info(f"Performing the merges of all OR gates for output {output}")
+    def merge_or_gates(self):
+        log.info("")
+        log.info("Merges all first stage OR gates down to a single 'root' OR gate and connect them to the "
+                 "output buffers")
+        for output in self.logic:
+            log.info(f"Performing the merges of all OR gates for output {output}")
 
-        final_or_gate_for_output = None
+            final_or_gate_for_output = None
 
-        terminate_current_or_gate()
+            self.or_gates.terminate()
 
-        # starting point
-        input_gates_for_stage = logic_meta[output]['or_gates_first_stage']
-        # log.info(logic_meta[output]['or_gates_first_stage'])
+            # starting point
+            input_gates_for_stage = self.logic_meta[output]['or_gates_first_stage']
 
-        depth = 1
-        max_or_gate_stages = max(max_or_gate_stages, depth)
+            self.max_or_gate_stages = max(self.max_or_gate_stages, 1)
 
-        if not hasattr(input_gates_for_stage, "__len__"):
-            input_gates_for_stage = [input_gates_for_stage]
-            log.warning("input_gates_for_stage is scalar but that should already be handled correctly")
+            if not hasattr(input_gates_for_stage, "__len__"):
+                input_gates_for_stage = [input_gates_for_stage]
+                log.warning("input_gates_for_stage is scalar but that should already be handled correctly")
 
-        log.info(f"Number of OR gates to be merged: {len(input_gates_for_stage)}, i.e. {input_gates_for_stage}")
+            log.info("Number of OR gates to be merged: %d, i.e. %s", len(input_gates_for_stage), input_gates_for_stage)
 
-        if len(input_gates_for_stage) == 1:
-            log.info("Only single OR gate, therefore directly connect it to the output buffer")
-            final_or_gate_for_output = input_gates_for_stage[0]
-        else:
-            log.warning("Entering potential endless loop (trying to merge OR gates)")
-            while True:
-                output_or_gates_for_stage = []
+            if len(input_gates_for_stage) == 1:
+                log.info("Only single OR gate, therefore directly connect it to the output buffer")
+                final_or_gate_for_output = input_gates_for_stage[0]
+            else:
+                final_or_gate_for_output, tree = self.merge_gates(
+                    self.or_gates, input_gates_for_stage,
+                    [self.or_gate_depths[gate_idx] for gate_idx in input_gates_for_stage], con_color_or_or_interconnect)
+                log.debug("  Merged to single OR gate: %s", final_or_gate_for_output)
+                self.max_or_gate_stages = max(self.max_or_gate_stages, 1 + tree.depth)
 
-                for input_gate_for_stage in input_gates_for_stage:
-                    (or_gate_idx, or_gate_port_idx, or_gate_port_name) = allocate_next_free_or_gate_inport()
-                    # log.info(f"Allocated OR gate {or_gate_idx}")
+            log.info(f"Identified #{final_or_gate_for_output} as final OR gate for the "
+                     f"output {output} to be connected to output buffer")
 
-                    # if or_gate_port_idx == 0:
-                    #    get_part_by_id(f"gate_or_{and_gate_idx}")["left"] += depth * wokwi_gate_spacing_h
-
-                    # put OR gate in a list as reminder to work on them later
-                    output_or_gates_for_stage.append(or_gate_idx)
+            # stor in meta dictionary
+            self.logic_meta[output]['final_or_gate'] = final_or_gate_for_output
 
-                    # connect previous OR gate's output to current OR gate's input port
-                    con = [f"gate_or_{input_gate_for_stage}:OUT", f"gate_or_{or_gate_idx}:{or_gate_port_name}",
-                           con_color_or_or_interconnect, default_con_instr]
-                    log.debug("    Connection: " + str(con))
-                    wokwi_design["connections"].append(con)
+            # connect AND gate's output port to OR gate's input port
+            con = [f"gate_or_{final_or_gate_for_output}:OUT", f"output_{output}:IN",
+                   con_color_or_output, default_con_instr]
+            self.design.add_connection(con)
+
+        log.info(f"Max AND gate stages: {self.num_and_stages_max_overall}")
+        log.info(f"Max  OR gate stages: {self.max_or_gate_stages}")
+
+    def merge_gates(self, gates, input_gates, arrivals, con_color):
+        """
+        Merge the outputs of the gates `input_gates` (indices) down to a single gate with a tree of new gates of the
+        same kind, planned up front (see `reduction.plan_tree`); returns the index of its root gate and the tree.
+        """
+        tree = plan_tree(len(input_gates), arrivals, self.options.tree)
+        nodes = list(input_gates)
+        for a, b in tree.gates:
+            for node in (a, b):
+                (gate_idx, _, gate_port_name) = gates.allocate_next_free_inport()
+
+                # connect previous gate's output to current gate's input port
+                con = [f"gate_{gates.kind}_{nodes[node]}:OUT", f"gate_{gates.kind}_{gate_idx}:{gate_port_name}",
+                       con_color, default_con_instr]
+                self.design.add_connection(con)
+            nodes.append(gate_idx)
+        return nodes[-1], tree
+
+    def add_or_gate_and_output_parts(self):
+        # OR gates
+        for k in range(self.or_gates.idx + 1):
+            wokwi_gate_or_inst = wokwi_gate_or2.copy()
+            wokwi_gate_or_inst["id"] = f"gate_or_{k}"
+            self.design.add_part(wokwi_gate_or_inst)
+        log.debug("Added OR gate parts to the wokwi design")
+
+        self.add_output_parts()
+
+    def add_output_parts(self):
+        # Output buffers (placed right of the gates, in this order, see `place_parts()`)
+        for k in range(self.num_outputs):
+            wokwi_gate_buffer_inst = wokwi_gate_buffer.copy()
+            wokwi_gate_buffer_inst["id"] = "output_" + self.output_names[k]
+            self.design.add_part(wokwi_gate_buffer_inst)
+        log.debug("Added output buffer parts to the wokwi design")
 
-                # remove duplicates
-                output_or_gates_for_stage = list(set(output_or_gates_for_stage))
+    # ------------------------------------------------------------------------------
+    # Build the AND gate trees of all terms and the OR gate trees of all outputs in a structurally hashed netlist,
+    # i.e. every pair of signals is only combined once by a gate of each kind, then add its parts and connections
+    def build_and_trees(self):
+        log.info("")
+        log.info("Building the AND gate trees of the terms and the OR gate trees of the outputs...")
+
+        # (OR gate trees of the clauses and AND gate trees of the outputs for products of sums)
+        sop_outputs = self.sop_outputs()
+        self.term_gates = build_term_trees(self.netlist,
+                                           {output: self.logic_meta[output]["terms"] for output in sop_outputs},
+                                           {output: self.logic_meta[output]["form"] for output in sop_outputs},
+                                           literal_signals(self.input_names), self.options.tree)
+        for output in sop_outputs:
+            self.logic_meta[output]['inputs_for_first_or_gate_stage'] = \
+                [gate.index for gate in self.term_gates[output]]
+
+    def build_or_trees(self):
+        netlist = self.netlist
+        roots = build_root_trees(netlist, self.term_gates,
+                                 {output: self.logic_meta[output]["form"] for output in self.term_gates},
+                                 self.options.tree)
+        for output, root in roots.items():
+            self.output_gates[output] = root
+            if root.kind == 'or':
+                self.logic_meta[output]['final_or_gate'] = root.index
+        self.gates = netlist.gates[self.num_kept_gates:]
+        self.num_all_and_gates = netlist.num_gates('and')
+        self.num_and_stages_max_overall = netlist.max_level('and')
+        self.max_or_gate_stages = netlist.max_level('or')
+        self.num_mux_stages = netlist.max_level('mux')
+        self.num_xor_stages = netlist.max_level('xor')
+        log.info(f"Built {netlist.num_gates('and')} AND gate(s) in max. {self.num_and_stages_max_overall} stage(s) "
+                 f"and {netlist.num_gates('or')} OR gate(s) in max. {self.max_or_gate_stages} stage(s), "
+                 f"reused existing gates {netlist.num_reused} time(s)")
+        if netlist.num_gates('mux'):
+            log.info(f"Built {netlist.num_gates('mux')} multiplexer(s) in max. {self.num_mux_stages} stage(s)")
+        if netlist.num_gates('xor'):
+            log.info(f"Built {netlist.num_gates('xor')} XOR gate(s) in max. {self.num_xor_stages} stage(s)")
+
+    def sop_outputs(self):
+        return [output for output in self.outputs_to_build if self.logic_meta[output]["backend"] == "sop"]
 
-                if len(output_or_gates_for_stage) == 1:
-                    log.debug(f"  Merged to single OR gate: {output_or_gates_for_stage}")
-                    final_or_gate_for_output = output_or_gates_for_stage[0]
-                    break
+    # ------------------------------------------------------------------------------
+    # Choose the synthesis backend of every output (see `synthesis`): the one given by the options or, with 'auto',
+    # the one with the lowest estimated number of gates
+    def select_backends(self):
+        if self.options.backend != "auto":
+            for output in self.outputs_to_build:
+                self.set_backend(output, self.options.backend)
+            return
+
+        for output, backend in self.tree_outputs.items():
+            self.set_backend(output, backend)
+        outputs = [output for output in self.outputs_to_build if output not in self.tree_outputs]
+        costs = estimate_costs({output: self.bitmaps[output] for output in outputs},
+                               {output: self.logic_meta[output]["terms"] for output in outputs},
+                               literal_signals(self.input_names), self.options.tree,
+                               {output: self.logic_meta[output]["form"] for output in outputs},
+                               self.get_input_order())
+        for output, output_costs in costs.items():
+            # on ties, the backends are preferred in the order they are listed
+            backend = min(backends[1:], key=output_costs.get)
+            self.set_backend(output, backend)
+            self.logic_meta[output]["backend_costs"] = output_costs
+            log.info(f"Output {output}: estimated gates {output_costs}, using backend '{backend}'")
+
+    def set_backend(self, output, backend):
+        self.logic_meta[output]["backend"] = backend
+        if backend != "sop":
+            # only the backend 'sop' builds two-level logic
+            self.logic_meta[output]["form"] = None
+
+    def build_backend_outputs(self):
+        literals = literal_signals(self.input_names)
+        trees = {"mux": MuxTreeBuilder(self.netlist, literals, self.get_input_order()),
+                 "xor": XorTreeBuilder(self.netlist, literals, self.get_input_order())}
+        for output in self.outputs_to_build:
+            backend = self.logic_meta[output]["backend"]
+            if backend in trees:
+                log.debug(f"  Building decision tree ({backend}) for output {output}")
+                signal = trees[backend].build(*self.bitmaps[output])
+                # an output that is just an input (or its negation) gets a dummy gate, like a single term
+                self.output_gates[output] = self.netlist.driver.get(signal) or self.netlist.gate('or', signal,
+                                                                                                 signal)
+            elif backend == "rom":
+                log.debug(f"  Building decoder lines for output {output}")
+                self.output_gates[output] = build_rom(
+                    self.netlist, bits_to_rows(self.bitmaps[output][0] & self.bitmaps[output][1]), literals)
+
+    def map_wide_gates(self):
+        self.gates = map_gates(self.gates, self.options.max_gate_inputs,
+                               [gate.output for gate in self.output_gates.values()])
+        self.num_all_and_gates = sum(1 for gate in self.gates if gate.kind == 'and')
+        self.num_and_stages_max_overall = max((gate.level for gate in self.gates if gate.kind == 'and'), default=0)
+        self.max_or_gate_stages = max((gate.level for gate in self.gates if gate.kind == 'or'), default=0)
+        log.info(f"Mapped onto {self.num_all_and_gates} AND gate(s) in max. {self.num_and_stages_max_overall} "
+                 f"stage(s) and {len(self.gates) - self.num_all_and_gates} OR gate(s) in max. "
+                 f"{self.max_or_gate_stages} stage(s) with up to {self.options.max_gate_inputs} inputs")
+
+    def add_gate_and_output_parts(self):
+        # the parts are placed once they are connected (see `place_parts()`)
+        for kind in ('and', 'mux', 'xor', 'or'):
+            for gate in self.gates:
+                if gate.kind == kind:
+                    wokwi_gate_inst = wokwi_gates[kind, len(gate.inputs)].copy()
+                    wokwi_gate_inst["id"] = gate.id
+                    self.design.add_part(wokwi_gate_inst)
+        if not self.incremental:
+            # the output buffers of an incremental regeneration are kept
+            self.add_output_parts()
+
+    def place_parts(self):
+        # the parts kept by an incremental regeneration keep their positions
+        num_columns = place_design(self.design, wokwi_gate_spacing_h, wokwi_gate_spacing_v, self.kept_parts)
+        if not self.incremental:
+            self.layout = {"columns": num_columns}
+        elif num_columns > self.layout["columns"]:
+            log.warning("The new gates need more columns than the previous design, some of them are placed next to "
+                        "the output buffers; generate the design from scratch for a clean layout.")
+
+    def connect_gates(self):
+        for gate in self.gates:
+            for signal, port_name in zip(gate.inputs, wokwi_gate_pins[gate.kind]):
+                if port_name == 'B' and gate.inputs[0] == gate.inputs[1]:
+                    # single input, terminate the second input port
+                    con = [f"{gate.id}:A", f"{gate.id}:B", con_color_termination, default_con_termination_instr]
                 else:
-                    log.debug(f"  Still having more than one OR gate left: {output_or_gates_for_stage}, "
-                              f"turning another round")
-                    terminate_current_and_gate()
-                    depth += 1  # turn another round and keep track of depth for the layout
-                    max_or_gate_stages = max(max_or_gate_stages, depth)
-                    input_gates_for_stage = output_or_gates_for_stage  # output of this round is input for next round
-
-        log.info(f"Identified #{final_or_gate_for_output} as final OR gate for the "
-                 f"output {output} to be connected to output buffer")
-
-        # stor in meta dictionary
-        logic_meta[output]['final_or_gate'] = final_or_gate_for_output
-
-        # connect AND gate's output port to OR gate's input port
-        con = [f"gate_or_{final_or_gate_for_output}:OUT", f"output_{output}:IN",
-               con_color_or_output, default_con_instr]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
-
-    log.info(f"Max AND gate stages: {num_and_stages_max_overall}")
-    log.info(f"Max  OR gate stages: {max_or_gate_stages}")
-
-    # OR gates
-    for k in range(global_or_gate_idx + 1):
-        wokwi_gate_or_inst = wokwi_gate_or2.copy()
-        wokwi_gate_or_inst["id"] = f"gate_or_{k}"
-        wokwi_gate_or_inst["top"] = k * wokwi_gate_spacing_v
-        wokwi_gate_or_inst["left"] = wokwi_gate_and_inst[
-                                         "left"] + num_and_stages_max_overall * wokwi_gate_spacing_h  # TODO/FIXME
-        wokwi_design["parts"].append(wokwi_gate_or_inst)
-    log.debug("Added OR gate parts to the wokwi design")
-
-    # Output buffers
-    for k in range(num_outputs):
-        wokwi_gate_buffer_inst = wokwi_gate_buffer.copy()
-        wokwi_gate_buffer_inst["id"] = "output_" + output_names[k]
-        wokwi_gate_buffer_inst["top"] = 2 * k * wokwi_gate_spacing_v  # keep some space between outputs
-        wokwi_gate_buffer_inst["left"] = wokwi_gate_or_inst[
-                                             "left"] + max_or_gate_stages * wokwi_gate_spacing_h  # TODO/FIXME
-        wokwi_design["parts"].append(wokwi_gate_buffer_inst)
-    log.debug("Added output buffer parts to the wokwi design")
-
-    log.info(f"Finished the wokwi design!")
-
-    if args.tinytapeout and args.test:
-        log.warning("Cannot combine flags '--test'/'-t' and '--tinytapeout'/'--tt'. Removing '-tt'.")
-        args.tinytapeout = False
-
-    if args.test:
+                    con = [signal, f"{gate.id}:{port_name}", self._con_color(signal, gate.kind), default_con_instr]
+                self.design.add_connection(con)
+        for output, gate in self.output_gates.items():
+            con = [gate.output, f"output_{output}:IN", con_color_or_output, default_con_instr]
+            self.design.add_connection(con)
+
+    @staticmethod
+    def _con_color(signal, kind):
+        if signal.startswith("gate_mux_"):
+            return con_color_mux_interconnect
+        if signal.startswith("gate_xor_"):
+            return con_color_xor_interconnect
+        if signal.startswith("input_not_"):
+            return con_color_neginput_and
+        if signal.startswith("input_"):
+            return con_color_input_and
+        if signal.startswith("gate_and_"):
+            return con_color_and_and_interconnect if kind == 'and' else con_color_and_or_interconnect
+        return con_color_or_or_interconnect
+
+    def add_test_framework(self):
         log.info("Generating verification code and test framework")
-        arduino_sketch_template = None
+        self.generate_arduino_sketch()
+        if self.design.arduino_sketch:
+            # add the Arduino MEGA to the wokwi schematic's parts list
+            self.design.add_part(copy.deepcopy(wokwi_arduino_mega))
+
+            # add the serial monitor to the wokwi schematic
+            self.design.serial_monitor = {
+                "display": "always",
+                "newline": "lf"
+            }
+
+            # connect design inputs to Arduino outputs and design outputs to Arduino inputs
+            arduino_mega_outputs, arduino_mega_inputs = get_arduino_mega_pins(self.num_inputs, self.num_outputs)
+            for input, pin in zip(self.input_names, arduino_mega_outputs):
+                con = [f"mega:{pin}", f"input_{input}:IN", con_color_arduino_interconnect, default_con_instr]
+                self.design.add_connection(con)
+            for output, pin in zip(self.output_names, arduino_mega_inputs):
+                con = [f"mega:{pin}", f"output_{output}:OUT", con_color_arduino_interconnect, default_con_instr]
+                self.design.add_connection(con)
+
+    def generate_arduino_sketch(self):
+        reason = arduino_incompatibility(self.num_inputs, self.num_outputs)
+        if reason:
+            log.error(f"Unable to generate the Arduino test framework: {reason}.")
+            return
         with open(arduino_sketch_template_file, 'r') as f:
             arduino_sketch = f.read()
         if arduino_sketch:
-            # generate the code, then add parts and connections to the wokwi schematic
-
             # replace the placeholders with actual values
-            arduino_sketch = arduino_sketch.replace("{DESIGN_NUM_USED_INPUTS_PH}", f"{num_inputs}u")
-            arduino_sketch = arduino_sketch.replace("{DESIGN_NUM_USED_OUTPUTS_PH}", f"{num_outputs}u")
-            expected_bin_out_vals = get_expected_bin_out_vals(output_names, in_data["outputs"], num_inputs)
+            arduino_sketch = arduino_sketch.replace("{DESIGN_NUM_USED_INPUTS_PH}", f"{self.num_inputs}u")
+            arduino_sketch = arduino_sketch.replace("{DESIGN_NUM_USED_OUTPUTS_PH}", f"{self.num_outputs}u")
+            in_pins, out_pins = get_arduino_mega_pins(self.num_inputs, self.num_outputs)
+            arduino_sketch = arduino_sketch.replace("{DESIGN_IN_PINS_PH}", ", ".join(in_pins))
+            arduino_sketch = arduino_sketch.replace("{DESIGN_OUT_PINS_PH}", ", ".join(out_pins))
+            expected_bin_out_vals = get_expected_bin_out_vals(self.output_names, self.bitmaps, self.num_inputs)
             arduino_sketch = arduino_sketch.replace("{VERIFICATION_EXPECTED_OUT_VALS_PH}", expected_bin_out_vals)
+            out_care_masks = get_bin_out_care_masks(self.output_names, self.bitmaps, self.num_inputs)
+            # without don't cares, all outputs are checked and the table is only a placeholder
+            arduino_sketch = arduino_sketch.replace("{VERIFICATION_HAS_DONT_CARES_PH}",
+                                                    "true" if out_care_masks else "false")
+            arduino_sketch = arduino_sketch.replace("{VERIFICATION_OUT_CARE_MASKS_PH}",
+                                                    out_care_masks or format_c_bytes(b"\xff"))
 
             # TODO: allow to use non-constant values for placeholders by controlling the from the
             #       Python generator (e.g. by adding command line arguments)
@@ -906,179 +1529,423 @@ if __name__ == '__main__':
             arduino_sketch = arduino_sketch.replace("{VERIFICATION_SETUP_TIME_MS_PH}", "50u")
             arduino_sketch = arduino_sketch.replace("{VERIFICATION_HOLD_TIME_MS_PH}", "350u")
 
-            # save the generated Arduino sketch
-            with open("sketch.ino", 'w') as f:
-                f.write(arduino_sketch)
-
-            # add the Arduino MEGA to the wokwi schematic's parts list
-            wokwi_design["parts"].append(wokwi_arduino_mega)
-
-            # add the serial monitor to the wokwi schematic
-            wokwi_design["serialMonitor"] = {
-                "display": "always",
-                "newline": "lf"
-            }
-
-            # connect design inputs to Arduino outputs
-            arduino_mega_outputs = range(2, 11 + 1)
-            out_idx = 0
-            for input in input_names:
-                con = [f"mega:{arduino_mega_outputs[out_idx]}", f"input_{input}:IN",
-                       con_color_arduino_interconnect, default_con_instr]
-                log.debug("    Connection: " + str(con))
-                wokwi_design["connections"].append(con)
-                out_idx += 1
-
-            # connect design outputs to Arduino outputs
-            arduino_mega_inputs = range(12, 21 + 1)
-            in_idx = 0
-            for output in output_names:
-                con = [f"mega:{arduino_mega_inputs[in_idx]}", f"output_{output}:OUT",
-                       con_color_arduino_interconnect, default_con_instr]
-                log.debug("    Connection: " + str(con))
-                wokwi_design["connections"].append(con)
-                in_idx += 1
-
+            # keep the generated Arduino sketch, it's up to the caller to save it
+            self.design.arduino_sketch = arduino_sketch
         else:
             log.error("Unable to open Arduino sketch template file.")
 
-    if args.tinytapeout or args.tinytapeout3:
+    def add_tinytapeout_parts(self):
         log.info("Adding parts from template for tinytapeout")
 
         # add parts to the wokwi schematic's parts list
-        wokwi_design["parts"].append(wokwi_dip_switch8)
-        wokwi_design["parts"].append(wokwi_clock_generator)
-        if args.tinytapeout:
-            wokwi_design["parts"].append(wokwi_chip_input_8pins)
-        elif args.tinytapeout3:
-            wokwi_design["parts"].append(wokwi_board_tt_block_input_8)
-        wokwi_design["parts"].append(wokwi_slide_switch)
-        wokwi_design["parts"].append(wokwi_pushbutton)
-
-        # TODO/FIXME: move the next two parts to the far right, next to the output buffer of the top-most signal
-        if args.tinytapeout:
-            wokwi_design["parts"].append(wokwi_chip_output_8pins)
-        elif args.tinytapeout3:
-            wokwi_design["parts"].append(wokwi_board_tt_block_output)
-        wokwi_design["parts"].append(wokwi_7segment)
-
-        vcc_btn = wokwi_vcc.copy()
+        self.design.add_part(copy.deepcopy(wokwi_dip_switch8))
+        self.design.add_part(copy.deepcopy(wokwi_clock_generator))
+        if self.options.tinytapeout:
+            self.design.add_part(copy.deepcopy(wokwi_chip_input_8pins))
+        elif self.options.tinytapeout3:
+            self.design.add_part(copy.deepcopy(wokwi_board_tt_block_input_8))
+        self.design.add_part(copy.deepcopy(wokwi_slide_switch))
+        self.design.add_part(copy.deepcopy(wokwi_pushbutton))
+
+        # the output chip and the 7-segment display go one column right of the output buffers (see `place_parts()`),
+        # keeping their distance from the template
+        output_left = (3 + self.layout["columns"]) * wokwi_gate_spacing_h
+        shift = output_left - wokwi_chip_output_8pins["left"]
+        chip_output = copy.deepcopy(wokwi_chip_output_8pins if self.options.tinytapeout else wokwi_board_tt_block_output)
+        chip_output["left"] += shift
+        self.design.add_part(chip_output)
+        sevseg = copy.deepcopy(wokwi_7segment)
+        sevseg["left"] += shift
+        self.design.add_part(sevseg)
+
+        vcc_btn = copy.deepcopy(wokwi_vcc)
         vcc_btn["id"] = "vcc_btn"
         vcc_btn["top"] = -450
         vcc_btn["left"] = -320
-        vcc_dipsw = wokwi_vcc.copy()
+        vcc_dipsw = copy.deepcopy(wokwi_vcc)
         vcc_dipsw["id"] = "vcc_dipsw"
         vcc_dipsw["top"] = -240
         vcc_dipsw["left"] = -420
-        wokwi_design["parts"].append(vcc_btn)
-        wokwi_design["parts"].append(vcc_dipsw)
+        self.design.add_part(vcc_btn)
+        self.design.add_part(vcc_dipsw)
 
-        gnd_7seg = wokwi_gnd.copy()
+        gnd_7seg = copy.deepcopy(wokwi_gnd)
         gnd_7seg["id"] = "gnd_7seg"
         gnd_7seg["top"] = -70
-        gnd_7seg["left"] = 1100
-        wokwi_design["parts"].append(gnd_7seg)
+        gnd_7seg["left"] = sevseg["left"]
+        self.design.add_part(gnd_7seg)
 
         # add connections
         for i in range(1, 8 + 1):
             con = ["vcc_dipsw:VCC", f"sw1:{i}a", con_color_vcc_interconnect, default_con_instr]
-            log.debug("    Connection: " + str(con))
-            wokwi_design["connections"].append(con)
+            self.design.add_connection(con)
 
         con = ["btn1:2.r", "sw2:3", "orange", ["h90", "*", "v10"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
 
         con = ["vcc_btn:VCC", "btn1:1.r", con_color_vcc_interconnect, ["v0"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
 
         con = ["sw2:1", "clock1:CLK", "green", ["v0"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
 
         con = ["sw2:3", "sw1:1b", "violet", ["v0"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
 
         con = ["chip1:EXTIN0", "sw2:2", "green", ["h0", "v-40", "h-20"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
 
         for i in range(2, 8 + 1):
             con = [f"chip1:EXTIN{i - 1}", f"sw1:{i}b", "violet", ["h0"]]
-            log.debug("    Connection: " + str(con))
-            wokwi_design["connections"].append(con)
+            self.design.add_connection(con)
 
         con = ["chip2:EXTOUT0", "sevseg1:A", con_color_7seg_interconnect, ["h21.01", "v-28.8", "h96"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT1", "sevseg1:B", con_color_7seg_interconnect, ["h11.41", "v-48", "h115.2", "v38.4"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT2", "sevseg1:C", con_color_7seg_interconnect,
                ["h30.61", "v-38.4", "h115.2", "v105.6", "h-28.8"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT3", "sevseg1:D", con_color_7seg_interconnect, ["h49.81", "v57.6", "h48"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT4", "sevseg1:E", con_color_7seg_interconnect, ["v9.6", "h-48", "v-38.4"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT5", "sevseg1:F", con_color_7seg_interconnect, ["h69.01", "v-57.6", "h28.8"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT6", "sevseg1:G", con_color_7seg_interconnect, ["h78.61", "v-57.6"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["chip2:EXTOUT7", "sevseg1:DP", con_color_7seg_interconnect, ["v28.8", "h136.21"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
-        con = ["chip2:EXTOUT7", "sevseg1:DP", con_color_7seg_interconnect, ["v28.8", "h136.21"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
         con = ["gnd_7seg:GND", "sevseg1:COM.1", con_color_gnd_interconnect, ["v0"]]
-        log.debug("    Connection: " + str(con))
-        wokwi_design["connections"].append(con)
+        self.design.add_connection(con)
 
         # Check number of inputs
+        num_inputs = self.num_inputs
         if num_inputs > 8:
             log.warning("Won't be able to connect more than 8 inputs!")
             num_inputs = 8
 
         for k in range(num_inputs):
-            con = [f"chip1:IN{k}", "input_" + input_names[k] + ":IN", con_color_board_interconnect, default_con_instr]
-            log.debug("    Connection: " + str(con))
-            wokwi_design["connections"].append(con)
+            con = [f"chip1:IN{k}", "input_" + self.input_names[k] + ":IN", con_color_board_interconnect,
+                   default_con_instr]
+            self.design.add_connection(con)
 
         # Check number of outputs
+        num_outputs = self.num_outputs
         if num_outputs > 8:
             log.warning("Won't be able to connect more than 8 outputs!")
             num_outputs = 8
 
         for k in range(num_outputs):
-            con = ["output_" + output_names[k] + ":OUT", f"chip2:OUT{k}", con_color_board_interconnect,
+            con = ["output_" + self.output_names[k] + ":OUT", f"chip2:OUT{k}", con_color_board_interconnect,
                    default_con_instr]
-            log.debug("    Connection: " + str(con))
-            wokwi_design["connections"].append(con)
+            self.design.add_connection(con)
+
+
+# ------------------------------------------------------------------------------
+# command line interface
+
+def main():
+    # imported here so that the library API does not pay for it
+    import coloredlogs
+
+    parser = ArgumentParser(description='%(prog)s is a lookup table generator tool for wokwi',
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument('-v', '--verbose',
+                        action='count',
+                        help='log level (-v: INFO, -vv: DEBUG)',
+                        default=0)
+
+    parser.add_argument('-f', '--file',
+                        dest='in_file',
+                        help='path to JSON logic input file; if none is given, stdout is used',
+                        default="logic.json")
+
+    parser.add_argument('-o', '--outfile',
+                        dest='out_file',
+                        help='path to generated wokwi schematic file',
+                        default=None)
+
+    parser.add_argument('-p', '--parts_only',
+                        action='store_true',
+                        help='dump wokwi parts list only',
+                        default=False)
+
+    parser.add_argument('-c', '--connections_only',
+                        action='store_true',
+                        help='dump wokwi connections list only',
+                        default=False)
+
+    parser.add_argument('--compact',
+                        action='store_true',
+                        help='write the JSON output without indentation, with one part or connection per line '
+                             '(smaller and faster to write for large designs)',
+                        default=False)
+
+    parser.add_argument('-t', '--test',
+                        action='store_true',
+                        help='add an Arduino MEGA as test framework and generate Arduino verification code',
+                        default=False)
+
+    parser.add_argument('-tt', '--tinytapeout',
+                        help='add default parts used in tinytapeout 1/2 wokwi template schematic',
+                        action='store_true',
+                        default=False)
+
+    parser.add_argument('-tt3', '--tinytapeout3',
+                        help='add default parts used in tinytapeout 3 wokwi template schematic',
+                        action='store_true',
+                        default=False)
+
+    parser.add_argument('-b', '--batch',
+                        dest='batch',
+                        help='batch mode: generate one design per input file; path to a directory '
+                             '(all its *.logic.json files) or a glob pattern; replaces -f and -o',
+                        default=None)
+
+    parser.add_argument('-d', '--outdir',
+                        dest='out_dir',
+                        help='output directory for the generated files in batch mode',
+                        default=".")
+
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help='number of worker processes in batch mode (None: number of CPUs)',
+                        default=None)
+
+    parser.add_argument('-mj', '--minimize-jobs',
+                        dest='minimize_jobs',
+                        type=int,
+                        help='number of worker processes used to minimize the outputs in parallel '
+                             '(1: no parallelization, 0: number of CPUs)',
+                        default=1)
+
+    parser.add_argument('--minimizer',
+                        choices=list(minimizers),
+                        help='logic minimization backend: Quine-McCluskey (qm), exact minimization (exact) '
+                             'or heuristic Espresso-style minimization for large numbers of inputs (espresso)',
+                        default="qm")
+
+    parser.add_argument('--minimize-timeout',
+                        dest='minimize_timeout',
+                        type=float,
+                        metavar='SECONDS',
+                        help='time limit for the minimization of a single output; when it expires, a cheaper, '
+                             'partially reduced cover is used for that output (None: no limit)',
+                        default=None)
 
-    # log.debug( json.dumps(logic_meta, indent=4) )
+    parser.add_argument('--multi-output',
+                        dest='multi_output',
+                        action='store_true',
+                        help='multi-output minimization: share product terms (and their AND gates) between outputs',
+                        default=False)
 
-    wokwi_design_dump = wokwi_design
+    parser.add_argument('--no-structural-hashing',
+                        dest='structural_hashing',
+                        action='store_false',
+                        help='allocate the gates of every term and output separately instead of reusing existing '
+                             'gates that combine the same pair of signals',
+                        default=True)
+
+    parser.add_argument('--tree',
+                        choices=tree_modes,
+                        help='shape of the AND and OR gate trees: minimum depth (balanced) or combining the signals '
+                             'in the order they arrive, so that late signals are close to the root and the critical '
+                             'path gets shorter (arrival)',
+                        default="balanced")
+
+    parser.add_argument('--backend',
+                        choices=backends,
+                        help='synthesis backend of the outputs: sum of products (sop), trees of 2:1 multiplexers '
+                             '(mux), decision trees with XOR gates for arithmetic and parity functions (xor), ROM '
+                             'style with shared decoder lines (rom) or the one with the lowest estimated number of '
+                             'gates per output (auto); mux, xor and rom need structural hashing, without it auto '
+                             'builds sums of products',
+                        default="auto")
+
+    parser.add_argument('--form',
+                        choices=forms,
+                        help='two-level form of the outputs of the backend sop: sum of products of the ones (sop), '
+                             'product of sums of the zeros (pos) or the one with fewer gates per output (auto, several '
+                             'times slower); pos needs structural hashing',
+                        default="sop")
+
+    parser.add_argument('--max-gate-inputs',
+                        dest='max_gate_inputs',
+                        type=int,
+                        choices=range(2, max_gate_inputs + 1),
+                        help='widest AND/OR gates used: with 3 or 4, the trees of two-input gates are mapped onto '
+                             'fewer, wider gates (needs structural hashing)',
+                        default=2)
+
+    parser.add_argument('--verify',
+                        action='store_true',
+                        help='simulate the generated design for all input combinations and compare the outputs '
+                             'with the truth table (exit code 1 if they differ)',
+                        default=False)
+
+    parser.add_argument('--strict',
+                        action='store_true',
+                        help='fail (exit code 1) if the integrity check of the generated connections finds problems '
+                             '(unconnected or multi-driven gate inputs, unconnected gate outputs, duplicate '
+                             'connections) instead of only logging warnings',
+                        default=False)
+
+    parser.add_argument('--stats',
+                        dest='stats_file',
+                        metavar='FILE',
+                        help='write a JSON report with the time and memory of every phase, gate, term and literal '
+                             'counts and stages per output to FILE (in batch mode: one *.stats.json file per design '
+                             'in the output directory); tracing the memory slows down the generation',
+                        default=None)
+
+    parser.add_argument('--manifest',
+                        action='store_true',
+                        help='write a manifest next to the output file (e.g. out.manifest.json for out.json; in '
+                             'batch mode: one per design) that allows to regenerate the design incrementally',
+                        default=False)
+
+    parser.add_argument('--incremental',
+                        dest='previous_file',
+                        metavar='PREVIOUS',
+                        help='regenerate incrementally from the design file PREVIOUS and its manifest: only the '
+                             'outputs whose truth table column changed are minimized and wired again, all other '
+                             'parts and connections are kept (implies --manifest)',
+                        default=None)
+
+    parser.add_argument('--cache-dir',
+                        dest='cache_dir',
+                        help='directory of the persistent cache for minimization results',
+                        default=default_cache_dir())
+
+    parser.add_argument('--cache-size',
+                        dest='cache_size',
+                        type=int,
+                        help='maximum number of cached minimization results; '
+                             'the least recently used ones are evicted first',
+                        default=default_max_entries)
+
+    parser.add_argument('--no-cache',
+                        dest='no_cache',
+                        action='store_true',
+                        help='do not use the persistent cache for minimization results',
+                        default=False)
+
+    args = parser.parse_args()
+
+    # Create and configure logger object
+    # coloredlogs.install(level='DEBUG', fmt='%(asctime)s [%(levelname)8s] %(message)s')
+
+    if args.verbose > 0:
+        log_level = 'INFO'
+        if args.verbose > 1:
+            log_level = 'DEBUG'
+    else:
+        log_level = 'WARNING'
+
+    coloredlogs.install(level=log_level, fmt='[%(levelname)8s] %(message)s')
+
+    log.info(f"Log level: {log_level}")
+
+    if args.parts_only and args.connections_only:
+        parser.error("Combination of -p and -c is currently not supported.")
+
+    if (args.manifest or args.previous_file) and (args.parts_only or args.connections_only):
+        parser.error("Flags --manifest and --incremental need the complete design, not -p or -c.")
+    if (args.manifest or args.previous_file) and not args.out_file and not args.batch:
+        parser.error("Flags --manifest and --incremental need an output file (-o).")
+    if args.previous_file and args.batch:
+        parser.error("Flag --incremental is not supported in batch mode.")
+
+    if args.tinytapeout:
+        log.warning("Please note that --tinytapeout/-tt are legacy options, use --tinytapeout3/-tt3 instead.")
+    if args.tinytapeout and args.tinytapeout3:
+        parser.error("Combination of --tt and --tt3 is not supported.")
+
+    options = Options(test=args.test,
+                      tinytapeout=args.tinytapeout,
+                      tinytapeout3=args.tinytapeout3,
+                      minimize_jobs=args.minimize_jobs or None,
+                      cache_dir=None if args.no_cache else args.cache_dir,
+                      cache_max_entries=args.cache_size,
+                      minimizer=args.minimizer,
+                      minimize_timeout=args.minimize_timeout,
+                      multi_output=args.multi_output,
+                      structural_hashing=args.structural_hashing,
+                      tree=args.tree,
+                      max_gate_inputs=args.max_gate_inputs,
+                      backend=args.backend,
+                      form=args.form,
+                      verify=args.verify,
+                      strict=args.strict,
+                      stats=args.stats_file is not None,
+                      manifest=args.manifest or args.previous_file is not None)
+
+    if args.batch:
+        in_files = find_logic_files(args.batch)
+        if not in_files:
+            log.error(f"No input files found for '{args.batch}'. Use flag '-h' to get usage.")
+            exit(1)
+        log.info(f"Generating {len(in_files)} design(s) into directory '{args.out_dir}'...")
+        start_time = time.perf_counter()
+        results = generate_batch(in_files, args.out_dir, options, args.jobs, args.parts_only, args.connections_only,
+                                 args.compact)
+        print(format_batch_summary(results, time.perf_counter() - start_time))
+        if any(result["error"] for result in results):
+            exit(1)
+        return
+
+    try:
+        in_data = load_logic_file(args.in_file)
+    except FileNotFoundError:
+        log.error(f"Input file '{args.in_file}' cannot be found. Use flag '-h' to get usage.")
+        exit(1)
+
+    previous = None
+    if args.previous_file:
+        try:
+            previous = load_previous(args.previous_file)
+        except FileNotFoundError as e:
+            log.warning(f"Cannot regenerate the design incrementally ({e}), generating it from scratch.")
+
+    try:
+        design = generate(in_data, options, previous)
+    except RuntimeError as e:
+        log.error(e)
+        exit(1)
+
+    if design.arduino_sketch:
+        # save the generated Arduino sketch
+        with open("sketch.ino", 'w') as f:
+            f.write(design.arduino_sketch)
 
     # limit the dump; mutual exclusion of both options has been guaranteed earlier
     if args.parts_only:
         log.info("Only dumping wokwi parts.")
-        wokwi_design_dump = wokwi_design["parts"]
     elif args.connections_only:
         log.info("Only dumping wokwi connections.")
-        wokwi_design_dump = wokwi_design["connections"]
 
+    start_time = time.perf_counter()
     if args.out_file:
         log.info(f"Writing final wokwi design file '{args.out_file}'...")
         with open(args.out_file, 'w') as f:
-            json.dump(wokwi_design_dump, f, indent=4)
+            design.write(f, args.parts_only, args.connections_only, args.compact)
+        if design.manifest is not None:
+            with open(manifest_file_name(args.out_file), 'w') as f:
+                json.dump(design.manifest, f, indent=4)
     else:
         log.info("Dumping final wokwi design to stdout...")
-        print(json.dumps(wokwi_design_dump, indent=4))
+        design.write(sys.stdout, args.parts_only, args.connections_only, args.compact)
+        print()
+
+    if args.stats_file:
+        design.stats["phases"]["serialize"] = {"time": time.perf_counter() - start_time}
+        design.stats["wall_time"] += design.stats["phases"]["serialize"]["time"]
+        log.info(f"Writing statistics report '{args.stats_file}'...")
+        with open(args.stats_file, 'w') as f:
+            json.dump(design.stats, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Incremental regeneration of a wokwi design when only some output columns of the truth table change.
+
+Next to the design file (`diagram.json`), the generator writes a sidecar manifest (`diagram.manifest.json`, see
+`manifest_file_name()`) with the content address of every output column (see `mincache.cache_key`), its minimized
+terms, the options the design was generated with and the layout of the gate columns.
+When regenerating from the previous design and its manifest, only the outputs whose column changed are minimized
+and wired again: the gates only used by them are removed, all other parts and connections (including their ids,
+positions and any wire tweaks made in Wokwi) are kept, and the new gates get new ids.
+
+Incremental regeneration requires a design built with structural hashing (see `netlist.Netlist`) from the same
+inputs, outputs and options; otherwise the design is generated from scratch.
+"""
+
+import json
+import logging
+import os
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+manifest_version = 2
+
+# options that need to be the same for an incremental regeneration
+manifest_options = ("minimizer", "structural_hashing", "multi_output", "max_gate_inputs", "backend", "form",
+                    "test", "tinytapeout", "tinytapeout3")
+
+# gate parts that can be kept (the two-input gates of the structurally hashed netlist)
+gate_kinds = {"wokwi-gate-and-2": "and", "wokwi-gate-or-2": "or"}
+
+
+def manifest_file_name(diagram_file):
+    """Name of the sidecar manifest of a design file, e.g. 'adder.manifest.json' for 'adder.json'."""
+    base, extension = os.path.splitext(diagram_file)
+    return base + ".manifest" + (extension or ".json")
+
+
+def make_manifest(input_names, output_keys, terms, options, layout, forms):
+    """
+    Build the manifest of a generated design (JSON serializable dictionary); `forms` are the two-level forms of the
+    outputs ('sop', 'pos' if the terms cover the zeros, None for the other backends).
+    """
+    return {
+        "version": manifest_version,
+        "inputs": list(input_names),
+        "options": {name: getattr(options, name) for name in manifest_options},
+        "layout": layout,
+        "outputs": {output: {"key": key, "terms": [[cube.value, cube.care] for cube in terms[output]],
+                             "form": forms[output]}
+                    for output, key in output_keys.items()},
+    }
+
+
+def load_previous(diagram_file):
+    """Read a previously generated design file and its manifest; returns the pair (diagram, manifest)."""
+    with open(diagram_file, 'r') as f:
+        diagram = json.load(f)
+    with open(manifest_file_name(diagram_file), 'r') as f:
+        manifest = json.load(f)
+    return diagram, manifest
+
+
+def incompatibility(diagram, manifest, input_names, output_names, options):
+    """Reason why the design cannot be regenerated incrementally from the previous one (None if it can)."""
+    if manifest.get("version") != manifest_version:
+        return f"unsupported manifest version {manifest.get('version')}"
+    if not isinstance(diagram, dict) or "parts" not in diagram or "connections" not in diagram:
+        return "the previous design file is not a complete wokwi design"
+    if not options.structural_hashing or options.multi_output:
+        return "only designs built with structural hashing and without multi-output minimization are supported"
+    if manifest["inputs"] != list(input_names):
+        return "the inputs changed"
+    if list(manifest["outputs"]) != list(output_names):
+        return "the outputs changed"
+    changed_options = [name for name in manifest_options if manifest["options"].get(name) != getattr(options, name)]
+    if changed_options:
+        return f"the options {changed_options} changed"
+    unknown = sorted({part["type"] for part in diagram["parts"]
+                      if part["id"].startswith("gate_") and part["type"] not in gate_kinds})
+    if unknown:
+        return f"the previous design contains parts that cannot be kept: {unknown}"
+    return None
+
+
+def gate_sources(parts, nets):
+    """
+    Map the two-input gates of a design (by id) to their kind and the signals (driving output pins) of their
+    inputs A and B (see `design.Nets`), e.g. `{"gate_and_0": ("and", ["input_a:OUT", "input_not_b:OUT"])}`.
+    """
+    gates = {part["id"]: gate_kinds[part["type"]] for part in parts if part["type"] in gate_kinds}
+    return {gate_id: (kind, [nets.driver(f"{gate_id}:A"), nets.driver(f"{gate_id}:B")])
+            for gate_id, kind in gates.items()}
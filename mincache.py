@@ -0,0 +1,102 @@
+"""
+Persistent on-disk cache for the results of the logic minimization.
+
+The minimization of an output is a pure function of the number of inputs, the ones and the don't cares,
+so its result (the list of terms) can be reused whenever the same truth table column is seen again, even across
+different designs. The results are kept in an SQLite database; the least recently used entries are evicted when
+the cache grows beyond its maximum number of entries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+cache_file_name = "minimization.sqlite"
+default_max_entries = 100000
+# part of the cache key, to be increased whenever the format of the cached terms changes
+cache_format_version = 2
+
+
+def default_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "wokwi-lookup-table-generator")
+
+
+def cache_key(num_inputs, ones, dont_cares=(), engine="qm"):
+    """Content address for a minimization problem; the order of the ones and don't cares is not relevant."""
+    problem = json.dumps([cache_format_version, engine, num_inputs, sorted(ones), sorted(dont_cares)],
+                         separators=(',', ':'))
+    return hashlib.sha256(problem.encode()).hexdigest()
+
+
+class MinimizationCache:
+    """SQLite backed cache mapping `cache_key()`s to lists of terms with LRU eviction."""
+
+    def __init__(self, cache_dir=None, max_entries=default_max_entries):
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, cache_file_name)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # several (batch mode) processes may access the same cache, so wait for locks instead of failing
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS terms ("
+                        "key TEXT PRIMARY KEY, "
+                        "terms TEXT NOT NULL, "
+                        "last_used INTEGER NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS terms_last_used ON terms (last_used)")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+
+    def get(self, key):
+        """Get the cached list of terms or None; a hit marks the entry as most recently used."""
+        row = self.db.execute("SELECT terms FROM terms WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE terms SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, terms):
+        self.db.execute("INSERT OR REPLACE INTO terms (key, terms, last_used) VALUES (?, ?, ?)",
+                        (key, json.dumps(terms), time.time_ns()))
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        """Delete the least recently used entries that exceed the maximum number of entries."""
+        num_excess = len(self) - self.max_entries
+        if num_excess > 0:
+            log.debug(f"Evicting {num_excess} least recently used entries from the minimization cache")
+            self.db.execute("DELETE FROM terms WHERE key IN "
+                            "(SELECT key FROM terms ORDER BY last_used ASC LIMIT ?)", (num_excess,))
+
+    def clear(self):
+        self.db.execute("DELETE FROM terms")
+        self.db.commit()
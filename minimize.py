@@ -0,0 +1,739 @@
+"""
+Logic minimization backends ("minimizers") for the lookup table generator.
+
+Every minimizer takes the ones (row indices of the truth table where the output is '1'), the number of inputs and
+optional don't cares and returns the list of product terms as bit-packed `Cube`s. Their string form is the one of
+the `quine-mccluskey` package, i.e. one character per input (first input first): '1' for the input, '0' for the
+negated input, '-' if the input is not used in the term. Example for the inputs a, b, c: '1-0' means a AND NOT c.
+
+Available minimizers:
+
+- 'qm': Quine-McCluskey algorithm: all prime implicants and a greedy selection of the cover (the default)
+- 'exact': exact minimization (all prime implicants and a minimum cover of them), feasible for few inputs only
+- 'espresso': heuristic Espresso-style expand/irredundant/reduce loop, works for 10 to 16 inputs (a random 16-input
+  table takes about 7 seconds)
+"""
+
+import heapq
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import wait
+from mincache import cache_key
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+# maximum number of expand/irredundant/reduce iterations of the Espresso-style minimizer
+espresso_max_iterations = 20
+# the iterations stop early once one reduces the number of literals by less than this fraction
+espresso_min_gain = 0.005
+
+
+class Cube:
+    """
+    Product term as bit-packed pair of integers: bit i of `care` is set if input bit i is used in the term,
+    bit i of `value` tells if it is used as is (1) or negated (0); bits of `value` not in `care` are zero.
+    Input bit i corresponds to bit i of the row index of the truth table, i.e. the last input is bit 0.
+    """
+    __slots__ = ("value", "care")
+
+    def __init__(self, value, care):
+        self.value = value
+        self.care = care
+
+    @classmethod
+    def from_term(cls, term):
+        value = 0
+        care = 0
+        for char in term:
+            value <<= 1
+            care <<= 1
+            if char == '1':
+                value |= 1
+                care |= 1
+            elif char == '0':
+                care |= 1
+        return cls(value, care)
+
+    def to_term(self, num_inputs):
+        return _cube_to_term((self.value, self.care), num_inputs)
+
+    @property
+    def num_literals(self):
+        return _popcount(self.care)
+
+    def literals(self, num_inputs):
+        """Iterate over the literals of the term as (input index, negated) pairs, in the order of the inputs."""
+        care = self.care
+        while care:
+            bit = care.bit_length() - 1
+            yield num_inputs - 1 - bit, not (self.value >> bit) & 1
+            care ^= 1 << bit
+
+    def covers(self, minterm):
+        return (minterm & self.care) == self.value
+
+    def __eq__(self, other):
+        return isinstance(other, Cube) and self.value == other.value and self.care == other.care
+
+    def __hash__(self):
+        return hash((self.value, self.care))
+
+    def __repr__(self):
+        return f"Cube(value={self.value:#x}, care={self.care:#x})"
+
+
+def minimize_qm(ones, num_inputs, dont_cares=()):
+    ones = set(ones)
+    if not ones:
+        return []
+    primes = _prime_implicants(ones | set(dont_cares), num_inputs)
+    return _sorted_cubes(_qm_cover(primes, ones, num_inputs), num_inputs)
+
+
+def minimize_exact(ones, num_inputs, dont_cares=()):
+    ones = set(ones)
+    if not ones:
+        return []
+    primes = _prime_implicants(ones | set(dont_cares), num_inputs)
+    return _sorted_cubes(_minimum_cover(primes, ones), num_inputs)
+
+
+def minimize_espresso(ones, num_inputs, dont_cares=()):
+    ones = set(ones)
+    if not ones:
+        return []
+    return _sorted_cubes(_Espresso(ones, set(dont_cares), num_inputs).run(), num_inputs)
+
+
+def minimize_fallback(ones, num_inputs, dont_cares=()):
+    """
+    Cheap, partially reduced cover used when a minimizer runs out of time: start with the canonical sum of
+    minterms and greedily merge pairs of cubes that only differ in one input until no more merges are found.
+    """
+    full_care = (1 << num_inputs) - 1
+    allowed = set(ones) | set(dont_cares)
+    cubes = {(minterm, full_care) for minterm in ones}
+    while True:
+        merged = set()
+        used = set()
+        for value, care in sorted(cubes):
+            if (value, care) in used:
+                continue
+            for bit in range(num_inputs):
+                mask = 1 << bit
+                partner = (value ^ mask, care)
+                # a partner minterm may also be a don't care
+                if (care & mask) and partner not in used and (partner in cubes or
+                                                              (care == full_care and partner[0] in allowed)):
+                    used.add((value, care))
+                    used.add(partner)
+                    merged.add((value & ~mask, care & ~mask))
+                    break
+        if not merged:
+            return _sorted_cubes(cubes, num_inputs)
+        cubes = merged | (cubes - used)
+
+
+minimizers = {
+    "qm": minimize_qm,
+    "exact": minimize_exact,
+    "espresso": minimize_espresso,
+}
+
+
+def minimize_output(ones, num_inputs, minimizer="qm", dont_cares=()):
+    """Minimize the function of a single output; returns the list of terms (`Cube`s)."""
+    return minimizers[minimizer](ones, num_inputs, dont_cares)
+
+
+def minimize_outputs(logic, num_inputs, jobs=1, cache=None, minimizer="qm", timeout=None, timed_out=None,
+                     dont_cares=None, output_times=None):
+    """
+    Minimize the functions of all outputs given in `logic` (dictionary mapping output names to their ones);
+    `dont_cares` optionally maps output names to their don't cares (rows where the output value does not matter).
+    With `jobs` > 1 the outputs are minimized in parallel worker processes.
+    Results found in the (optional) `MinimizationCache` are reused, new results are added to it.
+    With a `timeout` (in seconds per output), minimizations that take longer are cancelled and replaced by the
+    result of `minimize_fallback()`; the names of these outputs are appended to the list `timed_out` (if given).
+    The time spent minimizing every output (in seconds, 0 for cached results, including the fallback for cancelled
+    minimizations) is stored in the dictionary `output_times` (if given).
+    Returns a dictionary mapping output names to their lists of terms (in the order of `logic`).
+    """
+    if minimizer not in minimizers:
+        raise ValueError(f"Unknown minimizer '{minimizer}', use one of {list(minimizers)}.")
+
+    if dont_cares is None:
+        dont_cares = {}
+    results = {}
+    keys = {}
+    if cache is not None:
+        for output in logic:
+            keys[output] = cache_key(num_inputs, logic[output], dont_cares.get(output, ()), minimizer)
+            cached = cache.get(keys[output])
+            if cached is not None:
+                log.debug(f"Using cached terms for output {output}")
+                results[output] = [Cube(value, care) for value, care in cached]
+
+    outputs = [output for output in logic if results.get(output) is None]
+    if timeout is not None:
+        log.debug(f"Running '{minimizer}' minimizer for outputs {outputs} with a timeout of {timeout} s...")
+        timed_terms = _minimize_with_timeout([(logic[output], dont_cares.get(output, ())) for output in outputs],
+                                             num_inputs, minimizer, timeout, jobs)
+    elif (jobs is not None and jobs <= 1) or len(outputs) <= 1:
+        timed_terms = []
+        for output in outputs:
+            log.debug(f"Running '{minimizer}' minimizer for output {output}...")
+            timed_terms.append(_timed_minimize_output(logic[output], num_inputs, minimizer,
+                                                      dont_cares.get(output, ())))
+    else:
+        log.debug(f"Running '{minimizer}' minimizer for outputs {outputs} in parallel...")
+        with ProcessPoolExecutor(max_workers=min(jobs or len(outputs), len(outputs))) as executor:
+            # map() returns the results in the order of the outputs, no matter which worker finishes first
+            timed_terms = list(executor.map(_timed_minimize_output, [logic[output] for output in outputs],
+                                            [num_inputs] * len(outputs), [minimizer] * len(outputs),
+                                            [dont_cares.get(output, ()) for output in outputs]))
+
+    if output_times is not None:
+        output_times.update((output, 0.0) for output in logic if output not in outputs)
+    for output, timed_result in zip(outputs, timed_terms):
+        if timed_result is None:
+            log.warning(f"Minimization of output {output} did not finish within {timeout} s, "
+                        f"falling back to a partially reduced cover (more gates)")
+            start_time = time.perf_counter()
+            results[output] = minimize_fallback(logic[output], num_inputs, dont_cares.get(output, ()))
+            if output_times is not None:
+                output_times[output] = timeout + time.perf_counter() - start_time
+            if timed_out is not None:
+                timed_out.append(output)
+            # don't cache the fallback, the next run may have more time
+            continue
+        output_terms, output_time = timed_result
+        results[output] = output_terms
+        if output_times is not None:
+            output_times[output] = output_time
+        if cache is not None:
+            cache.put(keys[output], [[cube.value, cube.care] for cube in output_terms])
+
+    if cache is not None:
+        log.info(f"Minimization cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+
+    return {output: results[output] for output in logic}
+
+
+def minimize_multi_output(logic, num_inputs, jobs=1, cache=None, minimizer="qm", timeout=None, timed_out=None,
+                          dont_cares=None, output_times=None):
+    """
+    Multi-output minimization: find a set of product terms that is shared between the outputs, so that every term
+    only needs to be built once (and fanned out to all outputs using it).
+    The candidate terms are the ones of the minimized single outputs and of the minimized intersections of all
+    pairs of outputs (i.e. terms that are implicants of both outputs), minimized with `minimize_outputs()`.
+    Then a greedy covering picks the terms with the best ratio of covered ones to the gates they cost; terms
+    already picked for another output only cost the additional OR gate input.
+    `output_times` receives the minimization times of the outputs and of the pairs of outputs (keyed by tuples).
+    Returns a dictionary mapping output names to their lists of terms like `minimize_outputs()`.
+    """
+    if dont_cares is None:
+        dont_cares = {}
+    outputs = list(logic)
+    problems = dict(logic)
+    problem_dont_cares = dict(dont_cares)
+    for i, output_a in enumerate(outputs):
+        for output_b in outputs[i + 1:]:
+            common_ones = set(logic[output_a]) & set(logic[output_b])
+            if common_ones:
+                problems[(output_a, output_b)] = sorted(common_ones)
+                # a shared term may also cover rows where one output is '1' and the other one is a don't care
+                problem_dont_cares[(output_a, output_b)] = sorted(
+                    ((set(logic[output_a]) | set(dont_cares.get(output_a, ()))) &
+                     (set(logic[output_b]) | set(dont_cares.get(output_b, ())))) - common_ones)
+    log.debug(f"Multi-output minimization with {len(problems) - len(outputs)} pair(s) of outputs with common ones")
+    candidates = minimize_outputs(problems, num_inputs, jobs, cache, minimizer, timeout, timed_out,
+                                  problem_dont_cares, output_times)
+
+    cube_rows = {}
+    for terms in candidates.values():
+        for cube in terms:
+            if (cube.value, cube.care) not in cube_rows:
+                cube_rows[(cube.value, cube.care)] = _cube_minterm_rows((cube.value, cube.care), num_inputs)
+    on_rows = {output: sum(1 << m for m in set(logic[output])) for output in outputs}
+    allowed_rows = {output: on_rows[output] | sum(1 << m for m in set(dont_cares.get(output, ())))
+                    for output in outputs}
+    # the outputs a candidate can be used for (all of its minterms need to be ones or don't cares of the output)
+    implied_outputs = {cube: [output for output in outputs if rows & ~allowed_rows[output] == 0]
+                       for cube, rows in cube_rows.items()}
+
+    uncovered = dict(on_rows)
+    selected = {output: [] for output in outputs}
+    built = set()
+
+    def score(cube):
+        gain = sum(_popcount(cube_rows[cube] & uncovered[output]) for output in implied_outputs[cube])
+        uses = sum(1 for output in implied_outputs[cube] if cube_rows[cube] & uncovered[output])
+        cost = uses + (0 if cube in built else max(1, _cube_cost(cube) - 1))
+        return gain / cost if gain else 0
+
+    # lazy greedy: scores can only decrease while the covering proceeds, so a candidate whose re-evaluated score
+    # is still at the top of the heap is the best one
+    heap = [(-score(cube), _cube_to_term(cube, num_inputs), cube) for cube in cube_rows]
+    heapq.heapify(heap)
+    while heap:
+        negative_score, term, cube = heapq.heappop(heap)
+        current = score(cube)
+        if current == 0:
+            continue
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, term, cube))
+            continue
+        for output in implied_outputs[cube]:
+            if cube_rows[cube] & uncovered[output]:
+                selected[output].append(cube)
+                uncovered[output] &= ~cube_rows[cube]
+        built.add(cube)
+
+    results = {}
+    for output in outputs:
+        if uncovered[output]:
+            # cannot happen as long as the single output covers are correct, but never return a wrong function
+            raise RuntimeError(f"Multi-output minimization did not cover all ones of output {output}")
+        selected[output] = _irredundant_shared(selected[output], cube_rows, on_rows[output], implied_outputs,
+                                               selected)
+        results[output] = _sorted_cubes(selected[output], num_inputs)
+    num_unique_terms = len({cube for terms in results.values() for cube in terms})
+    log.info(f"Multi-output minimization: {sum(len(candidates[output]) for output in outputs)} single output "
+             f"term(s) reduced to {num_unique_terms} shared term(s)")
+    return results
+
+
+def _timed_minimize_output(ones, num_inputs, minimizer, dont_cares):
+    # returns the terms and the time it took to find them
+    start_time = time.perf_counter()
+    terms = minimize_output(ones, num_inputs, minimizer, dont_cares)
+    return terms, time.perf_counter() - start_time
+
+
+def _minimize_in_child(conn, ones, num_inputs, minimizer, dont_cares):
+    conn.send(_timed_minimize_output(ones, num_inputs, minimizer, dont_cares))
+    conn.close()
+
+
+def _minimize_with_timeout(problems, num_inputs, minimizer, timeout, jobs):
+    """
+    Run every minimization (pair of ones and don't cares) in its own child process (at most `jobs` at the same
+    time) which is killed when it takes longer than `timeout` seconds; returns the list of results (terms, time),
+    None for the cancelled minimizations.
+    """
+    max_running = jobs or os.cpu_count() or 1
+    results = [None] * len(problems)
+    pending = list(range(len(problems)))
+    running = {}  # receiving end of the pipe -> (problem index, process, deadline)
+
+    while pending or running:
+        while pending and len(running) < max_running:
+            idx = pending.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            ones, dont_cares = problems[idx]
+            process = multiprocessing.Process(target=_minimize_in_child,
+                                              args=(sender, ones, num_inputs, minimizer, dont_cares), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (idx, process, time.monotonic() + timeout)
+
+        next_deadline = min(deadline for _, _, deadline in running.values())
+        for receiver in wait(list(running), timeout=max(0.0, next_deadline - time.monotonic())):
+            idx, process, _ = running.pop(receiver)
+            try:
+                results[idx] = receiver.recv()
+            except EOFError:
+                # the child died without a result, e.g. because it ran out of memory
+                log.error(f"Minimization process exited with code {process.exitcode} without a result")
+            receiver.close()
+            process.join()
+
+        now = time.monotonic()
+        for receiver, (idx, process, deadline) in list(running.items()):
+            if now >= deadline:
+                process.terminate()
+                process.join()
+                receiver.close()
+                del running[receiver]
+
+    return results
+
+
+# ------------------------------------------------------------------------------
+# helper functions;
+# internally, cubes are plain (value, care) tuples with the same meaning as the attributes of `Cube`
+
+def _cube_to_term(cube, num_inputs):
+    value, care = cube
+    term = ""
+    for bit in reversed(range(num_inputs)):
+        if not (care >> bit) & 1:
+            term += '-'
+        elif (value >> bit) & 1:
+            term += '1'
+        else:
+            term += '0'
+    return term
+
+
+def _sorted_cubes(cover, num_inputs):
+    # sort for deterministic results (in the order of their string representation)
+    return [Cube(value, care) for value, care in sorted(cover, key=lambda cube: _cube_to_term(cube, num_inputs))]
+
+
+def _popcount(value):
+    return bin(value).count('1')
+
+
+if hasattr(int, "bit_count"):
+    # much faster on big bitmaps, available since Python 3.10
+    _popcount = int.bit_count  # noqa: F811
+
+
+def _cube_cost(cube):
+    # a cube with less literals needs less gates
+    return _popcount(cube[1])
+
+
+def _cube_minterm_rows(cube, num_inputs):
+    # bitmap of the minterms covered by the cube: start with its smallest minterm and double it for every free bit
+    value, care = cube
+    rows = 1 << (value & care)
+    for bit in range(num_inputs):
+        if not (care >> bit) & 1:
+            rows |= rows << (1 << bit)
+    return rows
+
+
+def _irredundant_shared(cubes, cube_rows, on_rows, implied_outputs, selected):
+    # drop terms that are covered by the other terms of the output; terms that are used by less outputs are
+    # dropped first as they save the most gates
+    def num_uses(cube):
+        return sum(1 for output in implied_outputs[cube] if cube in selected[output])
+
+    kept = list(cubes)
+    for cube in sorted(cubes, key=lambda cube: (num_uses(cube), -_cube_cost(cube))):
+        others = 0
+        for other in kept:
+            if other != cube:
+                others |= cube_rows[other]
+        if on_rows & ~others == 0:
+            kept.remove(cube)
+    return kept
+
+
+def _prime_implicants(minterms, num_inputs):
+    """Tabular method: merge cubes that only differ in a single cared bit until no more merges are possible."""
+    full_care = (1 << num_inputs) - 1
+    cubes = {(m, full_care) for m in minterms}
+    primes = set()
+    while cubes:
+        # group the cubes by their care mask, only cubes with the same mask can be merged
+        by_care = {}
+        for value, care in cubes:
+            by_care.setdefault(care, set()).add(value)
+        merged = set()
+        next_cubes = set()
+        for care, values in by_care.items():
+            for value in values:
+                for bit in range(num_inputs):
+                    mask = 1 << bit
+                    if (care & mask) and not (value & mask) and (value | mask) in values:
+                        next_cubes.add((value, care & ~mask))
+                        merged.add((value, care))
+                        merged.add((value | mask, care))
+        primes |= cubes - merged
+        cubes = next_cubes
+    return primes
+
+
+def _cube_covers(cube, minterm):
+    value, care = cube
+    return (minterm & care) == value
+
+
+def _qm_cover(primes, ones, num_inputs):
+    """
+    Greedy cover selection like the one of the `quine-mccluskey` package, but in a fixed order (the package iterates
+    over sets of strings, i.e. its result depends on the hash seed of the Python interpreter): the prime implicants
+    are taken by descending rank (the number of ones covered, then the number of unused inputs) as long as they cover
+    further ones, then the most complex redundant implicant is dropped until none is left.
+    """
+    # bitmap of the covered ones per prime implicant (bit i stands for the i-th smallest one)
+    ones = sorted(ones)
+    rows = {cube: sum(1 << idx for idx, m in enumerate(ones) if _cube_covers(cube, m)) for cube in primes}
+
+    def rank(cube):
+        value, care = cube
+        return 4 * _popcount(rows[cube]) + 8 * (num_inputs - _popcount(care)) + _popcount(value)
+
+    def complexity(cube):
+        # negated inputs are weighted 1.5 times the inputs used as is
+        value, care = cube
+        return 2 * _popcount(value) + 3 * _popcount(care & ~value)
+
+    cover = []
+    covered = 0
+    for cube in sorted(primes, key=lambda cube: (-rank(cube), cube)):
+        if rows[cube] & ~covered:
+            cover.append(cube)
+            covered |= rows[cube]
+
+    while True:
+        redundant = []
+        for idx, cube in enumerate(cover):
+            others = 0
+            for other in cover[:idx] + cover[idx + 1:]:
+                others |= rows[other]
+            if not rows[cube] & ~others:
+                redundant.append(cube)
+        if not redundant:
+            return cover
+        cover.remove(max(redundant, key=lambda cube: (complexity(cube), cube)))
+
+
+def _minimum_cover(primes, ones):
+    """Select a minimum cost subset of the prime implicants that covers all ones (branch and bound)."""
+    primes = sorted(primes, key=lambda cube: (_cube_cost(cube), cube))
+    covering = {m: [p for p in primes if _cube_covers(p, m)] for m in ones}
+
+    # essential prime implicants are the only ones to cover some minterm
+    essentials = {covering[m][0] for m in ones if len(covering[m]) == 1}
+    remaining = {m for m in ones if not any(_cube_covers(p, m) for p in essentials)}
+
+    best = [None]
+
+    def cost(cover):
+        return len(cover), sum(_cube_cost(cube) for cube in cover)
+
+    def search(uncovered, chosen):
+        if best[0] is not None and cost(chosen) >= cost(best[0]):
+            # bound: adding cubes can't get any better than the best solution found so far
+            return
+        if not uncovered:
+            best[0] = list(chosen)
+            return
+        # branch on the minterm with the least candidates
+        minterm = min(uncovered, key=lambda m: (len(covering[m]), m))
+        for cube in covering[minterm]:
+            chosen.append(cube)
+            search({m for m in uncovered if not _cube_covers(cube, m)}, chosen)
+            chosen.pop()
+
+    search(remaining, [])
+    return sorted(essentials) + best[0]
+
+
+class _Espresso:
+    """
+    Heuristic two-level minimization in the style of Espresso.
+
+    The ON, don't care and OFF sets are kept as bitmaps (Python integers with one bit per row of the truth table),
+    so checking a cube against the OFF set or computing its coverage are a few operations on big integers.
+    """
+
+    def __init__(self, ones, dont_cares, num_inputs):
+        self.num_inputs = num_inputs
+        self.num_rows = 1 << num_inputs
+        self.all_rows = (1 << self.num_rows) - 1
+
+        # bitmaps of all rows where input bit i is set (var_rows[i]) respectively not set (not_var_rows[i])
+        self.var_rows = [self._var_rows(bit) for bit in range(num_inputs)]
+        self.not_var_rows = [self.all_rows & ~rows for rows in self.var_rows]
+
+        self.ones = ones
+        self.on_rows = self._rows_of_minterms(ones)
+        self.dc_rows = self._rows_of_minterms(dont_cares) & ~self.on_rows
+        self.off_rows = self.all_rows & ~(self.on_rows | self.dc_rows)
+        # bitmaps of the rows whose neighbor across input bit i is in the OFF set: the literal of input i of a cube
+        # can be raised unless the cube contains one of these rows
+        self.off_neighbors = [self._mirror_rows(self.off_rows, bit) for bit in range(num_inputs)]
+
+    def _var_rows(self, bit):
+        # one period: 2^bit rows where the bit is not set, followed by 2^bit rows where it is set
+        half = 1 << bit
+        rows = ((1 << half) - 1) << half
+        length = 2 * half
+        # repeat the period by doubling it until all rows are filled
+        while length < self.num_rows:
+            rows |= rows << length
+            length *= 2
+        return rows
+
+    @staticmethod
+    def _rows_of_minterms(minterms):
+        rows = 0
+        for m in minterms:
+            rows |= 1 << m
+        return rows
+
+    def _cube_rows(self, cube):
+        value, care = cube
+        rows = self.all_rows
+        for bit in range(self.num_inputs):
+            if (care >> bit) & 1:
+                rows &= self.var_rows[bit] if (value >> bit) & 1 else self.not_var_rows[bit]
+        return rows
+
+    def _mirror_rows(self, rows, bit):
+        # the rows with input `bit` inverted
+        shift = 1 << bit
+        return ((rows & self.var_rows[bit]) >> shift) | ((rows & self.not_var_rows[bit]) << shift)
+
+    def _raise_rows(self, rows, bit):
+        # rows of the cube without the literal of input `bit` (the rows plus their mirror along that input)
+        return rows | self._mirror_rows(rows, bit)
+
+    def _supercube(self, rows):
+        # smallest cube containing all the given rows
+        value = 0
+        care = 0
+        for bit in range(self.num_inputs):
+            has_one = rows & self.var_rows[bit]
+            has_zero = rows & self.not_var_rows[bit]
+            if has_one and not has_zero:
+                care |= 1 << bit
+                value |= 1 << bit
+            elif has_zero and not has_one:
+                care |= 1 << bit
+        return value, care
+
+    def expand(self, cube, rows, uncovered_rows):
+        """Raise literals of the cube as long as it doesn't hit the OFF set, prefer raises covering more ones."""
+        value, care = cube
+        # a literal that cannot be raised stays that way, the cube only grows
+        bits = [bit for bit in range(self.num_inputs) if (care >> bit) & 1 and not rows & self.off_neighbors[bit]]
+        while bits:
+            best = None
+            for bit in bits:
+                raised_rows = self._raise_rows(rows, bit)
+                gain = _popcount(raised_rows & uncovered_rows)
+                if best is None or gain > best[0]:
+                    best = (gain, bit, raised_rows)
+            _, raised_bit, rows = best
+            care &= ~(1 << raised_bit)
+            value &= ~(1 << raised_bit)
+            bits = [bit for bit in bits if bit != raised_bit and not rows & self.off_neighbors[bit]]
+        return (value, care), rows
+
+    def expand_cover(self, cover):
+        # expand the biggest cubes first, they are most likely to cover the others
+        cover = sorted(cover, key=lambda cube: (_cube_cost(cube), cube))
+        expanded = []
+        covered_rows = 0
+        for cube in cover:
+            rows = self._cube_rows(cube)
+            if expanded and (rows & ~covered_rows & self.on_rows) == 0:
+                # already covered by the cubes expanded so far
+                continue
+            cube, rows = self.expand(cube, rows, self.on_rows & ~covered_rows)
+            expanded.append((cube, rows))
+            covered_rows |= rows
+        return expanded
+
+    def initial_cover(self):
+        # expand minterms of the ON set that are not covered yet
+        cover = []
+        covered_rows = 0
+        full_care = (1 << self.num_inputs) - 1
+        for m in sorted(self.ones):
+            if (covered_rows >> m) & 1:
+                continue
+            cube, rows = self.expand((m, full_care), 1 << m, self.on_rows & ~covered_rows)
+            cover.append((cube, rows))
+            covered_rows |= rows
+        return cover
+
+    @staticmethod
+    def _suffix_unions(cover):
+        # suffix_unions[idx] are the rows covered by cover[idx:]
+        suffix_unions = [0] * (len(cover) + 1)
+        for idx in reversed(range(len(cover))):
+            suffix_unions[idx] = suffix_unions[idx + 1] | cover[idx][1]
+        return suffix_unions
+
+    def irredundant(self, cover):
+        """Remove cubes whose ones are all covered by other cubes (smallest cubes are removed first)."""
+        # rows covered at least once and at least twice
+        once = 0
+        twice = 0
+        for _, rows in cover:
+            twice |= once & rows
+            once |= rows
+        # cubes covering ones that no other cube covers are relatively essential
+        result = [entry for entry in cover if (entry[1] & self.on_rows & ~twice) != 0]
+        candidates = [entry for entry in cover if (entry[1] & self.on_rows & ~twice) == 0]
+        candidates.sort(key=lambda entry: (-_cube_cost(entry[0]), entry[0]))
+
+        result_rows = 0
+        for _, rows in result:
+            result_rows |= rows
+        suffix_unions = self._suffix_unions(candidates)
+        for idx, entry in enumerate(candidates):
+            if entry[1] & self.on_rows & ~(result_rows | suffix_unions[idx + 1]):
+                result.append(entry)
+                result_rows |= entry[1]
+        return result
+
+    def reduce(self, cover):
+        """Shrink every cube to the smallest cube containing the ones only it covers."""
+        reduced = []
+        reduced_rows = 0
+        suffix_unions = self._suffix_unions(cover)
+        for idx, (cube, rows) in enumerate(cover):
+            own_rows = rows & self.on_rows & ~(reduced_rows | suffix_unions[idx + 1])
+            if own_rows:
+                cube = self._supercube(own_rows)
+                rows = self._cube_rows(cube)
+                reduced.append((cube, rows))
+                reduced_rows |= rows
+        return reduced
+
+    @staticmethod
+    def cost(cover):
+        return len(cover), sum(_cube_cost(cube) for cube, _ in cover)
+
+    def is_essential(self, cube, rows):
+        """
+        A prime implicant is essential if it covers a one whose neighbors across all literals of the cube are in the
+        OFF set: no other implicant can cover that one.
+        """
+        care = cube[1]
+        rows &= self.on_rows
+        for bit in range(self.num_inputs):
+            if (care >> bit) & 1:
+                rows &= self.off_neighbors[bit]
+        return rows != 0
+
+    def run(self):
+        cover = self.irredundant(self.initial_cover())
+        # the essential prime implicants are part of every cover, the iterations only work on the other cubes and
+        # treat the ones of the essential prime implicants as don't cares
+        essential = [self.is_essential(*entry) for entry in cover]
+        essentials = [entry for entry, is_essential in zip(cover, essential) if is_essential]
+        cover = [entry for entry, is_essential in zip(cover, essential) if not is_essential]
+        for _, rows in essentials:
+            self.on_rows &= ~rows
+
+        best_cost = self.cost(cover)
+        for _ in range(espresso_max_iterations):
+            if not cover:
+                break
+            candidate = self.irredundant(self.expand_cover([cube for cube, _ in self.reduce(cover)]))
+            candidate_cost = self.cost(candidate)
+            if candidate_cost >= best_cost:
+                break
+            gain = (best_cost[1] - candidate_cost[1]) / max(best_cost[1], 1)
+            cover = candidate
+            best_cost = candidate_cost
+            if gain < espresso_min_gain:
+                break
+        return [cube for cube, _ in essentials + cover]
@@ -0,0 +1,75 @@
+"""
+Integrity checks of the connections of generated wokwi designs.
+
+The checker looks at every gate part (see `simulate.gate_functions`) and reports
+- input pins that are not connected, not driven or driven by more than one gate output,
+- gates whose output is not connected to anything,
+- connections that are part of the design more than once.
+The input buffers and inverters (`input_*`) and the output pins of the output buffers (`output_*`) form the
+interface of the design and may be left unconnected (the generator always adds both polarities of every input,
+even if a design only uses one of them). All checks together take linear time in the number of parts
+and connections.
+"""
+
+import logging
+from design import Nets
+from simulate import gate_functions
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+
+def check_design(parts, connections):
+    """Check the parts and connections of a design; returns the list of problems found (empty if there are none)."""
+    problems = []
+
+    # duplicate connections (in either direction)
+    seen = set()
+    for con in connections:
+        key = (con[0], con[1]) if con[0] <= con[1] else (con[1], con[0])
+        if key in seen:
+            problems.append(f"Duplicate connection {con[0]} -> {con[1]}")
+        seen.add(key)
+
+    # all pins connected by wires form a net
+    nets = Nets(connections)
+    find = nets.find
+    connected_pins = nets.pins
+
+    gates = [part for part in parts if part["type"] in gate_functions]
+    gate_ids = {part["id"] for part in gates}
+
+    # gate outputs driving the nets; pins of other parts (e.g. switches, chips, VCC or GND) may drive them as well
+    num_pins = {}
+    external_nets = set()
+    for pin in connected_pins:
+        net = find(pin)
+        num_pins[net] = num_pins.get(net, 0) + 1
+        if pin.partition(":")[0] not in gate_ids:
+            external_nets.add(net)
+    drivers = {net: [pin.partition(":")[0] for pin in pins if pin.partition(":")[0] in gate_ids]
+               for net, pins in nets.drivers.items()}
+
+    for part in gates:
+        part_id = part["id"]
+        if part_id.startswith("input_"):
+            continue
+        for pin_name in gate_functions[part["type"]][0]:
+            pin = f"{part_id}:{pin_name}"
+            if pin not in connected_pins:
+                problems.append(f"Input {pin} is not connected")
+                continue
+            net_drivers = drivers.get(find(pin), [])
+            if not net_drivers and find(pin) not in external_nets:
+                problems.append(f"Input {pin} is not driven")
+            elif len(net_drivers) > 1:
+                problems.append(f"Input {pin} is driven by more than one gate output: {sorted(net_drivers)}")
+        if not part_id.startswith("output_"):
+            pin = f"{part_id}:OUT"
+            if pin not in connected_pins or num_pins[find(pin)] < 2:
+                problems.append(f"Output {pin} is not connected")
+
+    return problems
@@ -0,0 +1,180 @@
+"""
+Structurally hashed netlist of two-input gates (AND/OR) for the lookup table generator.
+
+Every gate is kept in a unique table keyed by its kind and the normalized (sorted) pair of its driver signals,
+similar to the unique table of an and-inverter graph (AIG). Requesting a gate that already exists returns the
+existing one, so the same pair of signals (e.g. `input_a:OUT` AND `input_not_b:OUT`) is only combined once in the
+whole design, no matter how many terms and outputs use it.
+
+Signals are the names of the driving output pins, e.g. `input_a:OUT` or `gate_and_3:OUT`; gates are named
+`gate_{kind}_{index}` with an index counting the gates of each kind. Besides the two-input gates, the netlist holds
+2:1 multiplexers (kind 'mux', see `Netlist.mux()`) with the inputs A, B and SEL.
+"""
+
+import itertools
+import logging
+from reduction import tree_modes
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+# trees of more signals are built by pairing neighbours, as looking at all pairs would be quadratic
+max_pairing_signals = 64
+
+
+class Gate:
+    """A two-input gate of the netlist; both inputs are the same signal for a gate used as a (dummy) buffer."""
+    __slots__ = ("kind", "index", "inputs", "level", "depth")
+
+    def __init__(self, kind, index, inputs, level, depth):
+        self.kind = kind
+        self.index = index
+        self.inputs = inputs
+        # number of gates of the same kind on the longest path from the primary inputs (first stage: 1)
+        self.level = level
+        # number of gates of any kind on the longest path from the primary inputs, i.e. the arrival time of its output
+        self.depth = depth
+
+    @property
+    def id(self):
+        return f"gate_{self.kind}_{self.index}"
+
+    @property
+    def output(self):
+        return f"{self.id}:OUT"
+
+    def __repr__(self):
+        return f"Gate({self.id}, inputs={self.inputs}, level={self.level})"
+
+
+class Netlist:
+    """Unique table of two-input gates; use `reduce()` to build the gate trees of terms and outputs."""
+
+    def __init__(self):
+        self.gates = []  # in the order of creation
+        self.unique_table = {}  # (kind, signal, signal) -> Gate
+        self.driver = {}  # output signal -> Gate
+        self.num_by_kind = {}
+        self.next_index = {}  # kind -> index of the next new gate
+        self.num_reused = 0
+
+    def gate(self, kind, a, b):
+        """Get the gate of the given kind combining the signals `a` and `b`, create it if it does not exist yet."""
+        key = (kind,) + ((a, b) if a <= b else (b, a))
+        gate = self.unique_table.get(key)
+        if gate is not None:
+            self.num_reused += 1
+            log.debug("    Reusing %s for %s(%s, %s)", gate.id, kind.upper(), a, b)
+            return gate
+
+        index = self.next_index.get(kind, 0)
+        return self._add(kind, index, key)
+
+    def mux(self, sel, a, b):
+        """Get the 2:1 multiplexer selecting signal `a` (`sel` is 0) or `b` (`sel` is 1), create it if needed."""
+        key = ('mux', a, b, sel)
+        gate = self.unique_table.get(key)
+        if gate is not None:
+            self.num_reused += 1
+            return gate
+        return self._add('mux', self.next_index.get('mux', 0), key)
+
+    def add_existing(self, kind, index, a, b):
+        """
+        Add a gate that already exists (e.g. in a previous design) with its index; new gates get higher indices.
+        The gates driving its inputs need to be added first.
+        """
+        return self._add(kind, index, (kind,) + ((a, b) if a <= b else (b, a)))
+
+    def _add(self, kind, index, key):
+        self.num_by_kind[kind] = self.num_by_kind.get(kind, 0) + 1
+        self.next_index[kind] = max(self.next_index.get(kind, 0), index + 1)
+        gate = Gate(kind, index, key[1:], 1 + max(self.level(kind, signal) for signal in key[1:]),
+                    1 + max(self.depth(signal) for signal in key[1:]))
+        self.gates.append(gate)
+        self.unique_table[key] = gate
+        self.driver[gate.output] = gate
+        return gate
+
+    def level(self, kind, signal):
+        gate = self.driver.get(signal)
+        return gate.level if gate is not None and gate.kind == kind else 0
+
+    def depth(self, signal):
+        gate = self.driver.get(signal)
+        return gate.depth if gate is not None else 0
+
+    def reduce(self, kind, signals, pair_counts=None, mode="balanced"):
+        """
+        Combine the signals with a tree of two-input gates of the given kind and return the root gate; a single
+        signal gets a (dummy) gate with both inputs tied together.
+        The tree is built level by level, pairing signals that are already combined by an existing gate first and
+        then the pairs that are used most often according to `pair_counts` (see `count_pairs()`), which gives later
+        trees the best chance to reuse the gates. Levels of more than `max_pairing_signals` signals are paired as
+        neighbours. The `mode` selects the shape of the tree (see `reduction.tree_modes`): 'balanced' builds a tree
+        of minimum depth, 'arrival' only pairs the signals that arrive first (see `depth()`) in every level and lets
+        the late ones join closer to the root, so that the output of the tree arrives as early as possible.
+        The number of levels is bounded by the depth of a balanced tree plus the latest arrival time.
+        """
+        if mode not in tree_modes:
+            raise ValueError(f"Unknown kind of reduction tree '{mode}'.")
+        signals = list(dict.fromkeys(signals))
+        if not signals:
+            raise ValueError("Cannot reduce an empty list of signals.")
+        if len(signals) == 1:
+            return self.gate(kind, signals[0], signals[0])
+
+        # arrival times of the signals that are not combined yet (all the same for a balanced tree)
+        times = {signal: self.depth(signal) if mode == "arrival" else 0 for signal in signals}
+        while len(times) > 1:
+            now = min(times.values())
+            ready = [signal for signal, time in times.items() if time == now]
+            for signal in ready:
+                del times[signal]
+            for signal in self._pair(kind, ready, pair_counts):
+                times[signal] = now + 1
+
+        return self.driver[next(iter(times))]
+
+    def _pair(self, kind, signals, pair_counts):
+        # combine the signals of one level pairwise; returns the outputs of the gates, followed by an odd signal
+        if len(signals) > max_pairing_signals:
+            next_signals = [self.gate(kind, a, b).output for a, b in zip(signals[::2], signals[1::2])]
+            return next_signals + signals[len(next_signals) * 2:]
+
+        def score(pair):
+            a, b = pair
+            key = (kind,) + ((a, b) if a <= b else (b, a))
+            return (key in self.unique_table, pair_counts.get(key[1:], 0) if pair_counts else 0)
+
+        # stable sort, i.e. ties are paired in the order of the signals (deterministic results)
+        pairs = sorted(itertools.combinations(signals, 2), key=score, reverse=True)
+        paired = set()
+        next_signals = []
+        for a, b in pairs:
+            if a not in paired and b not in paired:
+                paired.update((a, b))
+                next_signals.append(self.gate(kind, a, b).output)
+        # an odd signal is passed on to the next level
+        next_signals.extend(signal for signal in signals if signal not in paired)
+        return next_signals
+
+    def num_gates(self, kind):
+        return self.num_by_kind.get(kind, 0)
+
+    def max_level(self, kind):
+        return max((gate.level for gate in self.gates if gate.kind == kind), default=0)
+
+
+def count_pairs(signal_lists):
+    """Count how many of the given signal lists contain each (sorted) pair of signals."""
+    pair_counts = {}
+    for signals in signal_lists:
+        if len(signals) > max_pairing_signals:
+            continue
+        for pair in itertools.combinations(sorted(set(signals)), 2):
+            pair_counts[pair] = pair_counts.get(pair, 0) + 1
+    return pair_counts
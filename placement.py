@@ -0,0 +1,149 @@
+"""
+Placement of the gates of a wokwi design in columns and rows, and routing instructions for its wires.
+
+The gates (`gate_*`) are placed in columns by their depth, the number of gates on the longest path from the inputs,
+so that every wire runs from left to right; the output buffers (`output_*`) get the column right of the deepest
+gate. The columns are placed from left to right: the gates of a column are ordered by their barycenter, the mean
+row of the parts driving them, which keeps connected gates close to each other and reduces the wire crossings
+(the barycenter heuristic of layered graph drawing). Every gate is placed at the row of its barycenter unless that
+overlaps the part above it, so e.g. a gate with a single driver lines up with it. The output buffers keep their
+order and are placed as close to their barycenters as that allows.
+
+Every wire between the placed parts gets short routing instructions (see `route()`) instead of leaving all of it to
+the router of the Wokwi editor: it leaves its source horizontally, turns in the channel in front of the column of
+its target and enters the target horizontally. The wires entering a column are spread over a few tracks of the
+channel, so that their vertical segments do not lie on top of each other.
+
+The gates of every column are sorted once; everything else takes linear time in the number of parts and
+connections, so the placement takes O(n log n) time for n gates.
+"""
+
+import bisect
+import logging
+from design import Nets
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+# horizontal distance of the first track of a channel from the source pin and distance between the tracks
+track_offset = 10
+track_spacing = 5
+num_tracks = 8
+
+# vertical distance between output buffers (in rows of gates)
+output_rows = 2
+
+
+def part_depths(nets, part_ids):
+    """
+    Depth of the gates `part_ids` (see `design.Nets`): the number of gates on the longest path from the inputs, i.e.
+    1 for a gate only driven by other parts (inputs).
+    """
+    drivers = nets.driver_parts()
+    depths = {}
+    for part_id in nets.fan_in_order(part_ids, set(part_ids)):
+        # a driver in a loop (reported by the checks) has no depth yet, it is ignored
+        depths[part_id] = 1 + max((depths[source] for source in drivers.get(part_id, ()) if source in depths),
+                                  default=0)
+    return depths
+
+
+def place_design(design, spacing_h, spacing_v, fixed=()):
+    """
+    Place the gates and output buffers of a design (see the module documentation) and set the routing instructions
+    of their wires. The input buffers and inverters (`input_*`, in the first column) and the `fixed` parts (e.g. the
+    parts kept by an incremental regeneration) keep their positions, the wires between them keep their instructions;
+    placed parts do not overlap fixed parts in the same column. Returns the number of gate columns.
+    """
+    connections = design.connections
+    nets = Nets(connections)
+    drivers = nets.driver_parts()
+    fixed = set(fixed)
+    parts = design.parts
+    gate_ids = [part["id"] for part in parts if part["id"].startswith("gate_")]
+    depths = part_depths(nets, gate_ids)
+    num_columns = max(depths.values(), default=0)
+
+    # the tops of the fixed parts per column, to find free rows
+    occupied = {}
+    for part in parts:
+        if part["id"] in fixed:
+            occupied.setdefault(part["left"], []).append(part["top"])
+    for tops in occupied.values():
+        tops.sort()
+
+    columns = [[] for _ in range(num_columns + 1)]
+    for part_id in gate_ids:
+        if part_id not in fixed:
+            columns[depths[part_id] - 1].append(part_id)
+    columns[num_columns] = [part["id"] for part in parts
+                            if part["id"].startswith("output_") and part["id"] not in fixed]
+
+    for column, part_ids in enumerate(columns):
+        left = (2 + column) * spacing_h  # the first column right of the inputs is left free for their wires
+        barycenters = {}
+        for part_id in part_ids:
+            tops = [design.get_part_by_id(source)["top"] for source in drivers.get(part_id, ())]
+            barycenters[part_id] = sum(tops) / len(tops) if tops else 0
+        if column < num_columns:
+            part_ids = sorted(part_ids, key=barycenters.get)  # stable, i.e. in the order of creation on ties
+            spacing = spacing_v
+        else:
+            spacing = output_rows * spacing_v
+        column_tops = occupied.get(left, [])
+        top = None
+        for part_id in part_ids:
+            top = round(barycenters[part_id]) if top is None else max(round(barycenters[part_id]), top + spacing)
+            top = _free_top(column_tops, top, spacing_v)
+            part = design.get_part_by_id(part_id)
+            part["top"] = top
+            part["left"] = left
+
+    num_routed = route(design, connections, spacing_h, fixed)
+    log.info("Placed %d gate(s) in %d column(s), routed %d wire(s)",
+             sum(len(part_ids) for part_ids in columns[:num_columns]), num_columns, num_routed)
+    return num_columns
+
+
+def _free_top(column_tops, top, spacing):
+    """The first top at or below `top` not overlapping one of the fixed parts of the column (sorted tops)."""
+    idx = bisect.bisect_right(column_tops, top - spacing)
+    while idx < len(column_tops) and column_tops[idx] < top + spacing:
+        top = column_tops[idx] + spacing
+        idx += 1
+    return top
+
+
+def route(design, connections, spacing_h, fixed=()):
+    """
+    Set the routing instructions of the wires driving the gates and output buffers of a design (except those between
+    `fixed` parts and the input parts, and the wires tying the inputs of a part together), e.g. `["h25", "v120", "*", "h-10"]`:
+    the horizontal segment from the source pin ends in the channel in front of the column of the target, the
+    vertical segment turns to the row of the target, the last segment enters the target pin. The wires entering a
+    column are assigned to the tracks of its channel in the order of the rows of their targets. Returns the number
+    of wires routed.
+    """
+    fixed = set(fixed)
+    wires = []
+    for con in connections:
+        source_id, target_id = con[0].partition(":")[0], con[1].partition(":")[0]
+        if source_id == target_id or not con[0].endswith(":OUT") or not target_id.startswith(("gate_", "output_")):
+            continue
+        if all(part_id in fixed or part_id.startswith("input_") for part_id in (source_id, target_id)):
+            continue
+        source, target = design.get_part_by_id(source_id), design.get_part_by_id(target_id)
+        if source is None or target is None:
+            continue
+        wires.append((target["left"], target["top"], con[1], source, con))
+
+    wires.sort(key=lambda wire: wire[:3])
+    track = 0
+    for idx, (left, top, _, source, con) in enumerate(wires):
+        track = track + 1 if idx and wires[idx - 1][0] == left else 0
+        dx = max(left - source["left"] - spacing_h, 0) + track_offset + (track % num_tracks) * track_spacing
+        dy = top - source["top"]
+        con[3] = [f"h{dx}"] + ([f"v{dy}"] if dy else []) + ["*", f"h-{track_offset}"]
+    return len(wires)
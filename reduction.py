@@ -0,0 +1,100 @@
+"""
+Reduction trees of two-input gates (e.g. the AND gates of a term or the OR gates of an output), planned up front.
+
+A tree combining `n` operands always needs `n - 1` gates (see `tree_size()`); `plan_tree()` computes which operands
+and gates each gate combines before any gate is allocated, so building a tree takes a bounded number of steps.
+Two kinds of trees are supported (see `tree_modes`):
+- balanced: minimum depth `ceil(log2(n))`, the operands are paired level by level in their order and an odd operand
+  is passed on to the next level,
+- arrival: the operands are combined in the order they arrive (their arrival times are given, e.g. the number of
+  gates on the longest path from the inputs), always combining the two earliest signals first, so late signals end up
+  close to the root. This minimizes the arrival time of the tree's output, i.e. the critical path through the tree
+  (the balanced tree is a special case for operands that all arrive at the same time).
+"""
+
+import heapq
+import logging
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+tree_modes = ("balanced", "arrival")
+
+
+class ReductionTree:
+    """
+    Planned tree of two-input gates combining `num_operands` operands. The nodes of the tree are numbered: the
+    operands are the nodes `0 .. num_operands - 1`, gate `k` (in the order the gates need to be built) is node
+    `num_operands + k`. The root is the last gate (or the only operand).
+    """
+    __slots__ = ("num_operands", "gates", "stages", "arrivals")
+
+    def __init__(self, num_operands, arrivals):
+        self.num_operands = num_operands
+        self.gates = []  # (node, node) combined by every gate
+        self.stages = []  # number of gates on the longest path from an operand to the output of every gate
+        self.arrivals = list(arrivals)  # arrival times of all nodes
+
+    @property
+    def num_gates(self):
+        return len(self.gates)
+
+    @property
+    def depth(self):
+        return max(self.stages, default=0)
+
+    @property
+    def arrival(self):
+        """Arrival time of the output of the tree."""
+        return self.arrivals[-1]
+
+    def stage(self, node):
+        return self.stages[node - self.num_operands] if node >= self.num_operands else 0
+
+    def _add_gate(self, a, b):
+        self.stages.append(1 + max(self.stage(a), self.stage(b)))
+        self.arrivals.append(1 + max(self.arrivals[a], self.arrivals[b]))
+        self.gates.append((a, b))
+        return self.num_operands + len(self.gates) - 1
+
+
+def tree_size(num_operands):
+    """Number of gates and depth of a balanced tree combining `num_operands` operands (no gates for one operand)."""
+    if num_operands < 1:
+        raise ValueError("Cannot reduce an empty list of operands.")
+    return num_operands - 1, (num_operands - 1).bit_length()
+
+
+def plan_tree(num_operands, arrivals=None, mode="balanced"):
+    """
+    Plan the tree combining `num_operands` operands (see `ReductionTree`); `arrivals` are the arrival times of the
+    operands (default: all the same) and only change the tree in mode 'arrival', every gate adds one to them.
+    """
+    if mode not in tree_modes:
+        raise ValueError(f"Unknown kind of reduction tree '{mode}'.")
+    if num_operands < 1:
+        raise ValueError("Cannot reduce an empty list of operands.")
+    tree = ReductionTree(num_operands, [0] * num_operands if arrivals is None else arrivals)
+
+    if mode == "balanced":
+        nodes = list(range(num_operands))
+        for _ in range(tree_size(num_operands)[1]):
+            next_nodes = [tree._add_gate(a, b) for a, b in zip(nodes[::2], nodes[1::2])]
+            # an odd operand is passed on to the next level
+            nodes = next_nodes + nodes[len(next_nodes) * 2:]
+    else:
+        # combine the two earliest signals first (ties in the order of the nodes, i.e. deterministic)
+        heap = [(arrival, node) for node, arrival in enumerate(tree.arrivals)]
+        heapq.heapify(heap)
+        for _ in range(num_operands - 1):
+            a = heapq.heappop(heap)[1]
+            b = heapq.heappop(heap)[1]
+            node = tree._add_gate(a, b)
+            heapq.heappush(heap, (tree.arrivals[node], node))
+
+    log.debug("Planned %s tree of %d operand(s): %d gate(s) in %d stage(s), output arrives at %d", mode,
+              num_operands, tree.num_gates, tree.depth, tree.arrival)
+    return tree
@@ -0,0 +1,175 @@
+"""
+Bit-parallel simulator for generated wokwi designs, used to verify them against their truth tables in-process.
+
+The simulator reads the parts and connections of a design, sorts the gates that drive the output buffers
+topologically and evaluates them for all 2^n input combinations at once: every signal is a bit-packed Python
+integer with bit `r` holding its value for row `r` of the truth table, so a gate is evaluated for all rows with a
+single bitwise operation on the packed words.
+"""
+
+import logging
+import time
+from design import Nets
+from truthtable import bits_to_rows
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+
+def _and(values, mask):
+    result = mask
+    for value in values:
+        result &= value
+    return result
+
+
+def _or(values, mask):
+    result = 0
+    for value in values:
+        result |= value
+    return result
+
+
+def _xor(values, mask):
+    result = 0
+    for value in values:
+        result ^= value
+    return result
+
+
+def _mux(values, mask):
+    a, b, sel = values
+    return (a & ~sel) | (b & sel)
+
+
+# wokwi part type -> (input pins, function of the packed input values and the mask of all rows)
+gate_functions = {
+    "wokwi-gate-buffer": (("IN",), lambda values, mask: values[0]),
+    "wokwi-gate-not": (("IN",), lambda values, mask: ~values[0] & mask),
+    "wokwi-gate-and-2": (("A", "B"), _and),
+    "wokwi-gate-and-3": (("A", "B", "C"), _and),
+    "wokwi-gate-and-4": (("A", "B", "C", "D"), _and),
+    "wokwi-gate-or-2": (("A", "B"), _or),
+    "wokwi-gate-or-3": (("A", "B", "C"), _or),
+    "wokwi-gate-or-4": (("A", "B", "C", "D"), _or),
+    "wokwi-gate-xor-2": (("A", "B"), _xor),
+    "wokwi-gate-nand-2": (("A", "B"), lambda values, mask: ~_and(values, mask) & mask),
+    "wokwi-gate-nor-2": (("A", "B"), lambda values, mask: ~_or(values, mask) & mask),
+    "wokwi-gate-xnor-2": (("A", "B"), lambda values, mask: ~_xor(values, mask) & mask),
+    # SEL = 0 selects input A, SEL = 1 selects input B
+    "wokwi-mux-2": (("A", "B", "SEL"), _mux),
+}
+
+
+def input_patterns(num_inputs):
+    """Packed values of the inputs for all rows of the truth table; the first input is the most significant bit."""
+    num_rows = 2 ** num_inputs
+    patterns = []
+    for input_idx in range(num_inputs):
+        # one period: 2^bit rows where the input is '0', followed by 2^bit rows where it is '1'
+        half = 1 << (num_inputs - 1 - input_idx)
+        pattern = ((1 << half) - 1) << half
+        length = 2 * half
+        # repeat the period by doubling it until all rows are filled
+        while length < num_rows:
+            pattern |= pattern << length
+            length *= 2
+        patterns.append(pattern)
+    return patterns
+
+
+def simulate(parts, connections, input_names, output_names):
+    """
+    Simulate the design for all input combinations: the inputs are the `IN` pins of the input buffers
+    (`input_{name}`), the outputs are the output buffers (`output_{name}`).
+    Returns a dictionary mapping the output names to their packed values.
+    Raises a `ValueError` if the logic driving the outputs is not connected properly (unknown parts, unconnected or
+    multi-driven inputs, combinational loops).
+    """
+    num_rows = 2 ** len(input_names)
+    mask = (1 << num_rows) - 1
+    part_types = {part["id"]: part["type"] for part in parts}
+
+    # all pins connected by wires form a net, driven by the output pin of a gate
+    nets = Nets(connections)
+    find = nets.find
+    drivers = {}
+    for net, pins in nets.drivers.items():
+        gate_pins = [pin for pin in pins if part_types.get(pin.partition(":")[0]) in gate_functions]
+        if len(gate_pins) > 1:
+            raise ValueError(f"Net of {gate_pins[1]} is driven more than once (also by {gate_pins[0]}).")
+        if gate_pins:
+            drivers[net] = gate_pins[0].partition(":")[0]
+    primary_inputs = {find(f"input_{name}:IN"): pattern
+                      for name, pattern in zip(input_names, input_patterns(len(input_names)))}
+
+    def source_of(gate_id, pin_name):
+        # the driving gate (id) or the primary input (packed value) of an input pin
+        net = find(f"{gate_id}:{pin_name}")
+        if net in primary_inputs:
+            return None, primary_inputs[net]
+        if net in drivers:
+            return drivers[net], None
+        raise ValueError(f"Input {gate_id}:{pin_name} is not driven.")
+
+    # collect the gates driving the outputs and their fan-in
+    sources = {}
+    pending = [f"output_{name}" for name in output_names]
+    while pending:
+        gate_id = pending.pop()
+        if gate_id in sources:
+            continue
+        if part_types.get(gate_id) not in gate_functions:
+            raise ValueError(f"Cannot simulate part '{gate_id}' of type '{part_types.get(gate_id)}'.")
+        pins = gate_functions[part_types[gate_id]][0]
+        sources[gate_id] = [source_of(gate_id, pin_name) for pin_name in pins]
+        pending.extend(source for source, _ in sources[gate_id] if source is not None)
+
+    # topological sort (Kahn's algorithm)
+    fan_out = {gate_id: [] for gate_id in sources}
+    num_pending_inputs = {}
+    for gate_id, gate_sources in sources.items():
+        driving_gates = {source for source, _ in gate_sources if source is not None}
+        num_pending_inputs[gate_id] = len(driving_gates)
+        for source in driving_gates:
+            fan_out[source].append(gate_id)
+    ready = [gate_id for gate_id, num in num_pending_inputs.items() if num == 0]
+    values = {}
+    while ready:
+        gate_id = ready.pop()
+        inputs = [values[source] if source is not None else value for source, value in sources[gate_id]]
+        values[gate_id] = gate_functions[part_types[gate_id]][1](inputs, mask)
+        for consumer in fan_out[gate_id]:
+            num_pending_inputs[consumer] -= 1
+            if num_pending_inputs[consumer] == 0:
+                ready.append(consumer)
+    if len(values) != len(sources):
+        loop = sorted(gate_id for gate_id in sources if gate_id not in values)
+        raise ValueError(f"Combinational loop through the gates {loop}.")
+
+    return {name: values[f"output_{name}"] for name in output_names}
+
+
+def verify_design(design, input_names, bitmaps):
+    """
+    Compare the simulated outputs of the design with the truth table given as bitmaps (ones, rows that are not don't
+    cares) per output name (don't cares are not checked).
+    Returns a dictionary mapping the names of the failing outputs to the rows where they differ (empty if the
+    design is correct).
+    """
+    start_time = time.perf_counter()
+    output_names = list(bitmaps)
+    num_rows = 2 ** len(input_names)
+    values = simulate(design.parts, design.connections, input_names, output_names)
+
+    failures = {}
+    for name, (ones, care) in bitmaps.items():
+        mismatches = (values[name] ^ ones) & care
+        if mismatches:
+            failures[name] = bits_to_rows(mismatches)
+    log.info(f"Simulated all {num_rows} input combinations of {len(output_names)} output(s) in "
+             f"{(time.perf_counter() - start_time) * 1000:.1f} ms")
+    return failures
@@ -0,0 +1,113 @@
+"""
+Structured statistics report of a generated wokwi design (see option `--stats`).
+
+The report is a JSON serializable dictionary with
+- the time (and the memory allocated, if it was traced) of every phase of the generator,
+- the number of parts by kind (AND, OR, buffer, NOT, ...) and of termination wires (inputs of a gate tied together),
+- the number of terms and literals of the minimized functions,
+- per output: the minimization time, the synthesis backend and two-level form (sum of products or product of sums),
+  its terms and literals and the gates and stages in its cone of logic.
+The gates and stages are counted on the parts and connections of the design, so the report works for every way of
+building the gates; gates shared by several outputs are counted for each of them.
+"""
+
+import logging
+from design import Nets
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+
+def part_kind(part_type):
+    """Kind of a wokwi part, e.g. 'and' for 'wokwi-gate-and-2', 'mux' for 'wokwi-mux-2'."""
+    kind = part_type[len("wokwi-"):] if part_type.startswith("wokwi-") else part_type
+    if kind.startswith("gate-"):
+        kind = kind[len("gate-"):]
+    return kind.rsplit("-", 1)[0] if kind[-1].isdigit() else kind
+
+
+def cone_stats(parts, connections, output_names):
+    """
+    Count the gates in the cone of logic of every output buffer (`output_{name}`): the number of parts per kind
+    and the maximum number of gates of each kind on a path from the inputs (stages).
+    Returns a dictionary mapping the output names to `{"gates": {kind: count}, "stages": {kind: count}}`.
+    """
+    kinds = {part["id"]: part_kind(part["type"]) for part in parts}
+    nets = Nets(connections)
+    fan_in = nets.driver_parts()
+    roots = [f"output_{name}" for name in output_names]
+
+    # stages per kind of every part (the maximum number of parts of each kind on a path ending at the part)
+    stages = {}
+    for part_id in nets.fan_in_order(roots):
+        part_stages = {}
+        for source in fan_in.get(part_id, ()):
+            if source not in stages:
+                # only a driver on the path from the output buffer comes later, i.e. it is part of a loop
+                raise ValueError(f"Combinational loop through part '{source}'.")
+            for kind, count in stages[source].items():
+                part_stages[kind] = max(part_stages.get(kind, 0), count)
+        kind = kinds.get(part_id)
+        if kind is not None:
+            part_stages[kind] = part_stages.get(kind, 0) + 1
+        stages[part_id] = part_stages
+
+    results = {}
+    for name, root in zip(output_names, roots):
+        gates = {}
+        for part_id in nets.fan_in_order([root]):
+            gates[kinds[part_id]] = gates.get(kinds[part_id], 0) + 1
+        results[name] = {"gates": dict(sorted(gates.items())), "stages": dict(sorted(stages[root].items()))}
+    return results
+
+
+def design_stats(design, output_names, output_times=None):
+    """Build the statistics report of a design generated with option `stats` (see the module documentation)."""
+    num_parts_by_kind = {}
+    for part in design.parts:
+        kind = part_kind(part["type"])
+        num_parts_by_kind[kind] = num_parts_by_kind.get(kind, 0) + 1
+    num_termination_wires = sum(1 for con in design.connections
+                                if con[0].partition(":")[0] == con[1].partition(":")[0])
+
+    cones = cone_stats(design.parts, design.connections, output_names)
+    outputs = {}
+    unique_terms = set()
+    for name in output_names:
+        meta = design.logic_meta.get(name, {})
+        terms = meta.get("terms", [])
+        unique_terms.update(terms)
+        outputs[name] = {
+            "minimize_time": (output_times or {}).get(name),
+            "minimize_fallback": meta.get("minimize_fallback", False),
+            "backend": meta.get("backend", "sop"),
+            "form": meta.get("form", "sop"),
+            "num_terms": len(terms),
+            "num_literals": sum(term.num_literals for term in terms),
+            "gates": cones[name]["gates"],
+            "stages": cones[name]["stages"],
+        }
+
+    phases = {}
+    for phase, elapsed in design.phase_times.items():
+        phases[phase] = {"time": elapsed}
+        if phase in design.phase_memory:
+            phases[phase]["memory_allocated"], phases[phase]["memory_peak"] = design.phase_memory[phase]
+
+    return {
+        "wall_time": sum(design.phase_times.values()),
+        "phases": phases,
+        "num_parts": design.num_parts,
+        "num_connections": design.num_connections,
+        "parts": dict(sorted(num_parts_by_kind.items())),
+        "num_termination_wires": num_termination_wires,
+        "num_terms": sum(output["num_terms"] for output in outputs.values()),
+        "num_unique_terms": len(unique_terms),
+        "num_literals": sum(output["num_literals"] for output in outputs.values()),
+        "max_and_stages": max((output["stages"].get("and", 0) for output in outputs.values()), default=0),
+        "max_or_stages": max((output["stages"].get("or", 0) for output in outputs.values()), default=0),
+        "outputs": outputs,
+    }
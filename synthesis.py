@@ -0,0 +1,435 @@
+"""
+Synthesis backends: alternative ways to implement an output in the structurally hashed netlist (see `netlist.Netlist`).
+
+- sop: two-level logic of the minimized terms, i.e. a sum of products (the AND gate trees of the terms covering the
+  ones OR'ed together, the classic way of the generator) or a product of sums (the OR gate trees of the clauses, the
+  negated terms covering the zeros, AND'ed together), see `forms`
+- mux: Shannon expansion into a tree of 2:1 multiplexers (`wokwi-mux-2`) selected by the inputs, the first input at
+  the root. Equal sub-functions are only built once (like in a reduced ordered binary decision diagram, shared
+  between all outputs), a sub-function that does not depend on an input skips its multiplexer (don't cares are used
+  to find such sub-functions) and multiplexers with a constant data input become an AND or OR gate with the select
+  input, e.g. `mux(sel=a, 0, g) = a AND g`.
+- xor: decision trees with XOR gates (`wokwi-gate-xor-2`), for arithmetic and parity functions: like 'mux', but every
+  node uses the Shannon expansion or the positive or negative Davio expansion `f = f0 XOR (a AND (f0 XOR f1))`,
+  whichever adds fewer gates (see `XorTreeBuilder`). Parity and symmetric functions like the bits of a population
+  count need a number of gates linear in the number of inputs (per bit), while their sums of products grow
+  exponentially; outputs like these are detected before the minimization (see `xor_dominant()`).
+- rom: read-only memory style, a decoder line for every row where the output is '1', OR'ed together. The decoder
+  lines are the AND of a line of the upper and of the lower half of the inputs (predecoded), which are shared
+  between all rows and outputs; don't cares are '0'.
+With the backend 'auto', the cheapest one is chosen per output (see `estimate_costs()`).
+"""
+
+import logging
+from netlist import Netlist, count_pairs
+from truthtable import bits_to_rows
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+backends = ("auto", "sop", "mux", "xor", "rom")
+
+# two-level forms of the backend 'sop': sum of products, product of sums or the one with fewer gates ('auto')
+forms = ("auto", "sop", "pos")
+# kinds of the gates of the terms and of the gate combining them per form
+form_kinds = {"sop": ("and", "or"), "pos": ("or", "and")}
+
+# constant signals of the Shannon expansion (never connected, the multiplexers using them are simplified away)
+const0 = "0"
+const1 = "1"
+
+
+def literal_signals(input_names):
+    """Signals of the non-negated and negated inputs: `[(input_a:OUT, input_not_a:OUT), ...]`."""
+    return [(f"input_{name}:OUT", f"input_not_{name}:OUT") for name in input_names]
+
+
+def term_signals(term, literals, form="sop"):
+    """Signals combined by the gate tree of a term: its literals or, for a product of sums, the negated literals (the
+    terms of a product of sums cover the zeros, the clauses are their negations)."""
+    negate = form == "pos"
+    return [literals[input_idx][1 if negated != negate else 0]
+            for input_idx, negated in term.literals(len(literals))]
+
+
+def build_two_level(netlist, terms, literals, form="sop", pair_counts=None, mode="balanced"):
+    """Build the gate trees of the terms and the gate tree combining them (see `form_kinds`); returns the root
+    gate."""
+    term_kind, root_kind = form_kinds[form]
+    roots = [netlist.reduce(term_kind, term_signals(term, literals, form), pair_counts, mode) for term in terms]
+    return netlist.reduce(root_kind, [gate.output for gate in roots], None, mode)
+
+
+def build_term_trees(netlist, terms, forms, literals, mode="balanced"):
+    """
+    Build the gate trees of the terms of the two-level outputs (`terms` and `forms` map the output names to their
+    terms and forms); returns a dictionary mapping the output names to the root gates of their terms.
+    The literals used together by most terms are paired first, to share their gates.
+    """
+    signals = {output: [term_signals(term, literals, forms[output]) for term in output_terms]
+               for output, output_terms in terms.items()}
+    pair_counts = {kind: count_pairs(term for output in terms if form_kinds[forms[output]][0] == kind
+                                     for term in signals[output])
+                   for kind in ('and', 'or')}
+    term_gates = {}
+    for output in terms:
+        kind = form_kinds[forms[output]][0]
+        log.debug("  Building %s gate trees for the terms of output %s", kind.upper(), output)
+        term_gates[output] = [netlist.reduce(kind, term, pair_counts[kind], mode) for term in signals[output]]
+    return term_gates
+
+
+def build_root_trees(netlist, term_gates, forms, mode="balanced"):
+    """
+    Build the gate trees combining the terms of the two-level outputs (see `build_term_trees()`); returns a
+    dictionary mapping the output names to their root gates.
+    """
+    pair_counts = {kind: count_pairs([gate.output for gate in term_gates[output]] for output in term_gates
+                                     if form_kinds[forms[output]][1] == kind)
+                   for kind in ('and', 'or')}
+    roots = {}
+    for output, gates in term_gates.items():
+        kind = form_kinds[forms[output]][1]
+        log.debug("  Building %s gate tree for output %s", kind.upper(), output)
+        roots[output] = netlist.reduce(kind, [gate.output for gate in gates], pair_counts[kind], mode)
+    return roots
+
+
+def choose_forms(terms, zero_terms, literals, mode="balanced"):
+    """
+    Choose the two-level forms of the outputs with the fewest gates: `terms` map the output names to the terms
+    covering their ones (sum of products), `zero_terms` to those covering their zeros (product of sums).
+    Starting with the cheaper of all sums of products and all products of sums, the form of every output is
+    switched one after the other if that reduces the number of gates of all outputs built together, i.e. including
+    the gates shared between them (the outputs are built like the generator builds them, see `build_term_trees()`
+    and `build_root_trees()`); on ties, sums of products are preferred.
+    Returns a dictionary mapping the output names to `(form, {form: gates})`, the gates of all outputs with either
+    form of the output.
+    """
+    evaluated = {}
+
+    def num_gates(forms):
+        # e.g. switching the only output is the same as all products of sums
+        key = tuple(forms.values())
+        if key not in evaluated:
+            netlist = Netlist()
+            output_terms = {output: (terms if form == "sop" else zero_terms)[output]
+                            for output, form in forms.items()}
+            build_root_trees(netlist, build_term_trees(netlist, output_terms, forms, literals, mode), forms, mode)
+            evaluated[key] = len(netlist.gates)
+        return evaluated[key]
+
+    forms = {output: "sop" for output in terms}
+    best = num_gates(forms)
+    all_pos = {output: "pos" for output in terms}
+    num_all_pos = num_gates(all_pos)
+    if num_all_pos < best:
+        forms, best = all_pos, num_all_pos
+
+    result = {}
+    for output in terms:
+        costs = {forms[output]: best}
+        other = "sop" if forms[output] == "pos" else "pos"
+        trial = dict(forms, **{output: other})
+        costs[other] = num_gates(trial)
+        if costs[other] < best or (costs[other] == best and other == "sop"):
+            forms, best = trial, costs[other]
+        result[output] = (forms[output], {"sop": costs["sop"], "pos": costs["pos"]})
+    return result
+
+
+def swap_inputs(bits, num_inputs, a, b, negate=False):
+    """
+    Bitmap of a function with the inputs `a` and `b` (indices in the order of the inputs) exchanged, or exchanged and
+    negated (`negate`), i.e. the bitmap of `f(..., b, ..., a, ...)` or `f(..., NOT b, ..., NOT a, ...)`.
+    """
+    num_rows = 1 << num_inputs
+    full = (1 << num_rows) - 1
+    low_bit, high_bit = sorted((num_inputs - 1 - a, num_inputs - 1 - b))
+    if low_bit == high_bit:
+        return bits
+    # rows where the input of the low bit is '1' (`negate`: '0') and the one of the high bit is '0', they are
+    # exchanged with the rows `shift` higher (`negate`: both inputs '1')
+    low_ones = ((1 << (1 << low_bit)) - 1) * (full // ((1 << (2 << low_bit)) - 1)) << (1 << low_bit)
+    high_zeros = ((1 << (1 << high_bit)) - 1) * (full // ((1 << (2 << high_bit)) - 1))
+    if negate:
+        rows, shift = (full & ~low_ones) & high_zeros, (1 << high_bit) + (1 << low_bit)
+    else:
+        rows, shift = low_ones & high_zeros, (1 << high_bit) - (1 << low_bit)
+    swapped = ((bits >> shift) ^ bits) & rows
+    return bits ^ swapped ^ (swapped << shift)
+
+
+def input_order(bitmaps, num_inputs):
+    """
+    Order of the inputs for the decision trees (see `MuxTreeBuilder`), given the bitmaps `(ones, care)` of all
+    outputs: inputs that are symmetric in all outputs (exchanging them, or exchanging and negating them, does not
+    change any output) are moved next to the first of them, otherwise the order is kept. E.g. for an adder with the
+    inputs `a1, a0, b1, b0`, the order `a1, b1, a0, b0` has a decision tree of a size linear in the number of bits
+    instead of exponential.
+    """
+    def symmetric(a, b):
+        for ones, care in bitmaps:
+            if not any(swap_inputs(care, num_inputs, a, b, negate) == care and
+                       (swap_inputs(ones, num_inputs, a, b, negate) ^ ones) & care == 0 for negate in (False, True)):
+                return False
+        return True
+
+    order = []
+    for a in range(num_inputs):
+        if a not in order:
+            order.append(a)
+            order.extend(b for b in range(a + 1, num_inputs) if b not in order and symmetric(a, b))
+    return order
+
+
+def permute_inputs(bits, num_inputs, order):
+    """Bitmap of a function with its inputs permuted into the given order (see `input_order()`)."""
+    current = list(range(num_inputs))
+    for idx, a in enumerate(order):
+        pos = current.index(a)
+        if pos != idx:
+            bits = swap_inputs(bits, num_inputs, idx, pos)
+            current[idx], current[pos] = current[pos], current[idx]
+    return bits
+
+
+class MuxTreeBuilder:
+    """
+    Shannon expansion of outputs into multiplexer trees; the sub-functions are shared between all outputs. The inputs
+    are expanded in the given `order` (indices of the inputs, default: the order of the inputs, see `input_order()`).
+    """
+
+    def __init__(self, netlist, literals, order=None):
+        self.netlist = netlist
+        self.num_inputs = len(literals)
+        self.order = list(range(self.num_inputs)) if order is None else order
+        self.literals = [literals[input_idx] for input_idx in self.order]
+        self.memo = {}  # (level, ones, care) -> signal
+
+    def build(self, ones, care):
+        """Build the tree of an output (bitmaps of the ones and of the rows that are not don't cares); returns the
+        signal of its root, which is an input signal or a constant for trivial functions."""
+        ones = permute_inputs(ones & care, self.num_inputs, self.order)
+        return self._node(0, ones, permute_inputs(care, self.num_inputs, self.order))
+
+    def _node(self, level, ones, care):
+        if ones == 0:
+            return const0
+        if ones == care:
+            return const1
+        key = (level, ones, care)
+        signal = self.memo.get(key)
+        if signal is None:
+            signal = self._expand(level, ones, care)
+            self.memo[key] = signal
+        return signal
+
+    def _expand(self, level, ones, care):
+        # the input of this level is the most significant bit of the remaining rows, i.e. its cofactor for '0' is the
+        # lower half of the bitmaps
+        half = 1 << (self.num_inputs - level - 1)
+        mask = (1 << half) - 1
+        ones_0, care_0 = ones & mask, care & mask
+        ones_1, care_1 = ones >> half, care >> half
+        if (ones_0 ^ ones_1) & care_0 & care_1 == 0:
+            # both cofactors agree (where both are cared for), the function does not depend on this input
+            return self._node(level + 1, ones_0 | ones_1, care_0 | care_1)
+        return self._decompose(level, ones_0, care_0, ones_1, care_1)
+
+    def _decompose(self, level, ones_0, care_0, ones_1, care_1):
+        return self._shannon(level, self._node(level + 1, ones_0, care_0), self._node(level + 1, ones_1, care_1))
+
+    def _shannon(self, level, signal_0, signal_1):
+        sel, sel_not = self.literals[level]
+        netlist = self.netlist
+        if signal_0 == signal_1:
+            return signal_0
+        if (signal_0, signal_1) == (const0, const1):
+            return sel
+        if (signal_0, signal_1) == (const1, const0):
+            return sel_not
+        if signal_0 == const0:
+            return netlist.gate('and', sel, signal_1).output
+        if signal_1 == const0:
+            return netlist.gate('and', sel_not, signal_0).output
+        if signal_0 == const1:
+            return netlist.gate('or', sel_not, signal_1).output
+        if signal_1 == const1:
+            return netlist.gate('or', sel, signal_0).output
+        return netlist.mux(sel, signal_0, signal_1).output
+
+
+class XorTreeBuilder(MuxTreeBuilder):
+    """
+    Decision trees with XOR gates (like a Kronecker functional decision diagram); the sub-functions are shared between
+    all outputs. Every node is expanded with the input of its level `a` in one of three ways:
+    - Shannon: `f = mux(a, f0, f1)` (see `MuxTreeBuilder`),
+    - positive Davio: `f = f0 XOR (a AND f2)` with the Boolean difference `f2 = f0 XOR f1`,
+    - negative Davio: `f = f1 XOR (NOT a AND f2)`,
+    choosing the one that needs the fewest gates for the node and new sub-functions (not built yet, not constant).
+    A function that is linear in `a` (`f2 = 1`) becomes a single XOR gate, e.g. parity is a chain of XOR gates.
+    """
+
+    def _decompose(self, level, ones_0, care_0, ones_1, care_1):
+        # the Davio expansions need the base cofactor where the other one is cared for: it is filled in with the
+        # values of the other cofactor there, i.e. the Boolean difference is '0' on these rows
+        care = care_0 | care_1
+        pos_base = (ones_0 & care_0) | (ones_1 & care_1 & ~care_0)
+        pos_diff = (pos_base ^ ones_1) & care_1
+        neg_base = (ones_1 & care_1) | (ones_0 & care_0 & ~care_1)
+        neg_diff = (neg_base ^ ones_0) & care_0
+
+        candidates = [(self._cost(level, (ones_0, care_0), (ones_1, care_1)) + (0 if self._const(ones_0, care_0) and
+                                                                                self._const(ones_1, care_1) else 1),
+                       0)]
+        const_base, const_diff = self._const(pos_base, care), self._const(pos_diff, care_1)
+        if const_diff == const1:
+            # linear in the input: one XOR gate (or none for a constant base)
+            candidates.append((self._cost(level, (pos_base, care)) + (0 if const_base else 1), 1))
+        else:
+            if const_base != const1:
+                candidates.append((self._cost(level, (pos_base, care), (pos_diff, care_1)) + (1 if const_base else 2),
+                                   1))
+            const_base = self._const(neg_base, care)
+            if const_base != const1:
+                candidates.append((self._cost(level, (neg_base, care), (neg_diff, care_0)) + (1 if const_base else 2),
+                                   2))
+        expansion = min(candidates)[1]
+
+        if expansion == 0:
+            return super()._decompose(level, ones_0, care_0, ones_1, care_1)
+        sel, sel_not = self.literals[level]
+        if expansion == 1:
+            base, diff, literal = self._node(level + 1, pos_base, care), self._node(level + 1, pos_diff, care_1), sel
+        else:
+            base, diff, literal = self._node(level + 1, neg_base, care), self._node(level + 1, neg_diff, care_0), sel_not
+        netlist = self.netlist
+        if diff == const1:
+            if base == const1:
+                return sel_not if literal == sel else sel
+            term = literal
+        else:
+            term = netlist.gate('and', literal, diff).output
+        return term if base == const0 else netlist.gate('xor', base, term).output
+
+    @staticmethod
+    def _const(ones, care):
+        ones &= care
+        return const0 if ones == 0 else const1 if ones == care else None
+
+    def _cost(self, level, *functions):
+        # number of sub-functions that need to be built
+        return sum(1 for ones, care in functions
+                   if self._const(ones, care) is None and (level + 1, ones & care, care) not in self.memo)
+
+
+def estimate_num_terms(ones, care, num_inputs, limit=None):
+    """
+    Estimate the number of terms of a sum of products of a function (bitmaps of the ones and of the rows that are not
+    don't cares) without minimizing it: every one that is not covered yet is expanded into a prime implicant by
+    freeing its inputs one after the other as long as the cube only covers ones and don't cares. This takes a number
+    of steps linear in the number of terms and inputs; the cover is not minimal, but close for the functions with
+    large sums of products (e.g. every one of a parity function is a term). The estimation stops when the number of
+    terms reaches the `limit` (if given).
+    """
+    num_rows = 1 << num_inputs
+    full = (1 << num_rows) - 1
+    ones &= care
+    allowed = ones | (full & ~care)
+    uncovered = ones
+    num_terms = 0
+    while uncovered and num_terms != limit:
+        row = (uncovered & -uncovered).bit_length() - 1
+        cube = 1 << row
+        for input_bit in range(num_inputs):
+            stride = 1 << input_bit
+            expanded = cube | (cube >> stride if (row >> input_bit) & 1 else cube << stride)
+            if expanded & ~allowed == 0:
+                cube = expanded
+        uncovered &= ~cube
+        num_terms += 1
+    return num_terms
+
+
+def xor_dominant(num_xor_gates, ones, care, num_inputs):
+    """
+    Check if an output needs fewer gates with XOR gates (`num_xor_gates`, see `XorTreeBuilder`) than a sum of
+    products or product of sums: they need a root gate per term and the gates combining them (see
+    `estimate_num_terms()`).
+    """
+    # the two-level logic needs more gates than the XOR gates from this number of terms on
+    limit = (num_xor_gates + 1) // 2 + 1
+    return all(estimate_num_terms(bits, care, num_inputs, limit) >= limit for bits in (ones, care & ~ones))
+
+
+def zeros_worth_minimizing(terms, ones, care, num_inputs):
+    """
+    Check if a product of sums of an output could need fewer gates than the sum of products of its `terms`: the
+    clauses need at least one gate less than their number to be combined, so a product of sums with as many clauses
+    (see `estimate_num_terms()`) as the sum of products has gates cannot be cheaper (a term with a single literal
+    still needs a gate with its inputs tied together). This avoids minimizing the zeros of outputs that have few
+    ones (e.g. the most significant bit of a popcount), which takes very long.
+    """
+    num_gates = max(len(terms) - 1, 0) + sum(max(term.num_literals - 1, 1) for term in terms)
+    return estimate_num_terms(care & ~ones, care, num_inputs, num_gates) < num_gates
+
+
+def build_rom(netlist, rows, literals):
+    """Build the decoder lines of the rows and the OR gate tree combining them; returns the root gate."""
+    num_inputs = len(literals)
+    num_high = num_inputs // 2
+    # the halves of the lines only have 2^(num_inputs / 2) values each, build every one once
+    half_lines = {}
+
+    def line(input_indices, row):
+        signals = [literals[input_idx][0 if (row >> (num_inputs - 1 - input_idx)) & 1 else 1]
+                   for input_idx in input_indices]
+        key = tuple(signals)
+        if key not in half_lines:
+            half_lines[key] = signals[0] if len(signals) == 1 else netlist.reduce('and', signals).output
+        return half_lines[key]
+
+    lines = []
+    for row in rows:
+        low = line(range(num_high, num_inputs), row)
+        lines.append(netlist.gate('and', line(range(num_high), row), low).output if num_high else low)
+    return netlist.reduce('or', lines)
+
+
+def estimate_costs(outputs, terms, literals, mode="balanced", output_forms=None, order=None):
+    """
+    Estimate the number of gates of every backend for every output. `outputs` maps the output names to the bitmaps
+    `(ones, care)` of the truth table, `terms` to the minimized terms and `output_forms` to their two-level forms
+    (default: sums of products); `order` is the order of the inputs in the decision trees (see `MuxTreeBuilder`).
+    Every backend builds all outputs into a netlist of its own, the cost of an output is the number of gates it adds
+    to it, i.e. gates shared with the previous outputs (e.g. the decoder lines of the ROM) are only counted once.
+    Returns a dictionary mapping the output names to `{backend: cost}`.
+    """
+    netlists = {backend: Netlist() for backend in backends[1:]}
+    mux_trees = MuxTreeBuilder(netlists["mux"], literals, order)
+    xor_trees = XorTreeBuilder(netlists["xor"], literals, order)
+    output_forms = output_forms or {}
+    pair_counts = count_pairs(term_signals(term, literals, output_forms.get(output, "sop"))
+                              for output in outputs for term in terms[output])
+    costs = {}
+    for output, (ones, care) in outputs.items():
+        costs[output] = {}
+        for backend, netlist in netlists.items():
+            num_gates = len(netlist.gates)
+            if backend == "sop":
+                root = build_two_level(netlist, terms[output], literals, output_forms.get(output, "sop"),
+                                       pair_counts, mode)
+            elif backend == "mux":
+                root = mux_trees.build(ones, care)
+            elif backend == "xor":
+                root = xor_trees.build(ones, care)
+            else:
+                root = build_rom(netlist, bits_to_rows(ones & care), literals)
+            # a root that is an input signal still needs a (dummy) gate
+            dummy = isinstance(root, str) and root not in netlist.driver
+            costs[output][backend] = len(netlist.gates) - num_gates + dummy
+    return costs
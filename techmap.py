@@ -0,0 +1,89 @@
+"""
+Technology mapping of the two-input gate netlist (see `netlist.Netlist`) onto wider AND/OR gates.
+
+Wokwi has AND and OR gates with 2, 3 and 4 inputs. A tree of two-input gates of the same kind can be collapsed into
+fewer, wider gates: a gate absorbs a gate of the same kind that drives one of its inputs, if that gate drives nothing
+else (gates shared by several terms or outputs are kept, so the sharing found by the structural hashing is not lost)
+and the inputs of both together fit into the widest gate allowed.
+
+The cost of a mapping is the number of parts first and the depth (gates on the longest path from the inputs) second.
+Every absorbed gate saves one part and never makes a path longer, so the gates are visited fan-in first and absorb as
+many of their input gates as fit; when not all of them fit, the deepest ones (on the critical path) are absorbed
+first, the ones with fewer inputs on ties. This greedy mapping takes linear time in the number of gates; it is not
+always optimal (e.g. 5 instead of 4 three-input gates for a balanced tree of 8 signals), but gets close.
+"""
+
+import logging
+from netlist import Gate
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+log = logging.getLogger(__name__)
+
+# the widest AND/OR gates available in Wokwi
+max_gate_inputs = 4
+
+# kinds of gates available with more inputs (other gates, e.g. multiplexers, are kept as they are)
+mapped_kinds = ("and", "or")
+
+
+def map_gates(gates, max_inputs, output_signals=()):
+    """
+    Map the two-input `gates` (in the order of creation, i.e. fan-in first) onto gates with up to `max_inputs`
+    inputs; `output_signals` are the gate outputs used outside of the gates (e.g. connected to the output buffers).
+    Returns the list of mapped gates: every mapped gate keeps the id of the gate at its root, so the signals used
+    outside of the gates stay the same; `level` and `depth` are updated for the mapped gates (see `netlist.Gate`).
+    """
+    if not 2 <= max_inputs <= max_gate_inputs:
+        raise ValueError(f"Gates with {max_inputs} inputs are not supported (2 to {max_gate_inputs}).")
+    if max_inputs == 2:
+        return list(gates)
+
+    fan_out = {}
+    for signal in output_signals:
+        fan_out[signal] = fan_out.get(signal, 0) + 1
+    for gate in gates:
+        for signal in set(gate.inputs):
+            fan_out[signal] = fan_out.get(signal, 0) + 1
+
+    mapped = {}  # output signal -> mapped gate
+    absorbed = set()
+    for gate in gates:
+        if gate.kind not in mapped_kinds:
+            mapped[gate.output] = gate
+            continue
+        inputs = list(dict.fromkeys(gate.inputs))
+        # candidates: input gates of the same kind that only drive this gate and are not tied (dummy) gates
+        candidates = [mapped[signal] for signal in inputs
+                      if signal in mapped and mapped[signal].kind == gate.kind and fan_out[signal] == 1 and
+                      len(set(mapped[signal].inputs)) > 1]
+        for candidate in sorted(candidates, key=lambda candidate: (-candidate.depth, len(candidate.inputs))):
+            merged = []
+            for signal in inputs:
+                merged.extend(candidate.inputs if signal == candidate.output else [signal])
+            merged = list(dict.fromkeys(merged))
+            if len(merged) <= max_inputs:
+                inputs = merged
+                absorbed.add(candidate.output)
+        if len(inputs) == 1:
+            # a single signal still needs a (dummy) two-input gate with both inputs tied together
+            inputs = [inputs[0], inputs[0]]
+        mapped[gate.output] = Gate(gate.kind, gate.index, tuple(inputs),
+                                   1 + max(_level(mapped, gate.kind, signal) for signal in inputs),
+                                   1 + max(_depth(mapped, signal) for signal in inputs))
+
+    result = [gate for signal, gate in mapped.items() if signal not in absorbed]
+    log.info("Mapped %d two-input gate(s) onto %d gate(s) with up to %d inputs", len(gates), len(result), max_inputs)
+    return result
+
+
+def _level(mapped, kind, signal):
+    gate = mapped.get(signal)
+    return gate.level if gate is not None and gate.kind == kind else 0
+
+
+def _depth(mapped, signal):
+    gate = mapped.get(signal)
+    return gate.depth if gate is not None else 0
@@ -0,0 +1,121 @@
+"""
+Encodings of the output columns of the truth table in the logic design description (`*.logic.json`).
+
+Every output in `outputs` can be given in one of these forms (row 0 is the input combination with all inputs '0',
+the last row is the one with all inputs '1'):
+
+- list of values, one per row: `[0, 1, "x", 1]` with `"x"` or `"-"` for don't cares (the original format)
+- hex string, four rows per digit, the first row is the most significant bit of the first digit: `"0x5a"`
+- bit string, one character per row, `x` or `-` for don't cares (spaces and underscores are ignored):
+  `"0b0110_1xx0"`
+- minterm list: `{"ones": [1, 2], "dont_cares": [3]}` (`dont_cares` is optional)
+- raw binary file with the rows bit-packed like the hex string (the first row is the most significant bit of the
+  first byte): `{"file": "table.bin", "offset": 0, "dont_cares": [3]}`; `offset` (in bytes, default 0) allows to
+  keep all outputs in a single file, `dont_cares` is optional; relative paths are relative to the JSON file
+
+Internally, the columns are kept as pair of bitmaps (Python integers with bit `r` set for row `r`) of the ones and
+the don't cares, so the memory needed grows with the size of the packed data and not with the number of rows.
+"""
+
+import os
+
+# Copyright (c) maehw, 2022-2023
+# wokwi-lookup-table-generator is licensed under the GNU General Public License v3.0
+# Copyright and license notices must be preserved. Contributors provide an express grant of patent rights.
+
+# output values in the truth table that mark a don't care (the output value does not matter for that row)
+dont_care_values = ("x", "X", "-")
+
+_ones_table = str.maketrans("xX-", "000")
+_dont_cares_table = str.maketrans("01xX-", "00111")
+
+
+def parse_output(value, num_inputs):
+    """Parse the column of a single output (any of the supported forms); returns the bitmaps (ones, don't cares)."""
+    num_rows = 2 ** num_inputs
+    if isinstance(value, list):
+        if len(value) != num_rows:
+            raise ValueError(f"Expected {num_rows} output values, got {len(value)}.")
+        for row, v in enumerate(value):
+            if v not in (0, 1) and v not in dont_care_values:
+                raise ValueError(f"Invalid output value {v!r} in row {row}, expected 0, 1, 'x' or '-'.")
+        bits = "".join("1" if v == 1 else "x" if v in dont_care_values else "0" for v in value)
+        return _parse_bit_string(bits)
+    if isinstance(value, str):
+        if value.startswith(("0x", "0X")):
+            return _parse_hex_string(value[2:], num_rows), 0
+        if not value.startswith(("0b", "0B")):
+            raise ValueError("Output values given as string need to start with '0x' (hex) or '0b' (bits).")
+        bits = value[2:].replace(" ", "").replace("_", "")
+        if len(bits) != num_rows:
+            raise ValueError(f"Expected {num_rows} output values in the bit string, got {len(bits)}.")
+        return _parse_bit_string(bits)
+    if isinstance(value, dict) and "file" in value:
+        ones = _read_binary_file(value["file"], value.get("offset", 0), num_rows)
+        return ones, _minterms_to_bits(value.get("dont_cares", ()), num_rows)
+    if isinstance(value, dict) and "ones" in value:
+        return (_minterms_to_bits(value["ones"], num_rows),
+                _minterms_to_bits(value.get("dont_cares", ()), num_rows))
+    raise ValueError(f"Unsupported format of output values: {type(value).__name__}")
+
+
+def resolve_files(in_data, base_dir):
+    """Make the paths of binary files referenced by the outputs absolute (relative to `base_dir`)."""
+    for value in in_data.get("outputs", {}).values():
+        if isinstance(value, dict) and "file" in value:
+            value["file"] = os.path.join(base_dir, value["file"])
+
+
+def bits_to_rows(bits):
+    """List of the rows (set bits) of a bitmap, in ascending order."""
+    rows = []
+    # scan the binary string representation, that's linear in the number of rows (and fast in C)
+    bit_string = format(bits, "b")[::-1]
+    row = bit_string.find("1")
+    while row >= 0:
+        rows.append(row)
+        row = bit_string.find("1", row + 1)
+    return rows
+
+
+def _parse_bit_string(bits):
+    # the first row is the first character, i.e. the string needs to be reversed for int()
+    reversed_bits = bits[::-1]
+    try:
+        return int(reversed_bits.translate(_ones_table), 2), int(reversed_bits.translate(_dont_cares_table), 2)
+    except ValueError:
+        raise ValueError("Output values need to be '0', '1', 'x' or '-'.") from None
+
+
+def _parse_hex_string(digits, num_rows):
+    digits = digits.replace(" ", "").replace("_", "")
+    num_digits = (num_rows + 3) // 4
+    if len(digits) != num_digits:
+        raise ValueError(f"Expected {num_digits} hex digits for {num_rows} output values, got {len(digits)}.")
+    # the padding bits of the last digit are rows beyond the table, mask them
+    return _reverse_bits(int(digits, 16), num_digits * 4) & ((1 << num_rows) - 1)
+
+
+def _read_binary_file(file_name, offset, num_rows):
+    num_bytes = (num_rows + 7) // 8
+    with open(file_name, "rb") as f:
+        f.seek(offset)
+        data = f.read(num_bytes)
+    if len(data) != num_bytes:
+        raise ValueError(f"Expected {num_bytes} bytes at offset {offset} of '{file_name}', got {len(data)}.")
+    return _reverse_bits(int.from_bytes(data, "big"), num_bytes * 8) & ((1 << num_rows) - 1)
+
+
+def _reverse_bits(value, num_bits):
+    # the first row is the most significant bit, but bit `r` of the bitmaps is row `r`
+    return int(format(value, f"0{num_bits}b")[::-1], 2)
+
+
+def _minterms_to_bits(minterms, num_rows):
+    # setting the bits one by one in the integer would copy it every time, set them in a bit string instead
+    bits = bytearray(b"0" * num_rows)
+    for minterm in minterms:
+        if not 0 <= minterm < num_rows:
+            raise ValueError(f"Minterm {minterm} is out of range (0..{num_rows - 1}).")
+        bits[minterm] = ord("1")
+    return int(bits[::-1], 2)